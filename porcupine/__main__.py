@@ -1,12 +1,16 @@
 import argparse
 import logging
 import sys
+import time
 from pathlib import Path
 
 from porcupine import __version__ as porcupine_version
 from porcupine import (
     _logs,
+    _profiling,
+    _single_instance,
     _state,
+    _watchdog,
     dirs,
     get_main_window,
     get_tab_manager,
@@ -22,10 +26,12 @@ log = logging.getLogger(__name__)
 _EPILOG = r"""
 Examples:
   %(prog)s                    # run Porcupine normally
-  %(prog)s file1.py file2.js  # open the given files on startup
+  %(prog)s file1.py file2.js  # open the given files, in a running Porcupine if any
+  %(prog)s --new-instance     # start another Porcupine even if one is running
   %(prog)s -n Python          # create a new Python file
   %(prog)s --no-plugins       # understand the power of plugins
   %(prog)s -v                 # produce lots of output for debugging
+  %(prog)s --profile-startup  # find out why Porcupine starts slowly
 """
 
 
@@ -69,6 +75,24 @@ def main() -> None:
         ),
     )
 
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help=(
+            "measure how long each part of starting Porcupine takes, print the slowest"
+            " parts and save the results to the log directory"
+        ),
+    )
+
+    parser.add_argument(
+        "--new-instance",
+        action="store_true",
+        help=(
+            "start a new Porcupine even if Porcupine is already running, by default files"
+            " are opened in the Porcupine that is already running"
+        ),
+    )
+
     plugingroup = parser.add_argument_group("plugin loading options")
     plugingroup.add_argument(
         "--no-plugins",
@@ -89,24 +113,48 @@ def main() -> None:
         ),
     )
 
-    args_parsed_in_first_step, junk = parser.parse_known_args()
+    args_parsed_in_first_step, other_args = parser.parse_known_args()
+
+    # Options like --no-plugins or --verbose don't make sense for an already
+    # running Porcupine, and we can't know what options plugins will add.
+    # Running porcupine without files starts a new window, as it always has.
+    stdin_contents: list[str] = []
+    if (
+        other_args
+        and not args_parsed_in_first_step.new_instance
+        and not args_parsed_in_first_step.profile_startup
+        and not args_parsed_in_first_step.verbose
+        and not args_parsed_in_first_step.verbose_logger
+        and args_parsed_in_first_step.use_plugins
+        and not args_parsed_in_first_step.without_plugins
+        and not any(arg.startswith("-") and arg != "-" for arg in other_args)
+    ):
+        stdin_contents = [sys.stdin.read() for arg in other_args if arg == "-"]
+        if _single_instance.send_files_to_running_porcupine(other_args, stdin_contents):
+            return
+
+    if args_parsed_in_first_step.profile_startup:
+        _profiling.enable()
 
     dirs.cache_dir.mkdir(parents=True, exist_ok=True)
     (dirs.config_dir / "plugins").mkdir(parents=True, exist_ok=True)
     dirs.log_dir.mkdir(parents=True, exist_ok=True)
 
-    _logs.setup(
-        all_loggers_verbose=args_parsed_in_first_step.verbose,
-        verbose_loggers=(args_parsed_in_first_step.verbose_logger or []),
-    )
+    with _profiling.measure("_logs.setup()"):
+        _logs.setup(
+            all_loggers_verbose=args_parsed_in_first_step.verbose,
+            verbose_loggers=(args_parsed_in_first_step.verbose_logger or []),
+        )
 
-    settings.init_enough_for_using_disabled_plugins_list()
+    with _profiling.measure("settings init, part 1"):
+        settings.init_enough_for_using_disabled_plugins_list()
     if args_parsed_in_first_step.use_plugins:
         if args_parsed_in_first_step.without_plugins:
             disable_list = args_parsed_in_first_step.without_plugins.split(",")
         else:
             disable_list = []
-        pluginloader.import_plugins(disable_list)
+        with _profiling.measure("pluginloader.import_plugins()"):
+            pluginloader.import_plugins(disable_list)
 
         bad_disables = set(disable_list) - {info.name for info in pluginloader.plugin_infos}
         if bad_disables:
@@ -134,16 +182,21 @@ def main() -> None:
     )
 
     args = parser.parse_args()
+    _watchdog.install_callback_timing()
     _state.init(args)
 
     # Prevent showing up a not-ready-yet root window to user
     get_main_window().withdraw()
 
-    settings.init_the_rest_after_initing_enough_for_using_disabled_plugins_list()
-    menubar._init()
-    pluginloader.run_setup_functions(args.shuffle_plugins)
+    with _profiling.measure("settings init, part 2"):
+        settings.init_the_rest_after_initing_enough_for_using_disabled_plugins_list()
+    with _profiling.measure("menubar._init()"):
+        menubar._init()
+    with _profiling.measure("pluginloader.run_setup_functions()"):
+        pluginloader.run_setup_functions(args.shuffle_plugins)
 
     tabmanager = get_tab_manager()
+    stdin_contents_iter = iter(stdin_contents)  # already read if sending files failed
     for path_string in args.files:
         if path_string == "-":
             # don't close stdin so it's possible to do this:
@@ -153,14 +206,34 @@ def main() -> None:
             #   ^D
             #   bla bla
             #   ^D
-            tabmanager.add_tab(tabs.FileTab(tabmanager, content=sys.stdin.read()))
+            content = next(stdin_contents_iter, None)
+            if content is None:
+                content = sys.stdin.read()
+            tabmanager.add_tab(tabs.FileTab(tabmanager, content=content))
         else:
-            tabmanager.open_file(Path(path_string))
+            with _profiling.measure(f"open_file({path_string})", "open file"):
+                tabmanager.open_file(Path(path_string))
 
     get_main_window().deiconify()
+    if _profiling.is_enabled():
+        # The event loop is idle when everything is drawn and Porcupine is ready to use
+        deiconify_time = time.perf_counter()
+
+        def on_first_idle() -> None:
+            _profiling.add_phase("first idle after deiconify()", "startup", deiconify_time)
+            _profiling.finish()
+
+        get_main_window().after_idle(on_first_idle)
+
+    get_main_window().after_idle(pluginloader.run_setup_functions_after_startup)
+    _single_instance.start_listening()
+    _watchdog.start(get_main_window())
+
     try:
         get_main_window().mainloop()
     finally:
+        _watchdog.stop()
+        _single_instance.stop_listening()
         settings.save()
     log.info("exiting Porcupine successfully")
 
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import atexit
 import itertools
 import logging
+import logging.handlers
 import os
+import queue
 import shlex
 import subprocess
 import sys
 import threading
 from collections.abc import Sequence
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any, TextIO, cast
 
 import porcupine
@@ -20,6 +24,11 @@ FILENAME_FIRST_PART_FORMAT = "%Y-%m-%dT%H-%M-%S"
 # might be useful to grep something from old logs, but 30 days was way too much
 LOG_MAX_AGE_DAYS = 7
 
+# When a log file gets this big, a new log file is started. If one run of
+# Porcupine creates too many log files, the oldest of them are deleted.
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILES_PER_RUN_MAX = 5
+
 
 def _remove_old_logs() -> None:
     for path in dirs.log_dir.glob("*.txt"):
@@ -49,10 +58,11 @@ def _run_command(command: str) -> None:
         log.warning(f"unexpected error when running '{command}'", exc_info=True)
 
 
-def _open_log_file() -> TextIO:
+def _open_log_file(first_number: int = 0) -> TextIO:
     timestamp = datetime.now().strftime(FILENAME_FIRST_PART_FORMAT)
     filenames = (
-        f"{timestamp}.txt" if i == 0 else f"{timestamp}_{i}.txt" for i in itertools.count()
+        f"{timestamp}.txt" if i == 0 else f"{timestamp}_{i}.txt"
+        for i in itertools.count(first_number)
     )
     for filename in filenames:
         try:
@@ -62,13 +72,50 @@ def _open_log_file() -> TextIO:
     assert False  # makes mypy happy
 
 
+# logging.StreamHandler[TextIO] doesn't work at runtime on Python 3.10
+class _RotatingLogFileHandler(logging.StreamHandler):  # type: ignore[type-arg]
+    def __init__(self, log_file: TextIO) -> None:
+        super().__init__(log_file)
+        self._paths = [Path(log_file.name)]
+        self._file_count = 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)  # also flushes
+        if os.fstat(self.stream.fileno()).st_size > LOG_FILE_MAX_BYTES:
+            self._start_new_file()
+
+    def _start_new_file(self) -> None:
+        # Numbering continues, so that a deleted file's name is not reused
+        new_file = _open_log_file(self._file_count)
+        self._file_count += 1
+        new_file.write(f"Continuing from previous log file: {self._paths[-1]}\n")
+        old_file = self.setStream(new_file)
+        assert old_file is not None
+        old_file.close()
+        self._paths.append(Path(new_file.name))
+
+        while len(self._paths) > LOG_FILES_PER_RUN_MAX:
+            try:
+                self._paths.pop(0).unlink()
+            except OSError:
+                pass
+
+
+def _remove_old_logs_in_thread() -> None:
+    # don't fail to run if old logs can't be deleted for some reason
+    try:
+        _remove_old_logs()
+    except OSError:
+        log.exception("unexpected problem with removing old log files")
+
+
 def setup(*, all_loggers_verbose: bool = False, verbose_loggers: Sequence[str] = ()) -> None:
     handlers: list[logging.Handler] = []
 
     log_file = _open_log_file()
     print(f"log file: {log_file.name}")
 
-    file_handler = logging.StreamHandler(log_file)
+    file_handler = _RotatingLogFileHandler(log_file)
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(
         logging.Formatter("[%(asctime)s] %(name)s %(levelname)s: %(message)s")
@@ -99,8 +146,15 @@ def setup(*, all_loggers_verbose: bool = False, verbose_loggers: Sequence[str] =
         print_handler.setFormatter(logging.Formatter("%(name)s %(levelname)s: %(message)s"))
         handlers.append(print_handler)
 
+    # Writing to a file or terminal would slow down whatever is logging, often
+    # the event loop. The handlers run in a separate thread instead.
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # writes everything that is still in the queue
+
     # don't know why level must be specified here
-    logging.basicConfig(level=logging.DEBUG, handlers=handlers)
+    logging.basicConfig(level=logging.DEBUG, handlers=[logging.handlers.QueueHandler(log_queue)])
 
     porcupine_path = cast(Any, porcupine).__path__[0]
     log.debug(f"starting Porcupine {porcupine.__version__} from '{porcupine_path}'")
@@ -114,8 +168,4 @@ def setup(*, all_loggers_verbose: bool = False, verbose_loggers: Sequence[str] =
         _run_command("uname -a")
         threading.Thread(target=_run_command, args=["lsb_release -a"]).start()
 
-    # don't fail to run if old logs can't be deleted for some reason
-    try:
-        _remove_old_logs()
-    except OSError:
-        log.exception("unexpected problem with removing old log files")
+    threading.Thread(target=_remove_old_logs_in_thread, daemon=True).start()
@@ -0,0 +1,139 @@
+"""Measure how long each part of Porcupine's startup takes.
+
+This is used when Porcupine is started with ``--profile-startup``. The
+results are saved to the log directory as JSON, and in the trace format of
+Chrome, which can be opened at ``chrome://tracing`` or https://ui.perfetto.dev/.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+
+from porcupine import dirs
+
+# Shown in the summary printed to the terminal, the files contain everything
+_SUMMARY_LENGTH = 25
+
+
+@dataclasses.dataclass
+class _Phase:
+    name: str
+    category: str
+    start: float  # seconds since profiling started
+    duration: float  # seconds
+    thread_id: int
+
+
+# None when not profiling
+_start_time: float | None = None
+_phases: list[_Phase] = []
+
+
+def enable() -> None:
+    global _start_time
+    _start_time = time.perf_counter()
+    _phases.clear()
+
+
+def is_enabled() -> bool:
+    return _start_time is not None
+
+
+def add_phase(name: str, category: str, start: float) -> None:
+    """Record a phase that began at ``time.perf_counter()`` value *start* and ends now."""
+    if _start_time is not None:
+        _phases.append(
+            _Phase(
+                name=name,
+                category=category,
+                start=start - _start_time,
+                duration=time.perf_counter() - start,
+                thread_id=threading.get_ident(),
+            )
+        )
+
+
+@contextlib.contextmanager
+def measure(name: str, category: str = "startup") -> Iterator[None]:
+    if _start_time is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, category, start)
+
+
+def _to_json() -> dict[str, object]:
+    assert _start_time is not None
+    return {
+        "total_ms": (time.perf_counter() - _start_time) * 1000,
+        "phases": [
+            {
+                "name": phase.name,
+                "category": phase.category,
+                "start_ms": phase.start * 1000,
+                "duration_ms": phase.duration * 1000,
+            }
+            for phase in _phases
+        ],
+    }
+
+
+# https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+def _to_chrome_trace() -> dict[str, object]:
+    return {
+        "traceEvents": [
+            {
+                "name": phase.name,
+                "cat": phase.category,
+                "ph": "X",  # complete event, has a start time and a duration
+                "ts": phase.start * 1_000_000,  # microseconds
+                "dur": phase.duration * 1_000_000,
+                "pid": os.getpid(),
+                "tid": phase.thread_id,
+            }
+            for phase in _phases
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def finish() -> tuple[Path, Path]:
+    """Stop profiling, save the results and print a summary.
+
+    Returns paths to the JSON file and the Chrome trace file.
+    """
+    global _start_time
+
+    timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    json_path = dirs.log_dir / f"startup-profile-{timestamp}.json"
+    trace_path = dirs.log_dir / f"startup-profile-{timestamp}.trace.json"
+
+    result = _to_json()
+    with json_path.open("w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    with trace_path.open("w", encoding="utf-8") as file:
+        json.dump(_to_chrome_trace(), file)
+
+    print(f"startup took {result['total_ms']:.1f}ms, slowest parts:")
+    for phase in sorted(_phases, key=(lambda phase: phase.duration), reverse=True)[
+        :_SUMMARY_LENGTH
+    ]:
+        print(f"  {phase.duration*1000:8.1f}ms  {phase.name} ({phase.category})")
+    print(f"startup profile: {json_path}")
+    print(f"Chrome trace: {trace_path}")
+
+    _start_time = None
+    _phases.clear()
+    return (json_path, trace_path)
@@ -0,0 +1,185 @@
+"""Open files in an already running Porcupine instead of starting a new one.
+
+The first Porcupine that starts listens on a Unix socket in the cache
+directory. Running ``porcupine file.py`` after that sends the files to the
+running Porcupine and exits, instead of creating another window. This
+doesn't work on Windows, where Porcupine always starts normally.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sys
+import tkinter
+from pathlib import Path
+
+from porcupine import dirs, get_main_window, get_tab_manager, tabs
+
+log = logging.getLogger(__name__)
+
+# If the running Porcupine doesn't respond within this time, it is probably
+# frozen, and a new Porcupine is started instead
+_TIMEOUT_SECONDS = 5
+
+_listening_socket: socket.socket | None = None
+
+
+def _get_socket_path() -> Path:
+    return dirs.cache_dir / "instance.sock"
+
+
+def _connect() -> socket.socket | None:
+    if sys.platform == "win32":
+        return None
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(_TIMEOUT_SECONDS)
+        try:
+            sock.connect(str(_get_socket_path()))
+        except OSError:
+            # Not running, or it crashed and left behind the socket file
+            sock.close()
+            return None
+        return sock
+
+
+def send_files_to_running_porcupine(file_args: list[str], stdin_contents: list[str]) -> bool:
+    """Ask an already running Porcupine to open the files.
+
+    The file arguments are given like on the command line, and ``-`` means
+    stdin. The caller reads stdin beforehand, so that nothing is lost if
+    sending fails, and *stdin_contents* contains a string for each ``-``.
+    Returns False if Porcupine isn't running or it didn't respond.
+    """
+    sock = _connect()
+    if sock is None:
+        return False
+
+    with sock:
+        contents = iter(stdin_contents)
+        files: list[dict[str, str]] = []
+        for arg in file_args:
+            if arg == "-":
+                files.append({"content": next(contents)})
+            else:
+                # The running Porcupine may have a different working directory
+                files.append({"path": str(Path(arg).absolute())})
+
+        try:
+            sock.sendall(json.dumps({"files": files}).encode("utf-8"))
+            sock.shutdown(socket.SHUT_WR)
+            return sock.recv(100) == b"ok"
+        except OSError:
+            return False
+
+
+class _Connection:
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._received = bytearray()
+        sock.setblocking(False)
+        if sys.platform != "win32":  # for mypy, this module does nothing on windows
+            get_main_window().tk.createfilehandler(sock, tkinter.READABLE, self._on_readable)
+
+    def _on_readable(self, sock: socket.socket, mask: int) -> None:
+        try:
+            chunk = self._sock.recv(64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError:
+            log.warning("receiving files to open failed", exc_info=True)
+            chunk = b""
+            self._received.clear()  # don't open anything
+
+        if chunk:
+            self._received += chunk
+            return
+
+        if sys.platform != "win32":
+            get_main_window().tk.deletefilehandler(self._sock)
+
+        if not self._received:
+            self._sock.close()
+            return
+
+        # Respond before opening the files, so that the other process exits
+        # even if opening a file shows a dialog
+        try:
+            self._sock.setblocking(True)
+            self._sock.sendall(b"ok")
+        except OSError:
+            log.warning("responding to another Porcupine process failed", exc_info=True)
+        self._sock.close()
+        _open_files(json.loads(self._received))
+
+
+def _open_files(message: dict[str, list[dict[str, str]]]) -> None:
+    log.info(f"opening {len(message['files'])} files from another Porcupine process")
+
+    tabmanager = get_tab_manager()
+    for file in message["files"]:
+        if "path" in file:
+            tabmanager.open_file(Path(file["path"]))
+        else:
+            tabmanager.add_tab(tabs.FileTab(tabmanager, content=file["content"]))
+
+    window = get_main_window()
+    window.deiconify()
+    window.lift()
+    window.focus_force()
+
+
+def _on_new_connection(listening_socket: socket.socket, mask: int) -> None:
+    try:
+        sock, address = listening_socket.accept()
+    except BlockingIOError:
+        return
+    _Connection(sock)
+
+
+def start_listening() -> None:
+    global _listening_socket
+
+    if sys.platform == "win32":
+        return
+    else:
+        sock = _connect()
+        if sock is not None:
+            # Started with --new-instance, and another Porcupine is already listening
+            sock.close()
+            return
+
+        path = _get_socket_path()
+        path.unlink(missing_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Other users must not open files in your Porcupine. Setting the
+        # permissions after bind() would leave a moment when they could.
+        old_umask = os.umask(0o077)
+        try:
+            sock.bind(str(path))
+            sock.listen()
+        except OSError:
+            # e.g. the path is too long for a Unix socket
+            log.warning(f"cannot listen on {path} for files to open", exc_info=True)
+            sock.close()
+            return
+        finally:
+            os.umask(old_umask)
+
+        log.debug(f"listening on {path} for files to open")
+        sock.setblocking(False)
+        get_main_window().tk.createfilehandler(sock, tkinter.READABLE, _on_new_connection)
+        _listening_socket = sock
+
+
+def stop_listening() -> None:
+    global _listening_socket
+
+    if sys.platform != "win32" and _listening_socket is not None:
+        get_main_window().tk.deletefilehandler(_listening_socket)
+        _listening_socket.close()
+        _listening_socket = None
+        _get_socket_path().unlink(missing_ok=True)
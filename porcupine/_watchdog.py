@@ -0,0 +1,292 @@
+"""Find out which plugin makes Porcupine freeze or feel laggy.
+
+A heartbeat callback runs in the Tk event loop every 100 milliseconds. If it
+runs late, something has blocked the event loop, and a warning is logged.
+While the event loop is blocked, a separate thread records what the main
+thread is doing. Porcupine also measures how long each Python callback (key
+bindings, after() callbacks, tab callbacks etc) takes, and groups the results
+by the module that defines the callback, which is usually a plugin.
+
+To see the results, run ``print_lag_report()`` in the debug prompt, which is
+in the "Run" menu.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
+import functools
+import logging
+import sys
+import threading
+import time
+import tkinter
+import traceback
+import types
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from typing import Any, TextIO
+
+log = logging.getLogger(__name__)
+
+_HEARTBEAT_INTERVAL_MS = 100
+# The event loop counts as blocked when the heartbeat runs this much late
+LAG_THRESHOLD_MS = 200
+# Callbacks that take longer than this are logged
+SLOW_CALLBACK_MS = 100
+# print_lag_report() shows this many of the latest slow callbacks and lags
+_HISTORY_LENGTH = 20
+
+
+@dataclasses.dataclass
+class _CallbackStats:
+    calls: int = 0
+    total_time: float = 0  # seconds
+    max_time: float = 0  # seconds
+
+
+@dataclasses.dataclass
+class _SlowCallback:
+    module: str
+    name: str
+    duration: float  # seconds
+
+
+@dataclasses.dataclass
+class _Lag:
+    end_time: datetime
+    duration: float  # seconds
+    slow_callbacks: list[_SlowCallback]
+    main_thread_stack: str | None  # None if the watchdog thread didn't notice the lag
+
+
+_stats_by_module: collections.defaultdict[str, _CallbackStats] = collections.defaultdict(
+    _CallbackStats
+)
+_slow_callbacks: collections.deque[_SlowCallback] = collections.deque(maxlen=_HISTORY_LENGTH)
+_lags: collections.deque[_Lag] = collections.deque(maxlen=_HISTORY_LENGTH)
+
+# None when not running
+_root: tkinter.Tk | None = None
+_heartbeat_after_id: str | None = None
+_stop_event: threading.Event | None = None
+
+# Time spent in nested callbacks, e.g. when a callback uses event_generate(),
+# so that the outer callback doesn't get blamed for the inner callbacks
+_nested_time_stack: list[float] = []
+_slow_callbacks_since_heartbeat: list[_SlowCallback] = []
+
+# These are used by the watchdog thread too
+_lock = threading.Lock()
+_last_heartbeat = 0.0  # time.perf_counter() value
+_heartbeat_count = 0
+_main_thread_stack: str | None = None
+
+_original_call_wrapper_call = tkinter.CallWrapper.__call__
+
+# tkinter's after() wraps the function into a nested function with this code
+_AFTER_WRAPPER_CODE = next(
+    (const for const in tkinter.Misc.after.__code__.co_consts if isinstance(const, types.CodeType)),
+    None,
+)
+
+
+def _unwrap(func: Callable[..., Any]) -> Callable[..., Any]:
+    while True:
+        if isinstance(func, functools.partial):
+            func = func.func
+        elif (
+            isinstance(func, types.FunctionType)
+            and func.__code__ is _AFTER_WRAPPER_CODE
+            and func.__closure__ is not None
+            and "func" in func.__code__.co_freevars
+        ):
+            cells = dict(zip(func.__code__.co_freevars, func.__closure__))
+            func = cells["func"].cell_contents
+        else:
+            return func
+
+
+def _describe_callback(func: Callable[..., Any]) -> tuple[str, str]:
+    func = _unwrap(func)
+    module = getattr(func, "__module__", None) or type(func).__module__
+    name = getattr(func, "__qualname__", None) or type(func).__qualname__
+    return (module, name)
+
+
+def _record(func: Callable[..., Any], duration: float) -> None:
+    module, name = _describe_callback(func)
+    stats = _stats_by_module[module]
+    stats.calls += 1
+    stats.total_time += duration
+    stats.max_time = max(stats.max_time, duration)
+
+    if duration > SLOW_CALLBACK_MS / 1000:
+        log.warning(f"{module}.{name} blocked the event loop for {duration*1000:.0f}ms")
+        slow_callback = _SlowCallback(module, name, duration)
+        _slow_callbacks.append(slow_callback)
+        _slow_callbacks_since_heartbeat.append(slow_callback)
+
+
+@contextlib.contextmanager
+def measure_callback(func: Callable[..., Any]) -> Iterator[None]:
+    """Measure how long the ``with`` block runs, and blame it on ``func``."""
+    if _root is None:
+        yield
+        return
+
+    _nested_time_stack.append(0)
+    heartbeat_count = _heartbeat_count
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        duration = end - start
+        nested_time = _nested_time_stack.pop()
+        if _nested_time_stack:
+            _nested_time_stack[-1] += duration
+
+        blocking_time = duration - nested_time
+        if _heartbeat_count != heartbeat_count:
+            # The callback ran a nested event loop, e.g. a dialog with
+            # wait_window(), and the event loop was not blocked while waiting.
+            # Blame only the time after the latest heartbeat.
+            blocking_time = max(0, min(blocking_time, end - _last_heartbeat))
+        _record(func, blocking_time)
+
+
+# Tkinter runs all Python callbacks with CallWrapper, including bind(),
+# utils.bind_with_data(), after() and command= callbacks
+def _call_and_measure(self: tkinter.CallWrapper, *args: Any) -> Any:
+    with measure_callback(self.func):
+        return _original_call_wrapper_call(self, *args)
+
+
+def install_callback_timing() -> None:
+    """Make tkinter callbacks measurable.
+
+    Tkinter stores ``CallWrapper(...).__call__`` when a callback is
+    registered, so this must be called before creating the main window and
+    setting up plugins. Callbacks are measured only while the watchdog runs.
+    """
+    tkinter.CallWrapper.__call__ = _call_and_measure  # type: ignore[method-assign]
+
+
+def _heartbeat() -> None:
+    global _heartbeat_after_id, _last_heartbeat, _heartbeat_count, _main_thread_stack
+    assert _root is not None
+
+    with _lock:
+        now = time.perf_counter()
+        lag = now - _last_heartbeat - _HEARTBEAT_INTERVAL_MS / 1000
+        _last_heartbeat = now
+        _heartbeat_count += 1
+        stack = _main_thread_stack
+        _main_thread_stack = None
+
+    if lag > LAG_THRESHOLD_MS / 1000:
+        _lags.append(_Lag(datetime.now(), lag, _slow_callbacks_since_heartbeat.copy(), stack))
+        message = f"event loop was blocked for {lag*1000:.0f}ms"
+        if _slow_callbacks_since_heartbeat:
+            message += ", slow callbacks: " + ", ".join(
+                f"{callback.module}.{callback.name} ({callback.duration*1000:.0f}ms)"
+                for callback in _slow_callbacks_since_heartbeat
+            )
+        if stack is not None:
+            message += f"\nthe main thread was here:\n{stack}"
+        log.warning(message)
+
+    _slow_callbacks_since_heartbeat.clear()
+    _heartbeat_after_id = _root.after(_HEARTBEAT_INTERVAL_MS, _heartbeat)
+
+
+def _watch_main_thread(main_thread_id: int, stop_event: threading.Event) -> None:
+    global _main_thread_stack
+
+    max_heartbeat_interval = (_HEARTBEAT_INTERVAL_MS + LAG_THRESHOLD_MS) / 1000
+    while not stop_event.wait(LAG_THRESHOLD_MS / 1000 / 2):
+        with _lock:
+            if (
+                _main_thread_stack is not None
+                or time.perf_counter() - _last_heartbeat < max_heartbeat_interval
+            ):
+                continue
+            frame = sys._current_frames().get(main_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            _main_thread_stack = stack
+
+        # If Porcupine is frozen for good, this is the only way to find out why
+        log.debug(f"event loop is blocked, the main thread is here:\n{stack}")
+
+
+def start(root: tkinter.Tk) -> None:
+    global _root, _heartbeat_after_id, _stop_event, _last_heartbeat
+    assert _root is None
+
+    if tkinter.CallWrapper.__call__ is not _call_and_measure:
+        log.warning("install_callback_timing() wasn't called, callbacks won't be measured")
+    _root = root
+    _last_heartbeat = time.perf_counter()
+    _heartbeat_after_id = root.after(_HEARTBEAT_INTERVAL_MS, _heartbeat)
+
+    _stop_event = threading.Event()
+    threading.Thread(
+        target=_watch_main_thread, args=[threading.get_ident(), _stop_event], daemon=True
+    ).start()
+
+
+def stop() -> None:
+    global _root, _heartbeat_after_id, _stop_event
+
+    if _root is not None:
+        assert _heartbeat_after_id is not None
+        assert _stop_event is not None
+
+        try:
+            _root.after_cancel(_heartbeat_after_id)
+        except tkinter.TclError:
+            # main window destroyed
+            pass
+        _stop_event.set()
+        _root = None
+        _heartbeat_after_id = None
+        _stop_event = None
+
+
+def print_lag_report(file: TextIO | None = None) -> None:
+    """Print what has been slow in this Porcupine process.
+
+    This is meant to be called from the debug prompt.
+    """
+    print(f"Latest times when the event loop was blocked ({len(_lags)}):", file=file)
+    for lag in _lags:
+        print(f"  {lag.end_time:%H:%M:%S}  {lag.duration*1000:.0f}ms", file=file)
+        for callback in lag.slow_callbacks:
+            print(
+                f"    {callback.duration*1000:8.1f}ms  {callback.module}.{callback.name}", file=file
+            )
+        if lag.main_thread_stack is not None:
+            print("    the main thread was here:", file=file)
+            for line in lag.main_thread_stack.splitlines():
+                print(f"    {line}", file=file)
+    print(file=file)
+
+    print(f"Latest slow callbacks ({len(_slow_callbacks)}):", file=file)
+    for callback in _slow_callbacks:
+        print(f"  {callback.duration*1000:8.1f}ms  {callback.module}.{callback.name}", file=file)
+    print(file=file)
+
+    print("Time spent in callbacks by module:", file=file)
+    print(f"  {'total':>10}  {'slowest':>10}  {'calls':>7}  module", file=file)
+    for module, stats in sorted(
+        _stats_by_module.items(), key=(lambda item: item[1].total_time), reverse=True
+    ):
+        print(
+            f"  {stats.total_time*1000:8.1f}ms  {stats.max_time*1000:8.1f}ms"
+            f"  {stats.calls:>7}  {module}",
+            file=file,
+        )
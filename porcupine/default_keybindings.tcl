@@ -87,6 +87,9 @@ event add "<<Menubar:Edit/Sort Lines>>" <$alt_ish-s>
 # poppingtabs plugin
 event add "<<Menubar:View/Pop Tab>>" <$control_ish-P>
 
+# quick_open plugin
+event add "<<Menubar:File/Quick Open>>" <$control_ish-p>
+
 # directory tree plugin (don't use <$alt_ish-t>, see #425)
 event add "<<Menubar:View/Focus/Directory tree>>" <$alt_ish-D>
 
@@ -214,6 +214,48 @@ def add_config_file_button(path: Path, *, menu: str = "Settings/Config Files") -
     )
 
 
+# Plugins with lazy_menu_items get placeholder menu items on startup. When a
+# placeholder is clicked, the plugin is set up, and it adds the real menu
+# item to the end of the menu. The real item is then moved to where the
+# placeholder is, so that the order of menu items doesn't change.
+def _add_placeholder_item(path: str, set_up_plugin: Callable[[], None]) -> None:
+    menu_path, label = _split_parent(path)
+    menu = get_menu(menu_path)
+
+    def on_click() -> None:
+        set_up_plugin()
+        index = _find_item(menu, label)
+        if index is not None and menu.entrycget(index, "state") != "disabled":
+            menu.invoke(index)
+
+    menu.add_command(label=label, command=on_click)
+
+
+def _replace_placeholder_item(path: str) -> None:
+    menu_path, label = _split_parent(path)
+    menu = get_menu(menu_path)
+    last_index = menu.index("end")
+    assert last_index is not None
+    indexes = [
+        index
+        for index in range(last_index + 1)
+        if menu.type(index) in _MENU_ITEM_TYPES_WITH_LABEL
+        and menu.entrycget(index, "label") == label
+    ]
+
+    if len(indexes) == 1:
+        # Setting up the plugin failed. Don't delete, that would change indexes.
+        log.warning(f"the plugin didn't add a menu item to replace placeholder: {path}")
+        menu.entryconfig(indexes[0], state="disabled")
+        return
+
+    placeholder_index = indexes[0]
+    real_index = indexes[-1]
+    menu.entryconfig(placeholder_index, command=menu.entrycget(real_index, "command"))
+    # menu.delete() would also delete the Tcl command that runs the callback
+    menu.tk.call(menu, "delete", real_index)
+
+
 def _walk_menu_contents(
     menu: tkinter.Menu, path_prefix: list[str] = []
 ) -> Iterator[tuple[str, tkinter.Menu, int]]:
@@ -17,18 +17,22 @@ while Porcupine is running.
 from __future__ import annotations
 
 import argparse
+import ast
 import dataclasses
 import enum
 import importlib.machinery
+import json
 import logging
 import pkgutil
 import random
 import time
 import traceback
 from collections.abc import Callable, Iterator, Sequence
+from functools import partial
+from pathlib import Path
 from typing import Any, TypeVar, cast
 
-from porcupine import get_main_window
+from porcupine import _profiling, dirs, get_main_window, utils
 from porcupine.plugins import __path__ as plugin_paths
 from porcupine.settings import global_settings
 
@@ -45,6 +49,11 @@ class Status(enum.Enum):
     # The plugin was imported and its `setup()` function was called successfully.
     ACTIVE = enum.auto()
 
+    # The plugin will be imported and set up later, when it is needed for the
+    # first time. See `lazy_menu_items` and `setup_after_startup` in
+    # dev-doc/plugin-structure.md.
+    WAITING = enum.auto()
+
     # The plugin wasn't loaded because it's in the `disabled_plugins` setting.
     # See `porcupine.settings`.
     DISABLED_BY_SETTINGS = enum.auto()
@@ -110,6 +119,163 @@ _dependencies: dict[PluginInfo, set[PluginInfo]] = {}
 plugin_infos: Sequence[PluginInfo] = _mutable_plugin_infos  # don't modify outside this file
 
 
+# Things that Porcupine needs to know about a plugin before importing it.
+# They are read from the source code, because that's much faster than
+# importing, and cached in dirs.cache_dir.
+@dataclasses.dataclass
+class _ManifestEntry:
+    setup_before: list[str]
+    setup_after: list[str]
+    has_setup_argument_parser: bool
+    lazy_menu_items: list[str]
+    setup_after_startup: bool
+
+
+_manifest_entries: dict[PluginInfo, _ManifestEntry] = {}
+_waiting_for_startup: list[PluginInfo] = []
+
+_MANIFEST_VARIABLES: dict[str, type] = {
+    "setup_before": list,
+    "setup_after": list,
+    "lazy_menu_items": list,
+    "setup_after_startup": bool,
+}
+
+
+def _binds_manifest_name(node: ast.AST) -> bool:
+    names = _MANIFEST_VARIABLES.keys() | {"setup_argument_parser"}
+    return any(
+        (isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Store) and sub.id in names)
+        or (isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef)) and sub.name in names)
+        or (isinstance(sub, ast.alias) and (sub.asname or sub.name) in names)
+        for sub in ast.walk(node)
+    )
+
+
+# Returns None if the plugin must be imported to find out what it contains,
+# e.g. when setup_after is not a list literal.
+def _read_manifest_entry(path: Path) -> _ManifestEntry | None:
+    try:
+        module = ast.parse(path.read_bytes())
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    values: dict[str, Any] = {}
+    has_setup_argument_parser = False
+
+    for node in module.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name == "setup_argument_parser":
+                has_setup_argument_parser = True
+            elif node.name in _MANIFEST_VARIABLES:
+                return None
+        elif isinstance(node, ast.ClassDef):
+            pass
+        elif (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and node.targets[0].id in _MANIFEST_VARIABLES
+        ):
+            name = node.targets[0].id
+            try:
+                value = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+            if not isinstance(value, _MANIFEST_VARIABLES[name]) or (
+                isinstance(value, list) and not all(isinstance(item, str) for item in value)
+            ):
+                return None
+            values[name] = value
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound_name = alias.asname or alias.name
+                if bound_name == "setup_argument_parser":
+                    has_setup_argument_parser = True
+                elif bound_name == "*" or bound_name in _MANIFEST_VARIABLES:
+                    return None
+        elif _binds_manifest_name(node):
+            # e.g. defined inside "if", can't know without running the code
+            return None
+
+    return _ManifestEntry(
+        setup_before=values.get("setup_before", []),
+        setup_after=values.get("setup_after", []),
+        has_setup_argument_parser=has_setup_argument_parser,
+        lazy_menu_items=values.get("lazy_menu_items", []),
+        setup_after_startup=values.get("setup_after_startup", False),
+    )
+
+
+def _get_manifest_path() -> Path:
+    return dirs.cache_dir / "plugin_manifest.json"
+
+
+def _load_manifest() -> dict[str, Any]:
+    try:
+        with _get_manifest_path().open("r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        log.warning("reading the plugin manifest failed", exc_info=True)
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _save_manifest(manifest: dict[str, Any]) -> None:
+    try:
+        # A crash while writing must not leave behind a half-written manifest
+        utils.write_atomically(_get_manifest_path(), json.dumps(manifest, indent=2))
+    except OSError:
+        log.warning("saving the plugin manifest failed", exc_info=True)
+
+
+def _get_plugin_file(finder: object, name: str) -> Path | None:
+    if not isinstance(finder, importlib.machinery.FileFinder):
+        return None
+    spec = finder.find_spec(name)
+    if spec is None or spec.origin is None or not spec.has_location:
+        return None
+    return Path(spec.origin)
+
+
+# Updates the manifest, which is {path: {"mtime_ns": ..., "size": ..., "entry": ...}}
+def _get_manifest_entry(
+    path: Path | None, old_manifest: dict[str, Any], new_manifest: dict[str, Any]
+) -> _ManifestEntry | None:
+    if path is None:
+        return None
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return None
+
+    cached = old_manifest.get(str(path))
+    entry = None
+    if (
+        isinstance(cached, dict)
+        and cached.get("mtime_ns") == stat_result.st_mtime_ns
+        and cached.get("size") == stat_result.st_size
+    ):
+        if cached.get("entry") is None:
+            entry = None
+        else:
+            try:
+                entry = _ManifestEntry(**cached["entry"])
+            except TypeError:
+                entry = _read_manifest_entry(path)
+    else:
+        entry = _read_manifest_entry(path)
+
+    new_manifest[str(path)] = {
+        "mtime_ns": stat_result.st_mtime_ns,
+        "size": stat_result.st_size,
+        "entry": None if entry is None else dataclasses.asdict(entry),
+    }
+    return entry
+
+
 def _run_setup_argument_parser_function(info: PluginInfo, parser: argparse.ArgumentParser) -> None:
     assert info.status == Status.LOADING
     assert info.module is not None
@@ -135,7 +301,8 @@ def _import_plugin(info: PluginInfo) -> None:
     start = time.perf_counter()
 
     try:
-        info.module = importlib.import_module(f"porcupine.plugins.{info.name}")
+        with _profiling.measure(f"import porcupine.plugins.{info.name}", "plugin import"):
+            info.module = importlib.import_module(f"porcupine.plugins.{info.name}")
         setup_before = set(getattr(info.module, "setup_before", []))
         setup_after = set(getattr(info.module, "setup_after", []))
     except Exception:
@@ -144,15 +311,19 @@ def _import_plugin(info: PluginInfo) -> None:
         info.error = traceback.format_exc()
         return
 
+    _add_dependencies(info, setup_before, setup_after)
+
+    duration = time.perf_counter() - start
+    log.debug("imported porcupine.plugins.%s in %.3f milliseconds", info.name, duration * 1000)
+
+
+def _add_dependencies(info: PluginInfo, setup_before: set[str], setup_after: set[str]) -> None:
     for dep_info in plugin_infos:
         if dep_info.name in setup_after:
             _dependencies[info].add(dep_info)
         if dep_info.name in setup_before:
             _dependencies[dep_info].add(info)
 
-    duration = time.perf_counter() - start
-    log.debug("imported porcupine.plugins.%s in %.3f milliseconds", info.name, duration * 1000)
-
 
 # Remember to generate <<PluginsLoaded>> when this succeeds
 def _run_setup_and_set_status(info: PluginInfo) -> None:
@@ -170,7 +341,8 @@ def _run_setup_and_set_status(info: PluginInfo) -> None:
         start = time.perf_counter()
         try:
             log.debug(f"calling porcupine.plugins.{info.name}.setup()")
-            info.module.setup()
+            with _profiling.measure(f"{info.name}.setup()", "plugin setup"):
+                info.module.setup()
         except Exception:
             log.exception(f"{info.name}.setup() doesn't work")
             info.status = Status.SETUP_FAILED
@@ -209,19 +381,24 @@ def _did_plugin_come_with_porcupine(finder: object) -> bool:
 # undocumented on purpose, don't use in plugins
 def import_plugins(disabled_on_command_line: list[str]) -> None:
     assert not _mutable_plugin_infos and not _dependencies
-    _mutable_plugin_infos.extend(
-        PluginInfo(
-            name=name,
-            came_with_porcupine=_did_plugin_come_with_porcupine(finder),
-            status=Status.LOADING,
-            module=None,
-            error=None,
-        )
-        for finder, name, is_pkg in pkgutil.iter_modules(plugin_paths)
-        if not name.startswith("_")
-    )
+    plugin_files: dict[str, Path | None] = {}
+    for finder, name, is_pkg in pkgutil.iter_modules(plugin_paths):
+        if not name.startswith("_"):
+            _mutable_plugin_infos.append(
+                PluginInfo(
+                    name=name,
+                    came_with_porcupine=_did_plugin_come_with_porcupine(finder),
+                    status=Status.LOADING,
+                    module=None,
+                    error=None,
+                )
+            )
+            plugin_files[name] = _get_plugin_file(finder, name)
     _dependencies.update({info: set() for info in plugin_infos})
 
+    old_manifest = _load_manifest()
+    new_manifest: dict[str, Any] = {}
+
     for info in _mutable_plugin_infos:
         # If it's disabled in settings and on command line, then status is set
         # to DISABLED_BY_SETTINGS. This makes more sense for the user of the
@@ -232,14 +409,26 @@ def import_plugins(disabled_on_command_line: list[str]) -> None:
         if info.name in disabled_on_command_line:
             info.status = Status.DISABLED_ON_COMMAND_LINE
             continue
-        _import_plugin(info)
+
+        entry = _get_manifest_entry(plugin_files[info.name], old_manifest, new_manifest)
+        if entry is None or entry.has_setup_argument_parser:
+            # setup_argument_parser() runs before setup(), so import now
+            _import_plugin(info)
+        else:
+            # Import later, just before calling setup()
+            _manifest_entries[info] = entry
+            _add_dependencies(info, set(entry.setup_before), set(entry.setup_after))
+
+    if new_manifest != old_manifest:
+        _save_manifest(new_manifest)
 
 
 # undocumented on purpose, don't use in plugins
 # TODO: document what setup_argument_parser() function in a plugin does
 def run_setup_argument_parser_functions(parser: argparse.ArgumentParser) -> None:
     for info in plugin_infos:
-        if info.status == Status.LOADING:
+        # Plugins not imported yet don't have setup_argument_parser(), see import_plugins()
+        if info.status == Status.LOADING and info.module is not None:
             _run_setup_argument_parser_function(info, parser)
 
 
@@ -293,8 +482,30 @@ def _decide_loading_order(
             deps.difference_update(forget_about)
 
 
+# Plugins can wait only if no plugin that is set up now must be set up after them
+def _decide_which_plugins_wait(loading_order: list[PluginInfo]) -> set[PluginInfo]:
+    waiting = {
+        info
+        for info in loading_order
+        if info in _manifest_entries
+        and (_manifest_entries[info].lazy_menu_items or _manifest_entries[info].setup_after_startup)
+    }
+
+    something_changed = True
+    while something_changed:
+        something_changed = False
+        for info in loading_order:
+            if info not in waiting and _dependencies[info] & waiting:
+                waiting -= _dependencies[info]
+                something_changed = True
+
+    return waiting
+
+
 def run_setup_functions(shuffle: bool) -> None:
     """Called during Porcupine startup. Do not call from plugins."""
+    from porcupine import menubar  # menubar imports this file
+
     loading_order = []
     for infos in _decide_loading_order(_dependencies, _handle_circular_dependency):
         load_list = [info for info in infos if info.status == Status.LOADING]
@@ -308,13 +519,58 @@ def run_setup_functions(shuffle: bool) -> None:
             load_list.sort(key=(lambda info: info.name))
         loading_order.extend(load_list)
 
+    waiting = _decide_which_plugins_wait(loading_order)
+
     for info in loading_order:
         assert info.status == Status.LOADING
-        _run_setup_and_set_status(info)
+        if info in waiting:
+            info.status = Status.WAITING
+            entry = _manifest_entries[info]
+            # Add placeholders now, so that menu items stay in the same order
+            for path in entry.lazy_menu_items:
+                menubar._add_placeholder_item(path, partial(_set_up_waiting_plugin, info))
+            if entry.setup_after_startup:
+                _waiting_for_startup.append(info)
+            continue
+
+        if info.module is None:
+            _import_plugin(info)
+        # See setup_while_running() for why cast is needed
+        if cast(object, info.status) == Status.LOADING:
+            _run_setup_and_set_status(info)
 
     get_main_window().event_generate("<<PluginsLoaded>>")
 
 
+def _set_up_waiting_plugin(info: PluginInfo) -> None:
+    from porcupine import menubar  # menubar imports this file
+
+    if info.status != Status.WAITING:
+        return
+
+    for dependency in _dependencies[info]:
+        _set_up_waiting_plugin(dependency)
+
+    log.debug(f"setting up {info.name} now, it was waiting until it is needed")
+    info.status = Status.LOADING
+    if info.module is None:
+        _import_plugin(info)
+    if info.status == Status.LOADING:
+        _run_setup_and_set_status(info)
+
+    for path in _manifest_entries[info].lazy_menu_items:
+        menubar._replace_placeholder_item(path)
+    if info.status == Status.ACTIVE:
+        get_main_window().event_generate("<<PluginsLoaded>>")
+
+
+def run_setup_functions_after_startup() -> None:
+    """Called when the Porcupine window is ready to use. Do not call from plugins."""
+    for info in _waiting_for_startup:
+        _set_up_waiting_plugin(info)
+    _waiting_for_startup.clear()
+
+
 def can_setup_while_running(info: PluginInfo) -> bool:
     """
     Returns whether the plugin can be set up now, without having to
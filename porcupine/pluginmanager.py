@@ -160,6 +160,7 @@ class PluginDialogContent:
             message = {
                 # it should be impossible to get here with LOADING status
                 pluginloader.Status.ACTIVE: "Active",
+                pluginloader.Status.WAITING: "Loads when needed",
                 pluginloader.Status.DISABLED_BY_SETTINGS: "Disabled",
                 pluginloader.Status.DISABLED_ON_COMMAND_LINE: "Disabled on command line",
                 pluginloader.Status.IMPORT_FAILED: "Importing failed",
@@ -16,6 +16,9 @@ from tkinter import ttk
 from porcupine import __version__ as porcupine_version
 from porcupine import get_main_window, images, menubar, plugins, textutils, utils
 
+# Import and set up this plugin when the menu item is used for the first time
+lazy_menu_items = ["Help/About Porcupine"]
+
 
 def get_link_opener(match: re.Match[str]) -> Callable[[], object]:
     url = match.group(2)
@@ -2,7 +2,8 @@
 
 To get the most out of this plugin, you also need some other plugin such as the
 langserver plugin. If no such plugin is loaded, then this plugin falls back to
-"all words in file" style autocompletions.
+"all words in file" style autocompletions. The fallback also looks at words in
+other open tabs, and optionally in all files of the project.
 """
 
 # If your plugin sets up an autocompleter, it should be setup before this
@@ -11,16 +12,23 @@ langserver plugin. If no such plugin is loaded, then this plugin falls back to
 
 from __future__ import annotations
 
+import bisect
 import collections
 import dataclasses
 import itertools
 import logging
+import os
 import re
+import threading
+import time
 import tkinter
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from pathlib import Path
 from tkinter import ttk
 
 from porcupine import get_tab_manager, settings, tabs, textutils, utils
+from porcupine.plugins.file_watcher import PathsChanged
 from porcupine.settings import global_settings
 
 # autoindent: it shouldn't indent when pressing enter to choose completion
@@ -92,10 +100,19 @@ def _add_resize_handle(placed_widget: tkinter.Widget) -> ttk.Label:
     return handle
 
 
+# The treeview only contains the rows that are visible. Inserting thousands of
+# rows into a ttk.Treeview is slow, and it would happen on every key press
+# when filtering. The scrollbar is connected to this class instead of the
+# treeview, and row ids are indexes into the list of all completions.
 class _Popup:
     def __init__(self, textwidget: tkinter.Text) -> None:
         self._textwidget = textwidget
         self._completion_list: list[Completion] | None = None
+        self._first_shown_index = 0
+        self._selected_index: int | None = None
+        self._documented_index: int | None = None
+        self._doc_after_id: str | None = None
+        self._row_height: int | None = None  # pixels, measured when rows are shown
 
         self._panedwindow = utils.PanedWindow(self._textwidget, orient="horizontal")
 
@@ -116,7 +133,13 @@ class _Popup:
         self.treeview = ttk.Treeview(left_pane, show="tree", selectmode="browse")
         self.treeview.bind("<Motion>", self._on_mouse_move, add=True)
         self.treeview.bind("<<TreeviewSelect>>", self._on_select, add=True)
+        self.treeview.bind("<Configure>", (lambda event: self._show_rows()), add=True)
+        self.treeview.bind("<MouseWheel>", self._on_mouse_wheel, add=True)
+        self.treeview.bind("<Button-4>", self._on_mouse_wheel, add=True)
+        self.treeview.bind("<Button-5>", self._on_mouse_wheel, add=True)
         self._left_scrollbar = _pack_with_scrollbar(self.treeview)
+        self.treeview.config(yscrollcommand="")
+        self._left_scrollbar.config(command=self._on_scrollbar)
 
         self._doc_text = textutils.create_passive_text_widget(
             right_pane, width=50, height=15, wrap="word"
@@ -146,36 +169,109 @@ class _Popup:
     def is_completing(self) -> bool:
         return self._completion_list is not None
 
-    def _select_item(self, item_id: str) -> None:
-        self.treeview.selection_set(item_id)
-        self.treeview.see(item_id)
+    def _get_row_height(self) -> int:
+        # Row height depends on the font and the DPI, so measure a row if possible
+        children = self.treeview.get_children()
+        if children:
+            bbox = self.treeview.bbox(children[0])
+            if bbox:
+                self._row_height = bbox[3]
+
+        if self._row_height is None:
+            # Nothing shown yet, font size is better than nothing
+            font = self.treeview.tk.eval("ttk::style lookup Treeview -font") or "TkDefaultFont"
+            return int(self.treeview.tk.call("font", "metrics", font, "-linespace"))
+        return self._row_height
+
+    def _get_row_count(self) -> int:
+        # Number of rows that fit in the treeview. Doesn't include a partially
+        # visible row at the bottom.
+        return max(1, self.treeview.winfo_height() // max(1, self._get_row_height()))
+
+    def _show_rows(self) -> None:
+        if not self._completion_list:
+            self.treeview.delete(*self.treeview.get_children())
+            self._left_scrollbar.set(0, 1)
+            return
+
+        total = len(self._completion_list)
+        row_count = self._get_row_count()
+        self._first_shown_index = max(0, min(self._first_shown_index, total - row_count))
+        # One extra row, so that a partially visible row is shown at the bottom
+        end = min(total, self._first_shown_index + row_count + 1)
+
+        wanted_ids = [str(index) for index in range(self._first_shown_index, end)]
+        if list(self.treeview.get_children()) != wanted_ids:
+            self.treeview.delete(*self.treeview.get_children())
+            for item_id in wanted_ids:
+                self.treeview.insert(
+                    "", "end", id=item_id, text=self._completion_list[int(item_id)].display_text
+                )
+            self.treeview.yview_moveto(0)
+            if self._get_row_count() != row_count:
+                # Row height was guessed, now it can be measured
+                if self._selected_index is None:
+                    self._show_rows()
+                else:
+                    self._select_index(self._selected_index)
+                return
+
+        if self._selected_index is not None and self.treeview.exists(str(self._selected_index)):
+            if self.treeview.selection() != (str(self._selected_index),):
+                self.treeview.selection_set(str(self._selected_index))
+
+        self._left_scrollbar.set(
+            self._first_shown_index / total, min(1, (self._first_shown_index + row_count) / total)
+        )
+
+    def _scroll_to(self, first_index: int) -> None:
+        self._first_shown_index = first_index
+        self._show_rows()
+
+    def _select_index(self, index: int) -> None:
+        self._selected_index = index
+        row_count = self._get_row_count()
+        if index < self._first_shown_index:
+            self._first_shown_index = index
+        elif index >= self._first_shown_index + row_count:
+            self._first_shown_index = index - row_count + 1
+        self._show_rows()
+        self._update_doc_later()
 
     def _get_selected_completion(self) -> Completion | None:
-        if not self.is_completing():
+        if not self.is_completing() or self._selected_index is None:
             return None
         assert self._completion_list is not None
+        return self._completion_list[self._selected_index]
 
-        selected_ids = self.treeview.selection()
-        if not selected_ids:
-            return None
+    def _show_doc(self, text: str) -> None:
+        self._doc_text.config(state="normal")
+        self._doc_text.delete("1.0", "end")
+        self._doc_text.insert("1.0", text)
+        self._doc_text.config(state="disabled")
 
-        [the_id] = selected_ids
-        return self._completion_list[int(the_id)]
+    def _update_doc_now(self) -> None:
+        self._doc_after_id = None
+        completion = self._get_selected_completion()
+        if completion is not None and self._selected_index != self._documented_index:
+            self._documented_index = self._selected_index
+            self._show_doc(completion.documentation)
 
-    def set_completions(self, completion_list: list[Completion]) -> None:
-        self.treeview.delete(*self.treeview.get_children())
+    # When holding down an arrow key, only the last documentation is needed
+    def _update_doc_later(self) -> None:
+        if self._doc_after_id is None:
+            self._doc_after_id = self._textwidget.after_idle(self._update_doc_now)
 
+    def set_completions(self, completion_list: list[Completion]) -> None:
         self._completion_list = completion_list
+        self._first_shown_index = 0
+        self._documented_index = None
         if self._completion_list:
-            for index, completion in enumerate(self._completion_list):
-                # id=str(index) is used in the rest of this class
-                self.treeview.insert("", "end", id=str(index), text=completion.display_text)
-            self._select_item("0")
+            self._select_index(0)
         else:
-            self._doc_text.config(state="normal")
-            self._doc_text.delete("1.0", "end")
-            self._doc_text.insert("1.0", "No completions")
-            self._doc_text.config(state="disabled")
+            self._selected_index = None
+            self._show_rows()
+            self._show_doc("No completions")
 
     def start_completing(self) -> None:
         if textutils.place_popup(
@@ -186,53 +282,58 @@ class _Popup:
         ):
             self._panedwindow.update()  # _on_resize() uses current sizes
             self._on_resize()
+            self._show_rows()
 
     # does nothing if not currently completing
     def stop_completing(self) -> Completion | None:
         selected = self._get_selected_completion()
         self._panedwindow.place_forget()
         self._completion_list = None
+        self._selected_index = None
         return selected
 
     def select_previous(self) -> None:
         assert self.is_completing()
-        selected_ids = self.treeview.selection()
-        if selected_ids:
-            [the_id] = selected_ids
-            self._select_item(self.treeview.prev(the_id) or self.treeview.get_children()[-1])
+        assert self._completion_list is not None
+        if self._selected_index is not None:
+            self._select_index((self._selected_index - 1) % len(self._completion_list))
 
     def select_next(self) -> None:
         assert self.is_completing()
-        selected_ids = self.treeview.selection()
-        if selected_ids:
-            [the_id] = selected_ids
-            self._select_item(self.treeview.next(the_id) or self.treeview.get_children()[0])
+        assert self._completion_list is not None
+        if self._selected_index is not None:
+            self._select_index((self._selected_index + 1) % len(self._completion_list))
+
+    def _on_scrollbar(self, action: str, amount: str, what: str = "units") -> None:
+        if not self._completion_list:
+            return
+
+        if action == "moveto":
+            self._scroll_to(round(float(amount) * len(self._completion_list)))
+        elif action == "scroll":
+            step = self._get_row_count() if what == "pages" else 1
+            self._scroll_to(self._first_shown_index + int(amount) * step)
 
-    def _get_first_visible_id(self) -> int:
-        # First id is "0", second is "1" etc
-        for item_id in self.treeview.get_children():
-            if self.treeview.bbox(item_id):
-                return int(item_id)
-        raise RuntimeError("wut")
+    def _on_mouse_wheel(self, event: tkinter.Event[tkinter.Misc]) -> str:
+        if event.num == 4 or (event.num != 5 and event.delta > 0):
+            self._on_scrollbar("scroll", "-3")
+        else:
+            self._on_scrollbar("scroll", "3")
+        return "break"
 
     def on_page_up_down(self, event: tkinter.Event[tkinter.Misc]) -> str | None:
         if not self._panedwindow.winfo_ismapped():
             return None
+        assert self._completion_list is not None
 
         page_count = {"Prior": -1, "Next": 1}[event.keysym]
-        old_selection = self.treeview.selection()
-
-        old_first_visible = self._get_first_visible_id()
-        self.treeview.yview_scroll(page_count, "pages")
-        self.treeview.update()
-        new_first_visible = self._get_first_visible_id()
+        old_first_shown = self._first_shown_index
+        self._on_scrollbar("scroll", str(page_count), "pages")
+        rows_scrolled = self._first_shown_index - old_first_shown
 
         # Move selection as scrolled
-        if old_selection:
-            [old_id] = old_selection
-            rows_scrolled = new_first_visible - old_first_visible
-            new_id = str(int(old_id) + rows_scrolled)
-            self.treeview.selection_set(new_id)
+        if self._selected_index is not None and rows_scrolled != 0:
+            self._select_index(self._selected_index + rows_scrolled)
 
         return "break"
 
@@ -250,12 +351,321 @@ class _Popup:
             self.treeview.selection_set(hovered_id)
 
     def _on_select(self, event: tkinter.Event[tkinter.Misc]) -> None:
-        completion = self._get_selected_completion()
-        if completion is not None:
-            self._doc_text.config(state="normal")
-            self._doc_text.delete("1.0", "end")
-            self._doc_text.insert("1.0", completion.documentation)
-            self._doc_text.config(state="disabled")
+        # Selection becomes empty when rows are deleted while scrolling
+        selected_ids = self.treeview.selection()
+        if self.is_completing() and selected_ids:
+            [the_id] = selected_ids
+            self._selected_index = int(the_id)
+            self._update_doc_later()
+
+
+# Counting words of other tabs and project files takes a while, so it's done
+# in a thread. One thread is enough: updates get applied in the order they
+# were submitted, and the GUI thread only needs the results.
+_index_pool = ThreadPoolExecutor(max_workers=1)
+
+# Don't index huge files, they would likely be generated or minified junk.
+# Same limit as when opening files in tabs.
+_MAX_INDEXED_FILE_SIZE = 1_000_000
+
+
+def _count_words(text: str) -> collections.Counter[str]:
+    return collections.Counter(re.findall(r"\w+", text))
+
+
+def _read_text_file(path: Path) -> str | None:
+    try:
+        if path.stat().st_size > _MAX_INDEXED_FILE_SIZE:
+            return None
+        content = path.read_bytes()
+    except OSError:
+        return None
+
+    if b"\0" in content:
+        # likely an image or some other binary file
+        return None
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class _WordIndex:
+    """Word counts of other open tabs and files in the same projects.
+
+    Keys are tab widget names for open tabs, and paths for files that aren't
+    open. Counts are replaced as a whole whenever something changes, and
+    totals over all keys are kept up to date so that looking up completions
+    doesn't need to loop through every file. Words are also kept in a list
+    sorted case-insensitively, so that words starting with what the user
+    typed can be found with bisect instead of looping through every word.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: dict[str | Path, collections.Counter[str]] = {}
+        self._total_counts: collections.Counter[str] = collections.Counter()
+        self._entry_count = 0  # sum of len(counter) over all counters, for memory budget
+        self._mtimes: dict[Path, float] = {}
+        # May contain words no longer in _total_counts, and lacks _new_words
+        self._sorted_words: list[str] = []
+        self._new_words: set[str] = set()
+        self._stale_word_count = 0
+        self._live_tabs: set[str] = set()
+        self._projects_being_scanned: set[Path] = set()
+
+    # must be called with the lock held
+    def _replace_counts(self, key: str | Path, new_counts: collections.Counter[str] | None) -> None:
+        old_counts = self._counts.pop(key, None)
+        if old_counts is not None:
+            self._entry_count -= len(old_counts)
+            self._total_counts.subtract(old_counts)
+            for word in old_counts:
+                if self._total_counts[word] <= 0:
+                    del self._total_counts[word]
+                    self._stale_word_count += 1
+
+        if new_counts is not None:
+            self._counts[key] = new_counts
+            self._entry_count += len(new_counts)
+            self._new_words.update(word for word in new_counts if word not in self._total_counts)
+            self._total_counts.update(new_counts)
+
+    # runs in a thread, after the counts have changed
+    def _update_sorted_words(self) -> None:
+        with self._lock:
+            if len(self._new_words) + self._stale_word_count < len(self._sorted_words) // 10 + 100:
+                for word in self._new_words:
+                    folded = word.casefold()
+                    start = bisect.bisect_left(self._sorted_words, folded, key=str.casefold)
+                    end = bisect.bisect_right(self._sorted_words, folded, key=str.casefold)
+                    if word not in self._sorted_words[start:end]:
+                        self._sorted_words.insert(start, word)
+                self._new_words.clear()
+                return
+
+            # Only this thread adds words, so nothing is missing after sorting
+            words = list(self._total_counts)
+            self._new_words.clear()
+            self._stale_word_count = 0
+
+        # Sorting can take a while, don't block completions meanwhile
+        words.sort(key=str.casefold)
+        with self._lock:
+            self._sorted_words = words
+
+    def add_tab(self, tab_name: str) -> None:
+        with self._lock:
+            self._live_tabs.add(tab_name)
+
+    def remove_tab(self, tab_name: str) -> None:
+        with self._lock:
+            self._live_tabs.discard(tab_name)
+            self._replace_counts(tab_name, None)
+
+    def forget_tab_counts(self, tab_name: str) -> None:
+        with self._lock:
+            self._replace_counts(tab_name, None)
+
+    # runs in a thread
+    def _update_tab(self, tab_name: str, text: str) -> None:
+        counts = _count_words(text)
+        with self._lock:
+            # Don't add back words of a tab that was closed while counting
+            if tab_name in self._live_tabs:
+                self._replace_counts(tab_name, counts)
+        self._update_sorted_words()
+
+    def update_tab_soon(self, tab_name: str, text: str) -> None:
+        _index_pool.submit(self._update_tab, tab_name, text)
+
+    # runs in a thread
+    def _index_file(self, path: Path, max_entries: int) -> None:
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return
+
+        with self._lock:
+            if self._mtimes.get(path) == mtime:
+                return
+            over_budget = self._entry_count >= max_entries
+            if over_budget and path not in self._counts:
+                return
+
+        text = _read_text_file(path)
+        counts = None if text is None else _count_words(text)
+        with self._lock:
+            self._mtimes[path] = mtime
+            self._replace_counts(path, counts)
+
+    # runs in a thread
+    def _scan_project(self, project_root: Path, skip_paths: set[Path], max_entries: int) -> None:
+        start = time.perf_counter()
+        found_paths = set()
+
+        for dirpath, dirnames, filenames in os.walk(project_root):
+            # Skip .git, .venv and other hidden folders. They tend to be huge.
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+
+            for name in filenames:
+                path = Path(dirpath, name)
+                if path not in skip_paths:
+                    found_paths.add(path)
+                    self._index_file(path, max_entries)
+
+        # Forget files that were deleted or opened in a tab
+        with self._lock:
+            for key in list(self._counts.keys()):
+                if isinstance(key, Path) and project_root in key.parents and key not in found_paths:
+                    self._replace_counts(key, None)
+                    self._mtimes.pop(key, None)
+            self._projects_being_scanned.discard(project_root)
+            entry_count = self._entry_count
+        self._update_sorted_words()
+
+        log.debug(
+            f"indexing words of {project_root} took {round((time.perf_counter() - start)*1000)}ms,"
+            f" index now has {entry_count} entries"
+        )
+
+    def scan_project_soon(
+        self, project_root: Path, skip_paths: set[Path], max_entries: int
+    ) -> None:
+        with self._lock:
+            if project_root in self._projects_being_scanned:
+                return
+            self._projects_being_scanned.add(project_root)
+        _index_pool.submit(self._scan_project, project_root, skip_paths, max_entries)
+
+    # runs in a thread
+    def _rescan_paths(
+        self, paths: list[Path], project_roots: set[Path], skip_paths: set[Path], max_entries: int
+    ) -> None:
+        for path in paths:
+            root = next((root for root in project_roots if root in path.parents), None)
+            if root is None or path in skip_paths:
+                continue
+            # Same hidden folders as in _scan_project
+            if any(part.startswith(".") for part in path.relative_to(root).parts[:-1]):
+                continue
+
+            if path.is_file():
+                self._index_file(path, max_entries)
+            else:
+                with self._lock:
+                    self._replace_counts(path, None)
+                    self._mtimes.pop(path, None)
+        self._update_sorted_words()
+
+    def rescan_paths_soon(
+        self, paths: list[Path], project_roots: set[Path], skip_paths: set[Path], max_entries: int
+    ) -> None:
+        _index_pool.submit(self._rescan_paths, paths, project_roots, skip_paths, max_entries)
+
+    def forget_projects_except(self, project_roots: set[Path]) -> None:
+        with self._lock:
+            for key in list(self._counts.keys()):
+                if isinstance(key, Path) and not (project_roots & set(key.parents)):
+                    self._replace_counts(key, None)
+                    self._mtimes.pop(key, None)
+
+    # Finds words that start with the prefix, case-insensitively. With an
+    # empty prefix, this would have to look at every word, so nothing is found.
+    def get_counts(self, excluded_tab_name: str, prefix: str) -> dict[str, int]:
+        folded_prefix = prefix.casefold()
+        result: dict[str, int] = {}
+        if not folded_prefix:
+            return result
+
+        with self._lock:
+            excluded_counts = self._counts.get(excluded_tab_name, collections.Counter())
+            start = bisect.bisect_left(self._sorted_words, folded_prefix, key=str.casefold)
+            for index in range(start, len(self._sorted_words)):
+                word = self._sorted_words[index]
+                if not word.casefold().startswith(folded_prefix):
+                    break
+                count = self._total_counts[word] - excluded_counts[word]
+                if count > 0:
+                    result[word] = count
+        return result
+
+
+_word_index = _WordIndex()
+
+
+def _get_project_roots() -> set[Path]:
+    return {
+        utils.find_project_root(tab.path)
+        for tab in get_tab_manager().tabs()
+        if isinstance(tab, tabs.FileTab) and tab.path is not None
+    }
+
+
+# Files open in tabs are indexed from the tab, because it can have unsaved changes
+def _get_open_paths() -> set[Path]:
+    return {
+        tab.path
+        for tab in get_tab_manager().tabs()
+        if isinstance(tab, tabs.FileTab) and tab.path is not None
+    }
+
+
+def _index_project_files(junk: object = None) -> None:
+    if not global_settings.get("autocomplete_words_from_project", bool):
+        _word_index.forget_projects_except(set())
+        return
+
+    open_paths = _get_open_paths()
+    project_roots = _get_project_roots()
+    _word_index.forget_projects_except(project_roots)
+    for root in project_roots:
+        _word_index.scan_project_soon(
+            root, open_paths, global_settings.get("autocomplete_index_max_words", int)
+        )
+
+
+# Rescanning only the changed files is much faster than walking the whole project
+def _on_paths_changed(event: utils.EventWithData) -> None:
+    if global_settings.get("autocomplete_words_from_project", bool):
+        _word_index.rescan_paths_soon(
+            [Path(path) for path in event.data_class(PathsChanged).paths],
+            _get_project_roots(),
+            _get_open_paths(),
+            global_settings.get("autocomplete_index_max_words", int),
+        )
+
+
+def _index_filetab(tab: tabs.FileTab) -> None:
+    tab_name = str(tab)
+    _word_index.add_tab(tab_name)
+    after_id: str | None = None
+
+    def update_now(junk: object = None) -> None:
+        nonlocal after_id
+        after_id = None
+        if global_settings.get("autocomplete_words_from_other_tabs", bool):
+            _word_index.update_tab_soon(tab_name, tab.textwidget.get("1.0", "end - 1 char"))
+        else:
+            _word_index.forget_tab_counts(tab_name)
+
+    # Don't get the whole text on every key press
+    def update_later(junk: object = None) -> None:
+        nonlocal after_id
+        if after_id is not None:
+            tab.after_cancel(after_id)
+        after_id = tab.after(500, update_now)
+
+    def on_destroy(junk: object) -> None:
+        if after_id is not None:
+            tab.after_cancel(after_id)
+        _word_index.remove_tab(tab_name)
+
+    tab.textwidget.bind("<<ContentChanged>>", update_later, add=True)
+    tab.bind("<Destroy>", on_destroy, add=True)
+    tab.bind("<<GlobalSettingChanged:autocomplete_words_from_other_tabs>>", update_now, add=True)
+    tab.bind("<<PathChanged>>", _index_project_files, add=True)
+    update_now()
 
 
 # stupid fallback
@@ -268,6 +678,9 @@ def _all_words_in_file_completer(tab: tabs.FileTab, event: utils.EventWithData)
     before_cursor = match.group(0)
     word_start = tab.textwidget.index(f"{request.cursor_pos} - {len(before_cursor)} chars")
 
+    def word_filter(word: str) -> bool:
+        return before_cursor.casefold() in word.casefold()
+
     counts = dict(
         collections.Counter(
             [
@@ -280,11 +693,17 @@ def _all_words_in_file_completer(tab: tabs.FileTab, event: utils.EventWithData)
                         + tab.textwidget.get(request.cursor_pos, "end")
                     ),
                 )
-                if before_cursor.casefold() in word.casefold()
+                if word_filter(word)
             ]
         )
     )
 
+    # Words of other tabs and project files are ranked with the same rules,
+    # so a word used a lot elsewhere can beat a rare word in this file. They
+    # must start with the typed text, so that looking them up is fast.
+    for word, count in _word_index.get_counts(str(tab), before_cursor).items():
+        counts[word] = counts.get(word, 0) + count
+
     words = list(counts.keys())
     words.sort(
         key=lambda word: (
@@ -321,6 +740,128 @@ def _all_words_in_file_completer(tab: tabs.FileTab, event: utils.EventWithData)
     return "break"
 
 
+# Beginning of text, after non-alphanumeric (e.g. "_" or "."), or a camelCase hump
+def _is_word_start(text: str, index: int) -> bool:
+    if not text[index].isalnum():
+        return False
+    if index == 0 or not text[index - 1].isalnum():
+        return True
+    return text[index].isupper() and text[index - 1].islower()
+
+
+def _fuzzy_score(filter_text: str, folded_filter: str, text: str, folded: str) -> int | None:
+    # Substring matches are the best kind of fuzzy matches, so look for them first
+    start = folded.find(folded_filter)
+    if start != -1:
+        positions: list[int] | range = range(start, start + len(folded_filter))
+    else:
+        positions = []
+        index = -1
+        for char in folded_filter:
+            index = folded.find(char, index + 1)
+            if index == -1:
+                return None
+            positions.append(index)
+
+    # Case folding can change length (e.g. "ß" --> "ss"), and then indexes don't match
+    same_length = len(folded) == len(text)
+
+    score = 0
+    previous = -2
+    for char, index in zip(filter_text, positions):
+        if same_length:
+            if _is_word_start(text, index):
+                score += 10
+            if text[index] == char:
+                score += 1  # prefer same case
+        if index == previous + 1:
+            score += 5
+        previous = index
+
+    if positions and positions[0] == 0:
+        score += 20
+    # A long completion where the typed characters are far apart is unlikely to be good
+    score -= (positions[-1] - positions[0] + 1 - len(positions)) if positions else 0
+    return score
+
+
+class FuzzyMatcher:
+    """Filter and rank completions as the user types.
+
+    The filter text matches a completion if its characters appear in the
+    completion in the same order, ignoring case. Typing ``gcu`` matches
+    ``getchar_unlocked``, for example. Matches at word starts (including
+    camelCase humps) and consecutive characters are ranked first, and
+    otherwise the original order of the completions is kept.
+
+    When the filter text grows, the completions that matched the shorter
+    filter text are the only ones that can still match, so only they are
+    checked. The first filtering goes through one big regex over all
+    completions at once, which is much faster than looping in Python.
+    """
+
+    def __init__(self, completions: list[Completion]) -> None:
+        self._completions = completions
+        self._folded = [completion.filter_text.casefold() for completion in completions]
+
+        # Newlines separate completions, so they can't be a part of one
+        self._all_folded = "\n".join(text.replace("\n", " ") for text in self._folded)
+        self._line_starts = [0]
+        for text in self._folded[:-1]:
+            self._line_starts.append(self._line_starts[-1] + len(text) + 1)
+
+        # (filter_text, indexes of matching completions) for each filter text
+        # that was used while typing the current filter text
+        self._narrowing_stack: list[tuple[str, list[int]]] = [("", list(range(len(completions))))]
+
+    def _find_candidates(self, folded_filter: str) -> list[int]:
+        # Pop results of longer or different filter texts (e.g. after backspace)
+        while not folded_filter.startswith(self._narrowing_stack[-1][0]):
+            self._narrowing_stack.pop()
+        previous_filter, previous_indexes = self._narrowing_stack[-1]
+
+        if previous_filter == folded_filter:
+            return previous_indexes
+
+        if previous_filter:
+            # Incremental narrowing. The regex below would do the same thing, but
+            # with fewer items this is faster and doesn't need to find line numbers.
+            indexes = [
+                i for i in previous_indexes if _is_subsequence(folded_filter, self._folded[i])
+            ]
+        else:
+            # Negated character classes make the regex run in linear time
+            regex = "".join(f"[^{re.escape(char)}\n]*{re.escape(char)}" for char in folded_filter)
+            indexes = [
+                bisect.bisect_right(self._line_starts, match.start()) - 1
+                for match in re.finditer("^" + regex, self._all_folded, flags=re.MULTILINE)
+            ]
+
+        self._narrowing_stack.append((folded_filter, indexes))
+        return indexes
+
+    def filter(self, filter_text: str) -> list[Completion]:
+        folded_filter = filter_text.casefold()
+        if not folded_filter:
+            return self._completions
+
+        scored = []
+        for i in self._find_candidates(folded_filter):
+            score = _fuzzy_score(
+                filter_text, folded_filter, self._completions[i].filter_text, self._folded[i]
+            )
+            if score is not None:
+                scored.append((-score, i))
+
+        scored.sort()
+        return [self._completions[i] for minus_score, i in scored]
+
+
+def _is_subsequence(short: str, long: str) -> bool:
+    iterator = iter(long)
+    return all(char in iterator for char in short)
+
+
 # How this differs from using sometextwidget.compare(start, '<', end):
 #   - This does the right thing if text has been deleted so that start and end
 #     no longer exist in the text widget.
@@ -386,22 +927,15 @@ class AutoCompleter:
         self._waiting_for_response_id = None
 
         if self._user_wants_to_see_popup():
-            self.unfiltered_completions = response.completions
+            self._matcher = FuzzyMatcher(response.completions)
             self.popup.set_completions(self._get_filtered_completions())
             self.popup.start_completing()
 
-    # this doesn't work perfectly. After get<Tab>, getar_u matches
-    # getchar_unlocked but getch_u doesn't.
     def _get_filtered_completions(self) -> list[Completion]:
         log.debug("getting filtered completions")
         assert self._orig_cursorpos is not None
         filter_text = self._tab.textwidget.get(self._orig_cursorpos, "insert")
-
-        return [
-            completion
-            for completion in self.unfiltered_completions
-            if filter_text.lower() in completion.filter_text.lower()
-        ]
+        return self._matcher.filter(filter_text)
 
     # returns None if this isn't a place where it's good to autocomplete
     def _can_complete_here(self) -> bool:
@@ -519,6 +1053,7 @@ class AutoCompleter:
 
 def on_new_filetab(tab: tabs.FileTab) -> None:
     tab.settings.add_option("autocomplete_chars", [], list[str])
+    _index_filetab(tab)
 
     completer = AutoCompleter(tab)
 
@@ -546,6 +1081,26 @@ def on_new_filetab(tab: tabs.FileTab) -> None:
 
 
 def setup() -> None:
-    get_tab_manager().add_filetab_callback(on_new_filetab)
     global_settings.add_option("autocomplete_popup_width", 500)
     global_settings.add_option("autocomplete_popup_height", 200)
+
+    # Max number of (file, word) pairs in the word index. With the default,
+    # the index uses something like 50MB of RAM at most.
+    global_settings.add_option("autocomplete_index_max_words", 500_000)
+    global_settings.add_option("autocomplete_words_from_other_tabs", True)
+    global_settings.add_option("autocomplete_words_from_project", False)
+    settings.add_checkbutton(
+        "autocomplete_words_from_other_tabs",
+        text="Autocomplete words from other tabs when there's no langserver",
+    )
+    settings.add_checkbutton(
+        "autocomplete_words_from_project",
+        text="Autocomplete words from all files of the project (uses more RAM)",
+    )
+
+    get_tab_manager().add_filetab_callback(on_new_filetab)
+    get_tab_manager().bind("<<FileSystemChanged>>", _index_project_files, add=True)
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", _on_paths_changed, add=True)
+    get_tab_manager().bind(
+        "<<GlobalSettingChanged:autocomplete_words_from_project>>", _index_project_files, add=True
+    )
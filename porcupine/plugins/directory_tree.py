@@ -5,11 +5,13 @@ You can navigate directories, and open files in Porcupine.
 
 from __future__ import annotations
 
+import bisect
 import dataclasses
 import logging
 import os
 import tkinter
 from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from tkinter import ttk
@@ -24,6 +26,7 @@ from porcupine import (
     tabs,
     utils,
 )
+from porcupine.plugins.file_watcher import PathsChanged, add_watch_provider, update_watches
 from porcupine.settings import global_settings
 
 log = logging.getLogger(__name__)
@@ -32,12 +35,22 @@ log = logging.getLogger(__name__)
 # opened project will be closed.
 #
 # Gotchas:
-#   - Git run time is the bottleneck of refreshing, and it's proportional to
-#     this. For that reason, keep it small.
+#   - Git status runs only for projects that changed since the previous
+#     refresh (see git_status plugin), so this doesn't need to be tiny. But
+#     each project still costs a git status run when its files change.
 #   - If you have more than this many files open, each from a different
 #     project, there will be one project for each file in the directory tree
 #     and this number is exceeded.
-_MAX_PROJECTS = 5
+_MAX_PROJECTS = 20
+
+# Listing a directory is mostly waiting for the disk (or a network file
+# system), so it's done in other threads to not freeze the GUI.
+scandir_pool = ThreadPoolExecutor(max_workers=4)
+
+# Inserting lots of items to the treeview at once would freeze the GUI too, so
+# they are inserted at most this many at a time and other events are handled
+# in between.
+_INSERT_BATCH_SIZE = 500
 
 
 # For perf reasons, we want to avoid unnecessary Tcl calls when
@@ -66,6 +79,94 @@ class FolderRefreshed(utils.EventDataclass):
     folder_id: str
 
 
+# Runs in scandir_pool. Returns {item_id: text} for the contents of a folder.
+#
+# The result is sorted like the directory tree sorts by default (folders
+# first, dotfiles last), so that when a folder is too big to show everything,
+# we can show the first items.
+def _scan_directory(dir_path: Path, project_num: str) -> dict[str, str]:
+    # Sorting only names is much faster than sorting item ids with a key
+    # function, because item ids start with the same long path.
+    dirs: list[str] = []
+    files: list[str] = []
+    dot_dirs: list[str] = []
+    dot_files: list[str] = []
+    try:
+        with os.scandir(dir_path) as scanner:
+            for entry in scanner:
+                # Usually is_dir() doesn't need a stat, because the directory
+                # listing includes the type of each entry (d_type).
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if entry.name.startswith("."):
+                    (dot_dirs if is_dir else dot_files).append(entry.name)
+                else:
+                    (dirs if is_dir else files).append(entry.name)
+    except OSError:
+        log.debug(f"can't list contents of {dir_path}", exc_info=True)
+
+    # Same as os.path.join(dir_path, name), but joining each name is slow
+    dir_prefix = os.path.join(dir_path, "")
+
+    result = {}
+    groups = [("dir", dirs), ("file", files), ("dir", dot_dirs), ("file", dot_files)]
+    for item_type, names in groups:
+        names.sort()
+        id_prefix = f"{item_type}:{project_num}:{dir_prefix}"
+        for name in names:
+            result[id_prefix + name] = name
+    return result
+
+
+# Returns the numbers that don't need to move when sorting. For example, if
+# the sorted order is 0,1,2,3,4 and the current order is 0,3,1,2,4, then it's
+# enough to move 3 to the correct place and leave 0,1,2,4 as is.
+def _longest_increasing_subsequence(numbers: list[int]) -> list[int]:
+    # tails[n] = smallest last number of an increasing subsequence of length n+1
+    tails: list[int] = []
+    tail_indexes: list[int] = []
+    previous_indexes: list[int | None] = []
+
+    for index, number in enumerate(numbers):
+        length = bisect.bisect_left(tails, number)
+        if length == len(tails):
+            tails.append(number)
+            tail_indexes.append(index)
+        else:
+            tails[length] = number
+            tail_indexes[length] = index
+        previous_indexes.append(tail_indexes[length - 1] if length > 0 else None)
+
+    result = []
+    index_or_none = tail_indexes[-1] if tail_indexes else None
+    while index_or_none is not None:
+        result.append(numbers[index_or_none])
+        index_or_none = previous_indexes[index_or_none]
+    return result[::-1]
+
+
+# Moves items so that each item goes right after another item. An empty string
+# means moving to the beginning. Doing this in Tcl avoids a Python->Tcl call
+# for each item, and the index doesn't need to be known before previous moves.
+_MOVE_AFTER_TCL_PROC = r"""
+proc porcupine_directory_tree_move_after {tree parent moves} {
+    foreach {item previous} $moves {
+        if {$previous eq ""} {
+            $tree move $item $parent 0
+        } else {
+            set index [$tree index $previous]
+            if {[$tree index $item] > $index} {
+                incr index
+            }
+            $tree move $item $parent $index
+        }
+    }
+}
+"""
+
+
 # TODO: show long paths more nicely?
 def _stringify_path(path: Path) -> str:
     home = Path.home()
@@ -97,6 +198,7 @@ class DirectoryTree(ttk.Treeview):
         self.bind("<Double-1>", self._on_double_click, add=True)
 
         self.bind("<<TreeviewOpen>>", self.open_file_or_dir, add=True)
+        self.bind("<<TreeviewClose>>", (lambda event: update_watches()), add=True)
         self.bind("<<ThemeChanged>>", self._config_tags, add=True)
         self.column("#0", minwidth=500)  # allow scrolling sideways
         self._config_tags()
@@ -111,7 +213,25 @@ class DirectoryTree(ttk.Treeview):
             item_is_dotted = Path(item_path).name[0] == "."  # False < True => dot items last
             return item_is_dotted, item_type, item_path
 
+        # If a sorting key depends on something else than the item id, call
+        # invalidate_sort_key() when that changes.
         self.sorting_keys: list[Callable[[str], Any]] = [ordered_repr]
+        self._sort_key_cache: dict[str, list[Any]] = {}
+        self.tk.eval(_MOVE_AFTER_TCL_PROC)
+
+        # Directories currently being listed or filled. If a directory is
+        # refreshed again before the previous refresh is done, the old results
+        # are ignored.
+        self._scan_futures: dict[str, Future[dict[str, str]]] = {}
+        self._after_refresh_callbacks: dict[str, list[Callable[[], object]]] = {}
+        # Directories whose open subdirectories will also be refreshed
+        self._recursive_refreshes: set[str] = set()
+
+        # When a folder contains more items than the directory_tree_page_size
+        # setting, the rest are not inserted to the treeview until the user
+        # clicks a "(show N more...)" item at the end of the folder.
+        self._hidden_children: dict[str, list[tuple[str, str]]] = {}
+        self._show_more_items: dict[str, str] = {}
 
     def set_the_selection_correctly(self, id: str) -> None:
         self.selection_set(id)
@@ -140,10 +260,14 @@ class DirectoryTree(ttk.Treeview):
 
         self.set_the_selection_correctly(item)
 
-        if item.startswith(("dir", "project")):
+        if self.tag_has("show_more", item):
+            self._show_more(item)
+        elif item.startswith(("dir", "project")):
             self.item(item, open=(not self.item(item, "open")))
             if self.item(item, "open"):
                 self.open_file_or_dir()
+            else:
+                update_watches()
 
         return "break"
 
@@ -206,13 +330,14 @@ class DirectoryTree(ttk.Treeview):
         subpath = project_root_path
         for part in path.relative_to(project_root_path).parts:
             subpath /= part
-            if self.item(file_id, "open"):
-                mypy_sucks = self.get_id_from_path(subpath, project_id)
-                assert mypy_sucks is not None
-                file_id = mypy_sucks
-            else:
+            if not self.item(file_id, "open"):
                 # ...or a closed folder that contains the file
                 break
+            child_id = self.get_id_from_path(subpath, project_id)
+            if child_id is None:
+                # ...or a folder whose contents are still being loaded
+                break
+            file_id = child_id
 
         self.set_the_selection_correctly(file_id)
         self.see(file_id)
@@ -276,42 +401,116 @@ class DirectoryTree(ttk.Treeview):
         if child_id.startswith(("dir:", "project:")) and self.item(child_id, "open"):
             self._open_and_refresh_directory(child_id)
 
-    def _open_and_refresh_directory(self, dir_id: str) -> None:
+    def _open_and_refresh_directory(
+        self, dir_id: str, *, recursive: bool = True, then: Callable[[], object] | None = None
+    ) -> None:
         dir_path = get_path(dir_id)
         assert dir_path is not None
 
-        if self.contains_dummy(dir_id):
-            self.delete(self.get_children(dir_id)[0])
+        if then is not None:
+            self._after_refresh_callbacks.setdefault(dir_id, []).append(then)
+        if recursive:
+            self._recursive_refreshes.add(dir_id)
 
         project_ids = self.get_children("")
         if dir_id not in project_ids and dir_path in map(get_path, project_ids):
+            self._scan_futures.pop(dir_id, None)
+            self._recursive_refreshes.discard(dir_id)
             self._insert_dummy(dir_id, text="(open as a separate project)", clear=True)
+            for callback in self._after_refresh_callbacks.pop(dir_id, []):
+                callback()
+            return
+
+        project_num = dir_id.split(":", maxsplit=2)[1]
+        future = scandir_pool.submit(partial(_scan_directory, dir_path, project_num))
+        self._scan_futures[dir_id] = future
+        self._wait_for_scan(dir_id, future)
+
+    def _scan_is_current(self, dir_id: str, future: Future[dict[str, str]]) -> bool:
+        if self._scan_futures.get(dir_id) is not future:
+            # Superseded by a newer refresh, or the directory is no longer open
+            return False
+        if not self.exists(dir_id):
+            del self._scan_futures[dir_id]
+            self._after_refresh_callbacks.pop(dir_id, None)
+            self._recursive_refreshes.discard(dir_id)
+            return False
+        return True
+
+    def _wait_for_scan(self, dir_id: str, future: Future[dict[str, str]]) -> None:
+        if not self._scan_is_current(dir_id, future):
+            return
+        if not future.done():
+            self.after(10, self._wait_for_scan, dir_id, future)
             return
 
-        new_paths = set(dir_path.iterdir())
-        path2id = {get_path(id): id for id in self.get_children(dir_id)}
+        self._forget_deleted_show_more_items()
+        self._hidden_children.pop(dir_id, None)
+        if dir_id in self._show_more_items:
+            self.delete(self._show_more_items.pop(dir_id))
+        elif self.contains_dummy(dir_id):
+            self.delete(self.get_children(dir_id)[0])
 
-        # TODO: handle changing directory to file
-        for path in list(path2id.keys() - new_paths):
-            self.delete(path2id.pop(path))
-        for path in list(new_paths - path2id.keys()):
-            project_num = dir_id.split(":", maxsplit=2)[1]
-            if path.is_dir():
-                item_id = f"dir:{project_num}:{path}"
-            else:
-                item_id = f"file:{project_num}:{path}"
+        # If the user has clicked "(show N more...)", keep showing as many items
+        old_children = set(self.get_children(dir_id))
+        show_count = max(global_settings.get("directory_tree_page_size", int), len(old_children))
+        new_children = list(future.result().items())
+        if len(new_children) > show_count:
+            self._hidden_children[dir_id] = new_children[show_count:]
+            new_children = new_children[:show_count]
+
+        # The item id contains the type, so if a file is replaced with a
+        # directory of the same name, the old item gets deleted here.
+        deleted = old_children - {id for id, text in new_children}
+        if deleted:
+            self.delete(*deleted)
+            for item_id in deleted:
+                self._sort_key_cache.pop(item_id, None)
+
+        to_insert = [(id, text) for id, text in new_children if id not in old_children]
+        self._insert_children(dir_id, future, to_insert, bool(deleted or to_insert))
+
+    def _insert_children(
+        self,
+        dir_id: str,
+        future: Future[dict[str, str]],
+        to_insert: list[tuple[str, str]],
+        membership_changed: bool,
+    ) -> None:
+        if not self._scan_is_current(dir_id, future):
+            return
 
-            self.insert(dir_id, "end", item_id, text=path.name, open=False)
-            path2id[path] = item_id
-            if path.is_dir():
+        for item_id, text in to_insert[:_INSERT_BATCH_SIZE]:
+            self.insert(dir_id, "end", item_id, text=text, open=False)
+            self._sort_key_cache.pop(item_id, None)
+            if item_id.startswith("dir:"):
                 self._insert_dummy(item_id)
 
-        project_id = self.find_project_id(dir_id)
-        for child_path, child_id in path2id.items():
-            self._update_tags_and_content(child_id)
-        self.sort_folder_contents(dir_id)
+        if len(to_insert) > _INSERT_BATCH_SIZE:
+            self.after(
+                0,
+                self._insert_children,
+                dir_id,
+                future,
+                to_insert[_INSERT_BATCH_SIZE:],
+                membership_changed,
+            )
+        else:
+            del self._scan_futures[dir_id]
+            self._finish_refreshing_directory(dir_id, membership_changed)
 
-        if not self.get_children(dir_id):
+    def _finish_refreshing_directory(self, dir_id: str, membership_changed: bool) -> None:
+        project_id = self.find_project_id(dir_id)
+        if dir_id in self._recursive_refreshes:
+            self._recursive_refreshes.remove(dir_id)
+            for child_id in self.get_children(dir_id):
+                self._update_tags_and_content(child_id)
+        if membership_changed:
+            self.sort_folder_contents(dir_id)
+
+        if dir_id in self._hidden_children:
+            self._insert_show_more_item(dir_id)
+        elif not self.get_children(dir_id):
             self._insert_dummy(dir_id, text="(empty)")
 
         # When binding, delete tags from previous call
@@ -319,17 +518,124 @@ class DirectoryTree(ttk.Treeview):
             "<<FolderRefreshed>>", data=FolderRefreshed(project_id=project_id, folder_id=dir_id)
         )
 
+        for callback in self._after_refresh_callbacks.pop(dir_id, []):
+            callback()
+
+        # The folder may have been opened, and it contains new subfolders
+        update_watches()
+
+    def _insert_show_more_item(self, dir_id: str) -> None:
+        count = min(
+            len(self._hidden_children[dir_id]), global_settings.get("directory_tree_page_size", int)
+        )
+        self._show_more_items[dir_id] = self.insert(
+            dir_id, "end", text=f"(show {count} more...)", tags=("dummy", "show_more")
+        )
+
+    def _forget_deleted_show_more_items(self) -> None:
+        for dir_id in list(self._show_more_items.keys()):
+            if not self.exists(dir_id):
+                del self._show_more_items[dir_id]
+                self._hidden_children.pop(dir_id, None)
+
+    def _show_more(self, show_more_id: str) -> None:
+        dir_id = self.parent(show_more_id)
+        del self._show_more_items[dir_id]
+        self.delete(show_more_id)
+
+        page_size = global_settings.get("directory_tree_page_size", int)
+        hidden = self._hidden_children.pop(dir_id)
+        for item_id, text in hidden[:page_size]:
+            self.insert(dir_id, "end", item_id, text=text, open=False)
+            self._sort_key_cache.pop(item_id, None)
+            if item_id.startswith("dir:"):
+                self._insert_dummy(item_id)
+        self.sort_folder_contents(dir_id)
+
+        if len(hidden) > page_size:
+            self._hidden_children[dir_id] = hidden[page_size:]
+            self._insert_show_more_item(dir_id)
+
+        self.event_generate(
+            "<<FolderRefreshed>>",
+            data=FolderRefreshed(project_id=self.find_project_id(dir_id), folder_id=dir_id),
+        )
+
+    def get_open_folder_ids(self, project_id: str) -> list[str]:
+        """Return the project and all of its folders that are open in the tree."""
+        result = []
+        to_visit = [project_id]
+        while to_visit:
+            item_id = to_visit.pop()
+            if self.item(item_id, "open"):
+                result.append(item_id)
+                to_visit.extend(
+                    child for child in self.get_children(item_id) if child.startswith("dir:")
+                )
+        return result
+
+    def _get_open_folder_paths(self) -> list[Path]:
+        return [
+            Path(folder_id.split(":", maxsplit=2)[2])
+            for project_id in self.get_children("")
+            for folder_id in self.get_open_folder_ids(project_id)
+        ]
+
+    def _on_paths_changed(self, event: utils.EventWithData) -> None:
+        changed_paths = {Path(path) for path in event.data_class(PathsChanged).paths}
+        # When a file changes, the folder containing it may need refreshing
+        folder_paths = changed_paths | {path.parent for path in changed_paths}
+
+        for project_id in self.get_children(""):
+            project_path = get_path(project_id)
+            project_num = project_id.split(":", maxsplit=2)[1]
+            for path in folder_paths:
+                if path == project_path:
+                    folder_id = project_id
+                elif project_path in path.parents:
+                    folder_id = f"dir:{project_num}:{path}"
+                else:
+                    continue
+                if self.exists(folder_id) and self.item(folder_id, "open"):
+                    self._open_and_refresh_directory(folder_id, recursive=False)
+
     def sort_folder_contents(self, dir_id: str) -> None:
         # Empty string is root element and sorting inside it would mess with order of projects
         assert dir_id
 
-        for index, child_id in enumerate(
-            sorted(
-                self.get_children(dir_id),
-                key=(lambda item_id: [f(item_id) for f in self.sorting_keys]),
-            )
-        ):
-            self.move(child_id, dir_id, index)
+        # The "(show N more...)" item stays at the end
+        children = [
+            child_id
+            for child_id in self.get_children(dir_id)
+            if child_id != self._show_more_items.get(dir_id)
+        ]
+        sorted_children = sorted(children, key=self._get_sort_key)
+        if sorted_children == children:
+            return
+
+        # Move as few items as possible
+        sorted_indexes = {child_id: index for index, child_id in enumerate(sorted_children)}
+        staying = set(_longest_increasing_subsequence([sorted_indexes[c] for c in children]))
+        moves = []
+        for index, child_id in enumerate(sorted_children):
+            if index not in staying:
+                moves.append(child_id)
+                moves.append(sorted_children[index - 1] if index > 0 else "")
+        self.tk.call("porcupine_directory_tree_move_after", self, dir_id, moves)
+
+    def _get_sort_key(self, item_id: str) -> list[Any]:
+        try:
+            return self._sort_key_cache[item_id]
+        except KeyError:
+            key = [f(item_id) for f in self.sorting_keys]
+            self._sort_key_cache[item_id] = key
+            return key
+
+    def invalidate_sort_key(self, item_id: str) -> None:
+        self._sort_key_cache.pop(item_id, None)
+
+    def invalidate_all_sort_keys(self) -> None:
+        self._sort_key_cache.clear()
 
     def open_file_or_dir(self, event: object = None) -> None:
         try:
@@ -342,17 +648,22 @@ class DirectoryTree(ttk.Treeview):
             selected_id_path = get_path(selected_id)
             assert selected_id_path is not None
             get_tab_manager().open_file(selected_id_path)
+        elif self.tag_has("show_more", selected_id):
+            self._show_more(selected_id)
         elif selected_id.startswith(("dir:", "project:")):  # not dummy item
-            self._open_and_refresh_directory(selected_id)
-
             tab = get_tab_manager().select()
             if (
                 isinstance(tab, tabs.FileTab)
                 and tab.path is not None
                 and get_path(selected_id) in tab.path.parents
             ):
+                path = tab.path
                 # Don't know why after_idle is needed
-                self.after_idle(self.select_file, tab.path)
+                self._open_and_refresh_directory(
+                    selected_id, then=(lambda: self.after_idle(self.select_file, path))
+                )
+            else:
+                self._open_and_refresh_directory(selected_id)
 
     def get_id_from_path(self, path: Path, project_id: str) -> str | None:
         """Find an item from the directory tree given its path.
@@ -361,13 +672,11 @@ class DirectoryTree(ttk.Treeview):
         even if the path exists inside the project.
         """
         project_num = project_id.split(":", maxsplit=2)[1]
-        if path.is_dir():
-            result = f"dir:{project_num}:{path}"
-        else:
-            result = f"file:{project_num}:{path}"
-
-        if self.exists(result):
-            return result
+        # Checking both is faster than asking the file system whether it's a directory
+        for item_type in ["dir", "file"]:
+            result = f"{item_type}:{project_num}:{path}"
+            if self.exists(result):
+                return result
         return None
 
     def _cycle_through_items(self, event: tkinter.Event[DirectoryTree]) -> None:
@@ -475,6 +784,14 @@ def setup() -> None:
     get_tab_manager().bind("<<ThemeChanged>>", config_indent, add=True)
 
     global_settings.add_option("directory_tree_projects", [], list[str])
+    global_settings.add_option("directory_tree_page_size", 1000)
+    settings.add_spinbox(
+        "directory_tree_page_size",
+        text="Number of files to show at first in a big folder:",
+        from_=10,
+        to=100_000,
+        increment=100,
+    )
 
     container = ttk.Frame(get_horizontal_panedwindow(), name="directory_tree_container")
     get_horizontal_panedwindow().add(container, before=get_vertical_panedwindow())
@@ -488,6 +805,8 @@ def setup() -> None:
     tree = DirectoryTree(container)
     tree.pack(side="left", fill="both", expand=True)
     get_tab_manager().bind("<<FileSystemChanged>>", tree.refresh, add=True)
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", tree._on_paths_changed, add=True)
+    add_watch_provider(tree._get_open_folder_paths)
 
     tree.config(yscrollcommand=scrollbar.set)
     scrollbar.config(command=tree.yview)
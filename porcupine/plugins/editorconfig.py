@@ -11,10 +11,12 @@ import configparser
 import dataclasses
 import logging
 import re
+import stat
 from functools import partial
 from pathlib import Path
 
-from porcupine import get_tab_manager, settings, tabs
+from porcupine import get_tab_manager, settings, tabs, utils
+from porcupine.plugins.file_watcher import PathsChanged, add_watch_provider, update_watches
 
 setup_after = ["filetypes"]
 log = logging.getLogger(__name__)
@@ -35,6 +37,30 @@ class Section:
     path_glob: str
     config: dict[str, str]
 
+    def __post_init__(self) -> None:
+        # editorconfig-core-c does this, doesn't seem to be documented anywhere
+        # https://github.com/editorconfig/editorconfig-core-c/blob/e70d90d045e339374abda3fa664904fbba7f8d67/src/lib/editorconfig.c#L260-L266
+        if self.path_glob.startswith("/"):
+            glob = self.path_glob
+        elif "/" in self.path_glob:
+            glob = "/" + self.path_glob
+        else:
+            glob = "**/" + self.path_glob
+
+        self._compiled_glob: _CompiledGlob | None
+        try:
+            self._compiled_glob = _compile_glob(glob)
+        except Exception:
+            log.exception(f"error while globbing {self.path_glob}")
+            self._compiled_glob = None
+
+    def matches(self, path: Path) -> bool:
+        if self._compiled_glob is None:
+            return False
+        # "Only forward slashes (/, not backslashes) are used as path separators"
+        relative = "/" + path.relative_to(self.glob_relative_to).as_posix()
+        return _match_compiled_glob(self._compiled_glob, relative)
+
 
 # Sections later in resulting list override earlier sections: "EditorConfig
 # files are read top to bottom and the most recent rules found take precedence."
@@ -106,7 +132,11 @@ def parse_file(path: Path) -> tuple[list[Section], bool]:
     return (result, is_root)
 
 
-def glob_match(glob: str, string: str) -> bool:
+# The regex, and allowed values for the integers it captures
+_CompiledGlob = tuple[re.Pattern[str], list[range]]
+
+
+def _compile_glob(glob: str) -> _CompiledGlob:
     ranges = []
     regex = ""
 
@@ -172,7 +202,12 @@ def glob_match(glob: str, string: str) -> bool:
             regex += re.escape(glob[0])
             glob = glob[1:]
 
-    match = re.fullmatch(regex, string)
+    return (re.compile(regex), ranges)
+
+
+def _match_compiled_glob(compiled_glob: _CompiledGlob, string: str) -> bool:
+    regex, ranges = compiled_glob
+    match = regex.fullmatch(string)
     if match is None:
         return False
 
@@ -181,56 +216,83 @@ def glob_match(glob: str, string: str) -> bool:
     return all(integer in ranke for integer, ranke in zip(integers, ranges))
 
 
-def get_config(path: Path) -> dict[str, str]:
-    assert path.is_absolute()
+def glob_match(glob: str, string: str) -> bool:
+    return _match_compiled_glob(_compile_glob(glob), string)
+
+
+# Opening many files from the same project would otherwise parse the same
+# .editorconfig files many times.
+#
+# .editorconfig path --> ((mtime, size), result of parse_file())
+_parsed_files: dict[Path, tuple[tuple[int, int], tuple[list[Section], bool]]] = {}
+# directory --> sections that may apply to files in the directory, see get_config()
+_sections_by_dir: dict[Path, list[Section]] = {}
 
-    # last items in this list is considered the most important
-    # i.e. every item overrides ones before it
-    all_sections: list[Section] = []
+
+# Returns None if the file doesn't exist
+def _parse_file_cached(path: Path) -> tuple[list[Section], bool] | None:
+    try:
+        stat_result = path.stat()
+    except OSError:
+        stat_result = None
+
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        if _parsed_files.pop(path, None) is not None:
+            update_watches()  # it was deleted
+        return None
+
+    snapshot = (stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _parsed_files.get(path)
+    if cached is not None and cached[0] == snapshot:
+        return cached[1]
+
+    result = parse_file(path)
+    if cached is None:
+        update_watches()
+    _parsed_files[path] = (snapshot, result)
+    return result
+
+
+def _get_sections(directory: Path) -> list[Section]:
+    try:
+        return _sections_by_dir[directory]
+    except KeyError:
+        pass
 
     # "When opening a file, EditorConfig plugins look for a file named
     # .editorconfig in the directory of the opened file and in every parent
     # directory. A search for .editorconfig files will stop if the root
-    # filepath is reached or ..."
-    for parent in path.parents:
-        if not (parent / ".editorconfig").is_file():
-            continue
-        sections, is_root = parse_file(parent / ".editorconfig")
-
-        # "Properties from matching EditorConfig sections are applied in the order
-        # they were read, so properties in closer files take precedence."
-        #
-        # I think those sentences contradict each other. To me it seems that
-        # "closer" means the file with a longer path, so that the file taking
-        # the most precedence is the one in the same directory with the source
-        # file. That gets parsed first, so anything after that should go to the
-        # beginning of all_sections.
-        all_sections[0:0] = sections
-
-        # "A search for .editorconfig files will stop if ... or an EditorConfig
-        # file with root=true is found."
-        if is_root:
-            break
+    # filepath is reached or an EditorConfig file with root=true is found."
+    parsed = _parse_file_cached(directory / ".editorconfig")
+    if parsed is None:
+        sections: list[Section] = []
+        is_root = False
+    else:
+        sections, is_root = parsed
 
-    result: dict[str, str] = {}
-    for section in all_sections:
-        # "Only forward slashes (/, not backslashes) are used as path separators"
-        relative = "/" + path.relative_to(section.glob_relative_to).as_posix()
+    # "Properties from matching EditorConfig sections are applied in the order
+    # they were read, so properties in closer files take precedence."
+    #
+    # I think those sentences contradict each other. To me it seems that
+    # "closer" means the file with a longer path, so that the file taking
+    # the most precedence is the one in the same directory with the source
+    # file. That's why sections from parent directories go first.
+    if is_root or directory.parent == directory:
+        result = sections
+    else:
+        result = _get_sections(directory.parent) + sections
 
-        # editorconfig-core-c does this, doesn't seem to be documented anywhere
-        # https://github.com/editorconfig/editorconfig-core-c/blob/e70d90d045e339374abda3fa664904fbba7f8d67/src/lib/editorconfig.c#L260-L266
-        if section.path_glob.startswith("/"):
-            glob = section.path_glob
-        elif "/" in section.path_glob:
-            glob = "/" + section.path_glob
-        else:
-            glob = "**/" + section.path_glob
+    _sections_by_dir[directory] = result
+    return result
 
-        try:
-            if not glob_match(glob, relative):
-                continue
-        except Exception:
-            log.exception(f"error while globbing {section.path_glob}")
+
+def get_config(path: Path) -> dict[str, str]:
+    assert path.is_absolute()
+
+    result: dict[str, str] = {}
+    # Later sections override earlier sections
+    for section in _get_sections(path.parent):
+        if not section.matches(path):
             continue
 
         for name, value in section.config.items():
@@ -357,5 +419,23 @@ def on_new_filetab(tab: tabs.FileTab) -> None:
     tab.bind("<<PathChanged>>", partial(get_config_and_apply_to_tab, tab), add=True)
 
 
+# Changes to the .editorconfig files that were found are noticed, because they
+# are watched. A new .editorconfig is noticed if its folder is watched for
+# some other reason, e.g. it contains an open file or it's in the directory tree.
+def _get_editorconfig_paths() -> list[Path]:
+    return list(_parsed_files.keys())
+
+
+def _on_paths_changed(event: utils.EventWithData) -> None:
+    if any(Path(path).name == ".editorconfig" for path in event.data_class(PathsChanged).paths):
+        _sections_by_dir.clear()
+
+
 def setup() -> None:
     get_tab_manager().add_filetab_callback(on_new_filetab)
+    add_watch_provider(_get_editorconfig_paths)
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", _on_paths_changed, add=True)
+    # Unknown changes, or Porcupine saved a file
+    get_tab_manager().bind(
+        "<<FileSystemChanged>>", (lambda event: _sections_by_dir.clear()), add=True
+    )
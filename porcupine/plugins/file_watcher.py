@@ -0,0 +1,289 @@
+"""Notice when files are changed by other programs.
+
+On Linux, this uses inotify to find out what changed without checking all
+files. On other platforms, or if inotify doesn't work for some reason, the
+watched files and folders are checked whenever the Porcupine window is focused.
+
+If you disable this plugin, everything is refreshed whenever the Porcupine
+window is focused, even if nothing changed.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import dataclasses
+import logging
+import os
+import struct
+import sys
+import tkinter
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from porcupine import get_main_window, get_tab_manager, tabs, utils
+
+log = logging.getLogger(__name__)
+
+# Changes are collected for this long before generating <<PathsChanged>>, so
+# that e.g. "git checkout" doesn't generate hundreds of events.
+_COALESCE_DELAY_MS = 100
+
+
+@dataclasses.dataclass
+class PathsChanged(utils.EventDataclass):
+    paths: list[str]
+
+
+# See "man 7 inotify" or /usr/include/linux/inotify.h
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_EXCL_UNLINK = 0x04000000
+
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+    | _IN_EXCL_UNLINK
+)
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[];
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    def __init__(self, widget: tkinter.Misc, on_change: Callable[[Path | None], None]) -> None:
+        self._widget = widget
+        self._on_change = on_change  # None means "don't know what changed"
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd == -1:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._wd_to_path: dict[int, Path] = {}
+        self._path_to_wd: dict[Path, int] = {}
+        if sys.platform != "win32":  # for mypy, windows doesn't have inotify anyway
+            widget.tk.createfilehandler(self._fd, tkinter.READABLE, self._on_readable)
+
+    def add_watch(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd == -1:
+            # ENOSPC means that fs.inotify.max_user_watches was exceeded
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        self._wd_to_path[wd] = path
+        self._path_to_wd[path] = wd
+
+    def remove_watch(self, path: Path) -> None:
+        wd = self._path_to_wd.pop(path)
+        del self._wd_to_path[wd]
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def get_watched_dirs(self) -> set[Path]:
+        return set(self._path_to_wd.keys())
+
+    def _on_readable(self, fd: int, mask: int) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, event_mask, cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+
+            if event_mask & _IN_Q_OVERFLOW:
+                log.warning("too many file system changes, inotify queue overflowed")
+                self._on_change(None)
+                continue
+
+            dir_path = self._wd_to_path.get(wd)
+            if dir_path is None:
+                # Events from a watch that was removed recently
+                continue
+
+            if event_mask & _IN_IGNORED:
+                # Directory was deleted or moved, and the kernel removed the watch
+                del self._wd_to_path[wd]
+                del self._path_to_wd[dir_path]
+            elif name:
+                self._on_change(dir_path / os.fsdecode(name))
+            else:
+                self._on_change(dir_path)
+
+
+def _take_snapshot(path: Path) -> tuple[int, int] | None:
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+class FileWatcher:
+    def __init__(self, widget: tkinter.Misc, providers: list[Callable[[], Iterable[Path]]]) -> None:
+        self._widget = widget
+        self._providers = providers
+        self._update_pending = False
+        self._changed_paths: set[Path] = set()
+        self._everything_changed = False
+        self._emit_pending = False
+
+        # Avoid checking again whether the same paths are directories
+        self._is_dir_cache: dict[Path, bool] = {}
+        # Checked when the window is focused: path --> (mtime, size)
+        self._polled: dict[Path, tuple[int, int] | None] = {}
+
+        self._inotify: _Inotify | None = None
+        if sys.platform == "linux":
+            try:
+                self._inotify = _Inotify(widget, self._add_change)
+            except OSError:
+                log.warning("can't use inotify, falling back to polling", exc_info=True)
+
+    def update_soon(self) -> None:
+        if not self._update_pending:
+            self._update_pending = True
+            self._widget.after_idle(self._update_watches)
+
+    def _update_watches(self) -> None:
+        self._update_pending = False
+
+        wanted: set[Path] = set()
+        for provider in self._providers:
+            wanted.update(provider())
+
+        if self._inotify is None:
+            to_poll = wanted
+        else:
+            # If a file is watched, inotify watches the folder containing it
+            self._is_dir_cache = {
+                path: self._is_dir_cache[path] if path in self._is_dir_cache else path.is_dir()
+                for path in wanted
+            }
+            wanted_dirs = {path if self._is_dir_cache[path] else path.parent for path in wanted}
+
+            inotify_dirs = self._inotify.get_watched_dirs()
+            for path in inotify_dirs - wanted_dirs:
+                self._inotify.remove_watch(path)
+                inotify_dirs.remove(path)
+            for path in wanted_dirs - inotify_dirs:
+                try:
+                    self._inotify.add_watch(path)
+                except OSError:
+                    log.debug(f"can't watch {path} with inotify, will poll instead", exc_info=True)
+                else:
+                    inotify_dirs.add(path)
+
+            to_poll = {
+                path
+                for path in wanted
+                if (path if self._is_dir_cache[path] else path.parent) not in inotify_dirs
+            }
+
+        for path in self._polled.keys() - to_poll:
+            del self._polled[path]
+        for path in to_poll - self._polled.keys():
+            self._polled[path] = _take_snapshot(path)
+
+    def poll(self) -> None:
+        for path, old_snapshot in self._polled.items():
+            new_snapshot = _take_snapshot(path)
+            if new_snapshot != old_snapshot:
+                self._polled[path] = new_snapshot
+                self._add_change(path)
+
+    def _add_change(self, path: Path | None) -> None:
+        if path is None:
+            self._everything_changed = True
+        else:
+            self._changed_paths.add(path)
+
+        if not self._emit_pending:
+            self._emit_pending = True
+            self._widget.after(_COALESCE_DELAY_MS, self._emit_changes)
+
+    def _emit_changes(self) -> None:
+        self._emit_pending = False
+        paths = sorted(map(str, self._changed_paths))
+        self._changed_paths.clear()
+
+        if self._everything_changed:
+            self._everything_changed = False
+            self._widget.event_generate("<<FileSystemChanged>>")
+        elif paths:
+            log.debug(f"{len(paths)} paths changed")
+            self._widget.event_generate("<<PathsChanged>>", data=PathsChanged(paths))
+
+        # Some directories may have been created or deleted
+        self.update_soon()
+
+
+_providers: list[Callable[[], Iterable[Path]]] = []
+_watcher: FileWatcher | None = None
+
+
+def add_watch_provider(provider: Callable[[], Iterable[Path]]) -> None:
+    """Watch the files and folders returned by *provider*.
+
+    The provider is called again after :func:`update_watches`, and whenever
+    something changes. If it returns a folder, changes in the files directly
+    inside it are noticed too, but not changes deeper inside subfolders.
+    """
+    _providers.append(provider)
+    update_watches()
+
+
+def update_watches() -> None:
+    """Call this when a watch provider would return something different."""
+    if _watcher is not None:
+        _watcher.update_soon()
+
+
+def _get_open_file_paths() -> list[Path]:
+    return [
+        tab.path
+        for tab in get_tab_manager().tabs()
+        if isinstance(tab, tabs.FileTab) and tab.path is not None
+    ]
+
+
+def _on_new_filetab(tab: tabs.FileTab) -> None:
+    update_watches()
+    tab.bind("<<PathChanged>>", (lambda event: update_watches()), add=True)
+    tab.bind("<Destroy>", (lambda event: update_watches()), add=True)
+
+
+def _on_focus_in(event: tkinter.Event[tkinter.Misc]) -> None:
+    if _watcher is not None and event.widget is get_main_window():
+        _watcher.poll()
+
+
+def setup() -> None:
+    global _watcher
+    _watcher = FileWatcher(get_tab_manager(), _providers)
+    add_watch_provider(_get_open_file_paths)
+
+    get_tab_manager().add_filetab_callback(_on_new_filetab)
+    get_main_window().bind("<FocusIn>", _on_focus_in, add=True)
+    # Refreshing everything on focus is not needed anymore
+    get_tab_manager().refresh_on_focus = False
@@ -4,7 +4,9 @@ from __future__ import annotations
 
 import argparse
 import fnmatch
+import functools
 import logging
+import os
 import re
 import tkinter
 from functools import partial
@@ -13,7 +15,7 @@ from typing import Any, Optional
 
 import tomli
 from pygments import lexers
-from pygments.util import ClassNotFound
+from pygments.lexer import LexerMeta
 
 from porcupine import dirs, get_parsed_args, get_tab_manager, menubar, settings, tabs
 from porcupine.settings import global_settings
@@ -22,6 +24,9 @@ log = logging.getLogger(__name__)
 FileType = dict[str, Any]
 filetypes: dict[str, FileType] = {}
 
+# Default for filetypes that don't specify shebang_regex
+_NO_SHEBANG_REGEX = r"this regex matches nothing^"
+
 
 # Sometimes dynamic typing is awesome
 def merge_settings(default: object, user: object) -> Any:
@@ -39,6 +44,60 @@ def is_list_of_strings(obj: object) -> bool:
     return isinstance(obj, list) and all(isinstance(item, str) for item in obj)
 
 
+class _FiletypeMatcher:
+    """Finds the filetypes that match a path or a shebang.
+
+    This gives the same results as checking all patterns of all filetypes
+    with :func:`fnmatch.fnmatch` and all shebang regexes with
+    :func:`re.search`, but faster. Most filename patterns are like ``*.py``,
+    and they are looked up from a dict. Other patterns are combined into one
+    regex, and checked one by one only if the combined regex matches.
+    """
+
+    def __init__(self, filetypes: dict[str, FileType]) -> None:
+        self._extension_to_names: dict[str, list[str]] = {}
+        self._other_patterns: list[tuple[str, re.Pattern[str]]] = []
+        self._shebang_regexes: list[tuple[str, re.Pattern[str]]] = []
+
+        for name, filetype in filetypes.items():
+            for pattern in filetype["filename_patterns"]:
+                # fnmatch.fnmatch() calls normcase(), e.g. case-insensitive on Windows
+                pattern = os.path.normcase(pattern)
+                extension = pattern.removeprefix("*.")
+                if pattern.startswith("*.") and not any(c in extension for c in "*?[./\\"):
+                    self._extension_to_names.setdefault(extension, []).append(name)
+                else:
+                    regex = fnmatch.translate(os.path.normcase("*/") + pattern)
+                    self._other_patterns.append((name, re.compile(regex)))
+
+            if filetype["shebang_regex"] != _NO_SHEBANG_REGEX:
+                self._shebang_regexes.append((name, re.compile(filetype["shebang_regex"])))
+
+        self._combined_regex = re.compile(
+            "|".join(f"(?:{regex.pattern})" for name, regex in self._other_patterns)
+        )
+
+    def get_names_matching_path(self, path: str) -> set[str]:
+        path = os.path.normcase(path)
+        result = set()
+
+        # "*/*.py" matches if there's a slash before ".py"
+        before_dot, dot, extension = path.rpartition(".")
+        if dot and os.path.normcase("/") in before_dot:
+            result.update(self._extension_to_names.get(extension, []))
+
+        if self._other_patterns and self._combined_regex.match(path):
+            result.update(name for name, regex in self._other_patterns if regex.match(path))
+
+        return result
+
+    def get_names_matching_shebang(self, shebang_line: str) -> set[str]:
+        return {name for name, regex in self._shebang_regexes if regex.search(shebang_line)}
+
+
+_matcher: _FiletypeMatcher
+
+
 def load_filetypes() -> None:
     # user_path can't be global var because tests monkeypatch
     user_path = dirs.config_dir / "filetypes.toml"
@@ -82,7 +141,7 @@ def load_filetypes() -> None:
                 del filetype["shebang_regex"]
 
         filetype.setdefault("filename_patterns", [])
-        filetype.setdefault("shebang_regex", r"this regex matches nothing^")
+        filetype.setdefault("shebang_regex", _NO_SHEBANG_REGEX)
         filetype.setdefault("syntax_highlighter", "pygments")
 
         # Please avoid code like "if this is a C file", in case someone wants to use the same thing for c++
@@ -90,6 +149,9 @@ def load_filetypes() -> None:
         assert "filetype_name" not in filetype
         filetype["filetype_name"] = name
 
+    global _matcher
+    _matcher = _FiletypeMatcher(filetypes)
+
 
 def get_filetype_from_matches(
     matches: dict[str, FileType], they_match_what: str
@@ -107,28 +169,26 @@ def get_filetype_from_matches(
 
 def guess_filetype_from_path(filepath: Path) -> FileType | None:
     assert filepath.is_absolute()
+    names = _matcher.get_names_matching_path(filepath.as_posix())
     return get_filetype_from_matches(
-        {
-            name: filetype
-            for name, filetype in filetypes.items()
-            if any(
-                fnmatch.fnmatch(filepath.as_posix(), "*/" + pat)
-                for pat in filetype["filename_patterns"]
-            )
-        },
-        str(filepath),
+        {name: filetype for name, filetype in filetypes.items() if name in names}, str(filepath)
     )
 
 
 def guess_filetype_from_shebang(content_start: str) -> FileType | None:
     shebang_line = content_start.split("\n")[0]
-    matches = {}
+    names = _matcher.get_names_matching_shebang(shebang_line)
+    return get_filetype_from_matches(
+        {name: filetype for name, filetype in filetypes.items() if name in names},
+        f"shebang {shebang_line!r}",
+    )
 
-    for name, filetype in filetypes.items():
-        if re.search(filetype["shebang_regex"], shebang_line) is not None:
-            matches[name] = filetype
 
-    return get_filetype_from_matches(matches, f"shebang {shebang_line!r}")
+# Pygments imports and checks all of its lexers, so this is slow without caching.
+# Pygments looks only at the file name, not the rest of the path.
+@functools.lru_cache(maxsize=256)
+def _find_pygments_lexer_class(filename: str) -> LexerMeta | None:
+    return lexers.find_lexer_class_for_filename(filename)
 
 
 # TODO: take content as argument
@@ -156,17 +216,17 @@ def guess_filetype(filepath: Path) -> FileType:
             return filetype
 
     # if nothing else works, create a new filetype automagically based on pygments
-    try:
-        lexer = lexers.get_lexer_for_filename(filepath)
-    except ClassNotFound:
+    lexer_class = _find_pygments_lexer_class(filepath.name)
+    if lexer_class is None:
         if shebang_line is None:
             return filetypes["Plain Text"]  # give up
         lexer = lexers.guess_lexer(shebang_line)
         if isinstance(lexer, lexers.TextLexer):
             return filetypes["Plain Text"]  # give up
+        lexer_class = type(lexer)
 
     return {
-        "pygments_lexer": type(lexer).__module__ + "." + type(lexer).__name__,
+        "pygments_lexer": lexer_class.__module__ + "." + lexer_class.__name__,
         "langserver": None,
     }
 
@@ -0,0 +1,318 @@
+"""Show lines that differ from the last git commit next to the line numbers.
+
+Added lines are green, modified lines are blue, and a red mark between two
+lines means that something was deleted there.
+"""
+
+from __future__ import annotations
+
+import bisect
+import difflib
+import logging
+import subprocess
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from porcupine import get_tab_manager, tabs, textutils, utils
+from porcupine.plugins.file_watcher import PathsChanged
+from porcupine.plugins.git_status import get_fingerprint
+from porcupine.plugins.linenumbers import LineNumbers, line_is_elided
+
+# file_watcher decides whether the <<FileSystemChanged>> binding is needed
+setup_after = ["linenumbers", "file_watcher"]
+
+log = logging.getLogger(__name__)
+
+# Only one thread, so that changes are diffed in the order they happened
+diff_pool = ThreadPoolExecutor(max_workers=1)
+
+
+class LineDiff:
+    """The difference between the lines of a file in git and the lines being edited.
+
+    The diff is stored as opcodes of :class:`difflib.SequenceMatcher`. When a
+    line is edited, only the changed lines and the differences next to them
+    are diffed again, so that typing doesn't get slower in long files.
+    """
+
+    def __init__(self, base_lines: list[str], lines: list[str]) -> None:
+        self.base_lines = base_lines
+        self.lines = lines
+        self.opcodes = difflib.SequenceMatcher(None, base_lines, lines).get_opcodes()
+
+    def apply_change(self, change: textutils.Change) -> None:
+        first = change.start[0] - 1
+        last = change.old_end[0] - 1
+        new_text = (
+            self.lines[first][: change.start[1]]
+            + change.new_text
+            + self.lines[last][change.old_end[1] :]
+        )
+        new_lines = new_text.split("\n")
+        self.lines[first : last + 1] = new_lines
+        self._rediff(first, last + 1, len(new_lines))
+
+    # Ensures that no "equal" opcode contains both lines[line-1] and lines[line]
+    def _split_equal_block(self, line: int) -> None:
+        index = bisect.bisect_right(self.opcodes, line, key=(lambda op: op[3])) - 1
+        if index < 0:
+            return
+        tag, i1, i2, j1, j2 = self.opcodes[index]
+        if tag == "equal" and j1 < line < j2:
+            cut = i1 + (line - j1)
+            self.opcodes[index : index + 1] = [
+                ("equal", i1, cut, j1, line),
+                ("equal", cut, i2, line, j2),
+            ]
+
+    # Lines start...end (in the old lines) were replaced with new_count lines
+    def _rediff(self, start: int, end: int, new_count: int) -> None:
+        self._split_equal_block(start)
+        self._split_equal_block(end)
+
+        # The opcodes of the changed lines, and differences right next to them
+        first = bisect.bisect_right(self.opcodes, start, key=(lambda op: op[4]))
+        last = bisect.bisect_left(self.opcodes, end, key=(lambda op: op[3])) - 1
+        while first > 0 and self.opcodes[first - 1][0] != "equal":
+            first -= 1
+        while last + 1 < len(self.opcodes) and self.opcodes[last + 1][0] != "equal":
+            last += 1
+
+        i_start = self.opcodes[first][1]
+        i_end = self.opcodes[last][2]
+        j_start = self.opcodes[first][3]
+        shift = new_count - (end - start)
+        j_end = self.opcodes[last][4] + shift
+
+        matcher = difflib.SequenceMatcher(
+            None, self.base_lines[i_start:i_end], self.lines[j_start:j_end]
+        )
+        new_opcodes = [
+            (tag, i1 + i_start, i2 + i_start, j1 + j_start, j2 + j_start)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        ]
+        new_opcodes.extend(
+            (tag, i1, i2, j1 + shift, j2 + shift)
+            for tag, i1, i2, j1, j2 in self.opcodes[last + 1 :]
+        )
+        self.opcodes[first:] = new_opcodes
+
+    def get_markers(self) -> dict[int, str]:
+        """Return a dict with line numbers as keys.
+
+        Values are ``"added"``, ``"modified"`` and ``"deleted"``. A deleted
+        marker means that lines were deleted just before the line.
+        """
+        result: dict[int, str] = {}
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == "insert":
+                result.update(dict.fromkeys(range(j1 + 1, j2 + 1), "added"))
+            elif tag == "replace":
+                result.update(dict.fromkeys(range(j1 + 1, j2 + 1), "modified"))
+            elif tag == "delete":
+                result.setdefault(min(j1 + 1, len(self.lines)), "deleted")
+        return result
+
+
+# Returns None if the file is not committed to git
+def _get_committed_content(path: Path, encoding: str) -> str | None:
+    try:
+        # "./" makes the path relative to the working directory, not repo root
+        result = subprocess.run(
+            ["git", "show", f"HEAD:./{path.name}"],
+            cwd=path.parent,
+            capture_output=True,
+            timeout=60,
+            **utils.subprocess_kwargs,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        log.debug(f"can't run git show for {path}", exc_info=True)
+        return None
+
+    if result.returncode != 0:
+        # Not in a git repo, not committed yet, or no commits at all
+        return None
+    # Porcupine converts line endings to "\n" when opening files
+    return result.stdout.decode(encoding, errors="replace").replace("\r\n", "\n")
+
+
+# Committing or checking out changes .git/index or .git/HEAD. Returns None if
+# that can't be used to notice new commits.
+def _get_repo_fingerprint(path: Path) -> list[int] | None:
+    for folder in path.parents:
+        if (folder / ".git").exists():
+            return get_fingerprint(folder)
+    return None
+
+
+class GitGutter:
+    def __init__(self, tab: tabs.FileTab, linenumbers: LineNumbers) -> None:
+        self._tab = tab
+        self._linenumbers = linenumbers
+        self._markers: dict[int, str] = {}
+        self._latest_future: Future[dict[int, str]] | None = None
+
+        # Used only in diff_pool. The committed content of the file is cached
+        # in self._diff, and it's loaded again only when the repo fingerprint
+        # changes. If the file isn't committed, it is diffed against nothing.
+        self._path: Path | None = None
+        self._encoding = "utf-8"
+        self._fingerprint: list[int] | None = None
+        self._diff: LineDiff | None = None
+        self._is_committed = False
+
+        linenumbers.bind("<<Updated>>", self._draw, add=True)
+
+    def load_committed_content(self, junk: object = None) -> None:
+        """Load the committed content of the file and the text being edited."""
+        self._submit(
+            partial(
+                self._load_in_thread,
+                self._tab.path,
+                self._tab.textwidget.get("1.0", "end - 1 char"),
+                self._tab.settings.get("encoding", str),
+            )
+        )
+
+    def refresh_committed_content(self, junk: object = None) -> None:
+        """Load the committed content again if something was committed."""
+        self._submit(self._refresh_in_thread)
+
+    def on_content_changed(self, event: utils.EventWithData) -> None:
+        self._submit(
+            partial(self._apply_changes_in_thread, event.data_class(textutils.Changes).change_list)
+        )
+
+    def _set_committed_content_in_thread(self, lines: list[str]) -> dict[int, str]:
+        assert self._path is not None
+        self._fingerprint = _get_repo_fingerprint(self._path)
+        committed_content = _get_committed_content(self._path, self._encoding)
+        self._is_committed = committed_content is not None
+        base_lines = [] if committed_content is None else committed_content.split("\n")
+        self._diff = LineDiff(base_lines, lines)
+        return self._get_markers_in_thread()
+
+    def _load_in_thread(self, path: Path | None, text: str, encoding: str) -> dict[int, str]:
+        self._path = path
+        self._encoding = encoding
+        if path is None:
+            self._diff = None
+            return {}
+        return self._set_committed_content_in_thread(text.split("\n"))
+
+    def _refresh_in_thread(self) -> dict[int, str]:
+        if self._path is None or self._diff is None:
+            return {}
+
+        fingerprint = _get_repo_fingerprint(self._path)
+        if fingerprint is not None and fingerprint == self._fingerprint:
+            return self._get_markers_in_thread()
+        # The lines being edited are already up to date
+        return self._set_committed_content_in_thread(self._diff.lines)
+
+    def _apply_changes_in_thread(self, changes: list[textutils.Change]) -> dict[int, str]:
+        if self._diff is None:
+            return {}
+        for change in changes:
+            self._diff.apply_change(change)
+        return self._get_markers_in_thread()
+
+    def _get_markers_in_thread(self) -> dict[int, str]:
+        if self._diff is None or not self._is_committed:
+            return {}
+        return self._diff.get_markers()
+
+    def _submit(self, func: Callable[[], dict[int, str]]) -> None:
+        poll_running = self._latest_future is not None
+        self._latest_future = diff_pool.submit(func)
+        if not poll_running:
+            self._poll()
+
+    def _poll(self) -> None:
+        if not self._linenumbers.winfo_exists():
+            # tab closed
+            return
+
+        assert self._latest_future is not None
+        if not self._latest_future.done():
+            self._linenumbers.after(25, self._poll)
+            return
+
+        # There's only one thread, so older futures are also done
+        self._markers = self._latest_future.result()
+        self._latest_future = None
+        self._draw()
+
+    def _draw(self, junk: object = None) -> None:
+        self._linenumbers.delete("git_gutter")
+        if not self._markers:
+            return
+
+        if utils.is_bright(self._linenumbers.cget("background")):
+            colors = {"added": "#007f00", "modified": "#3264c8", "deleted": "red"}
+        else:
+            colors = {"added": "#00c000", "modified": "#5f8fff", "deleted": "#ff4040"}
+
+        textwidget = self._tab.textwidget
+        right = self._linenumbers.winfo_width()
+        first_line = int(textwidget.index("@0,0").split(".")[0])
+        last_line = int(textwidget.index(f"@0,{textwidget.winfo_height()}").split(".")[0])
+
+        for lineno in range(first_line, last_line + 1):
+            status = self._markers.get(lineno)
+            if status is None:
+                continue
+            dlineinfo = textwidget.dlineinfo(f"{lineno}.0")
+            if dlineinfo is None or line_is_elided(textwidget, lineno):
+                continue
+
+            x, y, width, height, baseline = dlineinfo
+            if status == "deleted":
+                coords = (right - 8, y - 1, right, y + 1)
+            else:
+                coords = (right - 3, y, right, y + height)
+            self._linenumbers.create_rectangle(
+                *coords, fill=colors[status], width=0, tags="git_gutter"
+            )
+
+
+_gutters: dict[tabs.FileTab, GitGutter] = {}
+
+
+def on_new_filetab(tab: tabs.FileTab) -> None:
+    try:
+        linenumbers: LineNumbers = tab.left_frame.nametowidget("linenumbers")
+    except KeyError:
+        return  # linenumbers plugin disabled
+
+    gutter = GitGutter(tab, linenumbers)
+    _gutters[tab] = gutter
+    gutter.load_committed_content()
+
+    tab.bind("<<PathChanged>>", gutter.load_committed_content, add=True)
+    if get_tab_manager().refresh_on_focus:
+        # Without the file_watcher plugin, this is how commits are noticed
+        tab.bind("<<FileSystemChanged>>", gutter.refresh_committed_content, add=True)
+    utils.bind_with_data(tab.textwidget, "<<ContentChanged>>", gutter.on_content_changed, add=True)
+    tab.bind("<Destroy>", (lambda event: _gutters.pop(tab, None)), add=True)
+
+
+# Committing changes files inside .git. The file watcher notices that, if the
+# project is open in the directory tree.
+def on_paths_changed(event: utils.EventWithData) -> None:
+    repo_roots = set()
+    for string in event.data_class(PathsChanged).paths:
+        path = Path(string)
+        if ".git" in path.parts:
+            repo_roots.add(Path(*path.parts[: path.parts.index(".git")]))
+
+    for tab, gutter in _gutters.items():
+        if tab.path is not None and any(root in tab.path.parents for root in repo_roots):
+            gutter.refresh_committed_content()
+
+
+def setup() -> None:
+    get_tab_manager().add_filetab_callback(on_new_filetab)
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", on_paths_changed, add=True)
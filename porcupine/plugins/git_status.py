@@ -2,18 +2,21 @@
 
 from __future__ import annotations
 
-import ast
+import hashlib
+import json
 import logging
 import os
+import re
 import subprocess
 import sys
+import threading
 import time
-from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from typing import Any
 
-from porcupine import utils
+from porcupine import dirs, get_tab_manager, utils
 from porcupine.plugins.directory_tree import (
     DirectoryTree,
     FolderRefreshed,
@@ -21,6 +24,7 @@ from porcupine.plugins.directory_tree import (
     get_fg_and_bg_colors,
     get_path,
 )
+from porcupine.plugins.file_watcher import PathsChanged, add_watch_provider
 
 setup_after = ["directory_tree"]
 
@@ -29,89 +33,166 @@ log = logging.getLogger(__name__)
 # Each git subprocess uses one cpu core
 git_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
 
+# Cached statuses of projects that haven't been opened in a while are deleted
+_CACHE_MAX_AGE_DAYS = 30
 
-# Assuming utf-8 file system encoding, when git means örkkiäinen.txt,
-# it actually outputs "\303\266rkki\303\244inen.txt" with the quotes.
-#
-# The simplest way to parse this seems to be treating it as a Python
-# byte string:
-#
-#    >>> eval(r'b"\303\266rkki\303\244inen.txt"')
-#    b'\xc3\xb6rkki\xc3\xa4inen.txt'
-#    >>> eval(r'b"\303\266rkki\303\244inen.txt"').decode("utf-8")
-#    'örkkiäinen.txt'
-#
-# This works because git's weird quoting is apparently close enough
-# to Python's string syntax.
-def _parse_ascii_path_from_git(ascii_str: str) -> Path:
-    assert ascii_str.isascii()
 
-    if ascii_str.startswith('"') and ascii_str.endswith('"'):
-        # ast.literal_eval() is a safe/restricted version of the usual eval()
-        path_bytes = ast.literal_eval("b" + ascii_str)
+# Options that make "git status" faster in big repos. Checking which ones
+# can be used runs git too, so it's done only once for each project.
+_speedup_options: dict[Path, list[str]] = {}
 
-        # Avoid encoding errors, so that a weird file name will not prevent
-        # other files from working properly.
-        #
-        # TODO: sys.getfilesystemencoding() seems to always be UTF-8, even
-        #       on Windows, so not sure if this should always use utf-8
-        return Path(path_bytes.decode(sys.getfilesystemencoding(), errors="replace"))
+
+def _get_speedup_options(project_root: Path) -> list[str]:
+    if project_root in _speedup_options:
+        return _speedup_options[project_root]
+
+    result = []
+    try:
+        version_output = subprocess.run(
+            ["git", "version"], capture_output=True, text=True, **utils.subprocess_kwargs
+        ).stdout
+        config_result = subprocess.run(
+            ["git", "config", "--get", "core.untrackedCache"],
+            cwd=project_root,
+            capture_output=True,
+            **utils.subprocess_kwargs,
+        )
+    except OSError:
+        log.debug("can't check git version", exc_info=True)
     else:
-        return Path(ascii_str)
+        # The untracked cache (git 2.8 or newer) makes finding untracked files
+        # faster. Don't override the user's own setting, e.g. false on a file
+        # system where it doesn't work.
+        match = re.search(r"(\d+)\.(\d+)", version_output)
+        if (
+            match is not None
+            and (int(match.group(1)), int(match.group(2))) >= (2, 8)
+            and config_result.returncode != 0
+        ):
+            result = ["-c", "core.untrackedCache=true"]
+
+    _speedup_options[project_root] = result
+    return result
+
+
+def parse_git_status(output: str, project_root: Path) -> dict[str, str]:
+    """Parse the output of ``git status --ignored --porcelain=v2 -z``.
+
+    The result contains statuses of files and folders that git mentions, but
+    not statuses of folders that contain modified or added files. Paths are
+    strings formatted like in the item IDs of the directory tree, because
+    creating 100k ``Path`` objects would be slow.
+    """
+    prefix = os.path.join(str(project_root), "")
+
+    def full_path(relative: str) -> str:
+        # Git uses forward slashes, and a trailing slash for folders
+        return prefix + relative.rstrip("/").replace("/", os.sep)
 
+    # Show .git as ignored, even though it actually isn't
+    result = {full_path(".git"): "git_ignored"}
+
+    # Each entry ends with a zero byte, and paths are not quoted or escaped
+    entries = iter(output.split("\0"))
+    for entry in entries:
+        if entry.startswith("! "):
+            result[full_path(entry[2:])] = "git_ignored"
+        elif entry.startswith("? "):
+            result[full_path(entry[2:])] = "git_untracked"
+        elif entry.startswith("1 "):
+            # "1 XY sub mH mI mW hH hI path", where Y is "." if the file is
+            # unchanged since "git add", and "M" or "D" or "T" otherwise
+            status = "git_added" if entry[3] == "." else "git_modified"
+            result[full_path(entry.split(" ", 8)[8])] = status
+        elif entry.startswith("2 "):
+            # Renamed or copied: "2 XY sub mH mI mW hH hI Xscore path", then
+            # the original path as a separate entry
+            status = "git_added" if entry[3] == "." else "git_modified"
+            result[full_path(entry.split(" ", 9)[9])] = status
+            next(entries)
+        elif entry.startswith("u "):
+            result[full_path(entry.split(" ", 10)[10])] = "git_mergeconflict"
+        elif entry:
+            log.warning(f"unknown git status entry: {repr(entry)}")
+
+    return result
 
-def run_git_status(project_root: Path) -> dict[Path, str]:
+
+def run_git_status(project_root: Path, job: _GitStatusJob | None = None) -> dict[str, str]:
     try:
         start = time.perf_counter()
-        run_result = subprocess.run(
-            # For debugging: ["bash", "-c", "sleep 1 && git status --ignored --porcelain"],
-            ["git", "status", "--ignored", "--porcelain"],
+        process = subprocess.Popen(
+            # For debugging: ["bash", "-c", "sleep 1 && git status --ignored --porcelain=v2 -z"],
+            #
+            # Git's file system monitor is used only if the repo has
+            # core.fsmonitor configured. Porcupine doesn't turn it on by
+            # itself, because it starts a daemon that keeps running.
+            [
+                "git",
+                *_get_speedup_options(project_root),
+                "status",
+                "--ignored",
+                "--porcelain=v2",
+                "-z",
+            ],
             cwd=project_root,
-            capture_output=True,  # for logging error message
-            encoding=sys.getfilesystemencoding(),
-            timeout=(60 * 10),  # 10min. Must be huge to avoid unnecessary killing (#885)
+            # Don't let git status write to .git/index, because the file
+            # watcher would notice that and run git status again.
+            env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,  # for logging error message
             **utils.subprocess_kwargs,
         )
+        if job is not None:
+            job.set_process(process)
+
+        try:
+            # 10min. Must be huge to avoid unnecessary killing (#885)
+            stdout, stderr = process.communicate(timeout=(60 * 10))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+
         log.debug(
             f"running git status in {project_root} took"
             f" {round((time.perf_counter() - start)*1000)}ms"
         )
 
-        if run_result.returncode != 0:
+        if job is not None and job.cancelled.is_set():
+            log.debug(f"git status in {project_root} was killed")
+            return {}
+
+        if process.returncode != 0:
             # likely not a git repo because missing ".git" dir
-            log.debug(f"git status failed in {project_root}: {run_result}")
+            log.debug(
+                f"git status failed in {project_root} with exit code {process.returncode}:"
+                f" {stderr!r}"
+            )
             return {}
 
-    except (OSError, UnicodeError, subprocess.TimeoutExpired):
+        # Avoid encoding errors, so that a weird file name will not prevent
+        # other files from working properly.
+        #
+        # TODO: sys.getfilesystemencoding() seems to always be UTF-8, even
+        #       on Windows, so not sure if this should always use utf-8
+        output = stdout.decode(sys.getfilesystemencoding(), errors="replace")
+
+    except (OSError, subprocess.TimeoutExpired):
         log.warning("can't run git", exc_info=True)
         return {}
 
-    # Show .git as ignored, even though it actually isn't
-    result = {project_root / ".git": "git_ignored"}
-    for line in run_result.stdout.splitlines():
-        path = project_root / _parse_ascii_path_from_git(line[3:])
-        if line[1] == "M":
-            result[path] = "git_modified"
-        elif line[1] == " ":
-            result[path] = "git_added"
-        elif line[:2] == "??":
-            result[path] = "git_untracked"
-        elif line[:2] == "!!":
-            result[path] = "git_ignored"
-        elif line[:2] in {"AA", "UU"}:
-            result[path] = "git_mergeconflict"
-        else:
-            log.warning(f"unknown git status line: {repr(line)}")
+    result = parse_git_status(output, project_root)
 
     # When a folder contains files with different statuses, decide status of folder
     # There can be lots of statuses, not good to loop through them in gui thread
-    folder_to_content_statuses: dict[Path, set[str]] = {}
+    folder_to_content_statuses: dict[str, set[str]] = {}
     for path, status in result.items():
         if status in {"git_added", "git_modified", "git_mergeconflict"}:
-            for folder in path.parents:
+            folder = path
+            while folder != str(project_root):
+                folder = os.path.dirname(folder)
                 folder_to_content_statuses.setdefault(folder, set()).add(status)
-                if folder == project_root:
-                    break
 
     assert not (folder_to_content_statuses.keys() & result.keys())
 
@@ -128,35 +209,223 @@ def run_git_status(project_root: Path) -> dict[Path, str]:
     return result
 
 
+# Most things that change git statuses without changing files in the project,
+# such as "git add", "git commit" or "git checkout", change these files. The
+# file watcher tells about changes to files in the project. Returns None if
+# this doesn't work: the project can be a subfolder of a git repo, ".git" can
+# be a file in git submodules, and a new repo doesn't have .git/index.
+#
+# Git replaces these files instead of editing them in-place, so the inode
+# number changes even if the modification time is not precise enough.
+def get_fingerprint(project_root: Path) -> list[int] | None:
+    result = []
+    for name in ["index", "HEAD"]:
+        try:
+            stat_result = (project_root / ".git" / name).stat()
+        except OSError:
+            return None
+        result.extend([stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino])
+    return result
+
+
+def _get_cache_file(project_root: Path) -> Path:
+    name = hashlib.sha1(str(project_root).encode("utf-8")).hexdigest()
+    return dirs.cache_dir / "git_status" / f"{name}.json"
+
+
+# Returns (statuses, fingerprint)
+def _load_cached_statuses(project_root: Path) -> tuple[dict[str, str], list[int] | None] | None:
+    try:
+        with _get_cache_file(project_root).open("r", encoding="utf-8") as file:
+            cache = json.load(file)
+        if cache["project_root"] != str(project_root):
+            return None
+        return (dict(cache["statuses"]), cache["fingerprint"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        log.warning(f"reading cached git statuses of {project_root} failed", exc_info=True)
+        return None
+
+
+def _save_statuses(
+    project_root: Path, fingerprint: list[int] | None, statuses: dict[str, str]
+) -> None:
+    try:
+        cache_file = _get_cache_file(project_root)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        utils.write_atomically(
+            cache_file,
+            json.dumps(
+                {
+                    "project_root": str(project_root),
+                    "fingerprint": fingerprint,
+                    "statuses": statuses,
+                }
+            ),
+        )
+    except OSError:
+        log.warning(f"saving git statuses of {project_root} failed", exc_info=True)
+
+
+def _delete_old_cache_files() -> None:
+    try:
+        utils.delete_old_files(dirs.cache_dir / "git_status", _CACHE_MAX_AGE_DAYS)
+    except OSError:
+        log.warning("deleting old cached git statuses failed", exc_info=True)
+
+
+class _GitStatusJob:
+    def __init__(self, project_root: Path, use_cache: bool) -> None:
+        self.project_root = project_root
+        # Fingerprint of the project before running git status
+        self.fingerprint = get_fingerprint(project_root)
+        self.submit_time = time.monotonic()
+        self.start_time: float | None = None
+        self.cancelled = threading.Event()
+        self._process: subprocess.Popen[bytes] | None = None
+        self._lock = threading.Lock()
+        self.future = git_pool.submit(partial(self._run, use_cache))
+
+    # Runs in git_pool. The boolean is True if the statuses came from the
+    # cache and git status must run to be sure that they are correct. The
+    # result is None if the job was cancelled.
+    def _run(self, use_cache: bool) -> tuple[dict[str, str], bool] | None:
+        self.start_time = time.monotonic()
+        if self.cancelled.is_set():
+            return None
+
+        if use_cache:
+            cached = _load_cached_statuses(self.project_root)
+            if cached is not None:
+                statuses, fingerprint = cached
+                return (statuses, fingerprint is None or fingerprint != self.fingerprint)
+
+        statuses = run_git_status(self.project_root, self)
+        if self.cancelled.is_set():
+            return None
+        _save_statuses(self.project_root, self.fingerprint, statuses)
+        return (statuses, False)
+
+    def set_process(self, process: subprocess.Popen[bytes]) -> None:
+        with self._lock:
+            self._process = process
+            if self.cancelled.is_set():
+                process.kill()
+
+    # Can be called from any thread
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled.set()
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+
+
 class ProjectColorer:
+    """Runs git status in one project and colors its items in the tree.
+
+    Only one git status runs at a time in each project. If more are requested
+    while it runs, git status runs once more after it finishes, because the
+    running git status may have looked at the files before they changed.
+    """
+
     def __init__(self, tree: DirectoryTree, project_id: str):
         self.tree = tree
         self.project_id = project_id
-        self.project_path = get_path(project_id)
+        project_path = get_path(project_id)
+        assert project_path is not None
+        self.project_path = project_path
         self.queue: set[str] = set()
-        self._git_status_future: Future[dict[Path, str]] | None = None
-
-    def start_running_git_status(self) -> None:
-        self._git_status_future = git_pool.submit(partial(run_git_status, self.project_path))
-
-        # Handle queue contents when it has completed
-        def check() -> None:
-            if self._git_status_future is not None:
-                if self._git_status_future.done():
-                    self._handle_queue()
-                else:
-                    self.tree.after(25, check)
-
-        check()
+        # The statuses that the tree shows, None before the first git status is done
+        self.statuses: dict[str, str] | None = None
+        self._running_job: _GitStatusJob | None = None
+        self._latest_job: _GitStatusJob | None = None
+        self._pending_requests = 0
+        # Folders that were open in the tree, and hence watched by the file
+        # watcher, when the latest git status started. Files in other folders
+        # may have changed without Porcupine noticing.
+        self.watched_folder_ids: set[str] = set()
+
+    def request_git_status(self, *, use_cache: bool = False) -> None:
+        if self._running_job is None:
+            self._start_job(use_cache)
+        else:
+            self._pending_requests += 1
+            log.debug(
+                f"git status is already running in {self.project_path},"
+                f" {self._pending_requests} requests waiting for it"
+            )
+
+    # Use this to avoid running git status when nothing has changed. When
+    # files change, the file watcher requests a new git status anyway.
+    # Without the file watcher, changes made by other programs are noticed
+    # only by running git status.
+    def is_up_to_date(self) -> bool:
+        job = self._latest_job
+        return (
+            not get_tab_manager().refresh_on_focus
+            and job is not None
+            and job.fingerprint is not None
+            and job.fingerprint == get_fingerprint(self.project_path)
+        )
 
     def stop(self) -> None:
-        self._git_status_future = None
+        if self._running_job is not None:
+            self._running_job.cancel()
+            self._running_job = None
+        self._pending_requests = 0
+
+    def _start_job(self, use_cache: bool) -> None:
+        if not use_cache:
+            self.watched_folder_ids = set(self.tree.get_open_folder_ids(self.project_id))
+        job = _GitStatusJob(self.project_path, use_cache)
+        self._running_job = job
+        self._latest_job = job
+        self._wait_for_job(job)
+
+    def _wait_for_job(self, job: _GitStatusJob) -> None:
+        if job is not self._running_job:
+            # stopped
+            return
+        if not job.future.done():
+            self.tree.after(25, self._wait_for_job, job)
+            return
+
+        self._running_job = None
+        result = job.future.result()
+        assert job.start_time is not None
+        log.debug(
+            f"git status job of {self.project_path} waited in the queue for"
+            f" {round((job.start_time - job.submit_time)*1000)}ms, total time"
+            f" {round((time.monotonic() - job.submit_time)*1000)}ms"
+        )
 
-    def _choose_tag(self, item_path: Path) -> str | None:
-        # process should be done, result available immediately
-        assert self._git_status_future is not None
-        path_to_status = self._git_status_future.result(timeout=0)
-        return path_to_status.get(item_path, None)
+        if result is not None:
+            statuses, outdated = result
+            self._show_statuses(statuses)
+            if outdated:
+                # Something was committed or added after the previous Porcupine run
+                self._pending_requests += 1
+
+        if self._pending_requests > 0:
+            log.debug(
+                f"running git status again in {self.project_path} for"
+                f" {self._pending_requests} requests"
+            )
+            self._pending_requests = 0
+            self._start_job(use_cache=False)
+
+    def _show_statuses(self, new_statuses: dict[str, str]) -> None:
+        old_statuses = self.statuses
+        self.statuses = new_statuses
+        if old_statuses is not None:
+            # Items not in the queue already show old statuses, retag only what changed
+            self._retag_changed_items(old_statuses, new_statuses)
+        self._handle_queue()
+
+    def _choose_tag(self, item_id: str) -> str | None:
+        assert self.statuses is not None
+        return self.statuses.get(item_id.split(":", maxsplit=2)[2], None)
 
     def _set_tag(self, item_id: str, git_tag: str | None) -> bool:
         old_tags = set(self.tree.item(item_id, "tags"))
@@ -168,10 +437,31 @@ class ProjectColorer:
             return False
 
         self.tree.item(item_id, tags=list(new_tags))
+        self.tree.invalidate_sort_key(item_id)
         if item_id in self.tree.selection():
             update_tree_selection_color(self.tree)
         return True
 
+    def _retag_changed_items(
+        self, old_statuses: dict[str, str], new_statuses: dict[str, str]
+    ) -> None:
+        folders_to_sort = set()
+        for path in old_statuses.keys() | new_statuses.keys():
+            new_status = new_statuses.get(path)
+            if old_statuses.get(path) == new_status:
+                continue
+
+            if path == str(self.project_path):
+                self._set_tag(self.project_id, new_status)
+            else:
+                # Lazy-loading means that most paths aren't in the tree
+                item_id = self.tree.get_id_from_path(Path(path), self.project_id)
+                if item_id is not None and self._set_tag(item_id, new_status):
+                    folders_to_sort.add(self.tree.parent(item_id))
+
+        for folder_id in folders_to_sort:
+            self.tree.sort_folder_contents(folder_id)
+
     def _handle_queue(self) -> None:
         while self.queue:
             dir_id = self.queue.pop()
@@ -179,22 +469,20 @@ class ProjectColorer:
             if not self.tree.contains_dummy(dir_id):
                 tags_changed = False
                 for item_id in self.tree.get_children(dir_id):
-                    item_path = get_path(item_id)
-                    assert item_path is not None
-                    if self._set_tag(item_id, self._choose_tag(item_path)):
+                    if not item_id.startswith(("file:", "dir:")):
+                        # "(show N more...)" item
+                        continue
+                    if self._set_tag(item_id, self._choose_tag(item_id)):
                         tags_changed = True
                 if tags_changed:
                     self.tree.sort_folder_contents(dir_id)
 
             if dir_id.startswith("project:"):
-                dir_path = get_path(dir_id)
-                assert dir_path is not None
-                self._set_tag(dir_id, self._choose_tag(dir_path))
+                self._set_tag(dir_id, self._choose_tag(dir_id))
 
     def color_children_now_or_later(self, parent_id: str) -> None:
         self.queue.add(parent_id)
-        assert self._git_status_future is not None
-        if self._git_status_future.done():
+        if self.statuses is not None:
             self._handle_queue()
 
 
@@ -221,20 +509,66 @@ class TreeColorer:
         self.tree.tag_configure("git_untracked", foreground="red4")
         self.tree.tag_configure("git_ignored", foreground=gray)
 
-    def start_status_coloring_for_all_projects(self, junk_event: object) -> None:
+    def _get_colorer(self, project_id: str) -> ProjectColorer:
+        colorer = self.project_specific_colorers.get(project_id)
+        if colorer is None:
+            colorer = ProjectColorer(self.tree, project_id)
+            self.project_specific_colorers[project_id] = colorer
+            colorer.request_git_status(use_cache=True)
+        return colorer
+
+    def stop_all(self, junk: object = None) -> None:
         for colorer in self.project_specific_colorers.values():
             colorer.stop()
         self.project_specific_colorers.clear()
 
+    def start_status_coloring_for_all_projects(self, junk_event: object) -> None:
+        project_ids = self.tree.get_children()
+        for project_id in list(self.project_specific_colorers.keys()):
+            if project_id not in project_ids:
+                self.project_specific_colorers.pop(project_id).stop()
+
+        for project_id in project_ids:
+            if project_id in self.project_specific_colorers:
+                colorer = self.project_specific_colorers[project_id]
+                # When something has changed, the file watcher has already
+                # requested a new git status, so there's no need to do
+                # anything if only the files of some other project changed.
+                if colorer.is_up_to_date():
+                    log.debug(f"reusing git statuses of {colorer.project_path}")
+                else:
+                    colorer.request_git_status()
+            else:
+                colorer = self._get_colorer(project_id)
+            colorer.color_children_now_or_later(project_id)
+
+    def rerun_git_status_for_changed_projects(self, event: utils.EventWithData) -> None:
+        changed_paths = [Path(path) for path in event.data_class(PathsChanged).paths]
+
         for project_id in self.tree.get_children():
-            colorer = ProjectColorer(self.tree, project_id)
-            self.project_specific_colorers[project_id] = colorer
-            colorer.queue.add(project_id)
-            colorer.start_running_git_status()
+            project_path = get_path(project_id)
+            if not any(
+                path == project_path or project_path in path.parents for path in changed_paths
+            ):
+                continue
+
+            if project_id in self.project_specific_colorers:
+                self.project_specific_colorers[project_id].request_git_status()
+            else:
+                # The directory tree doesn't refresh all folders, so color them all here
+                colorer = self._get_colorer(project_id)
+                for folder_id in self.tree.get_open_folder_ids(project_id):
+                    colorer.color_children_now_or_later(folder_id)
 
     def color_child_items(self, event: utils.EventWithData) -> None:
         info = event.data_class(FolderRefreshed)
-        self.project_specific_colorers[info.project_id].color_children_now_or_later(info.folder_id)
+        colorer = self._get_colorer(info.project_id)
+        if info.folder_id not in colorer.watched_folder_ids:
+            # The folder was just opened, or it was open when Porcupine
+            # started. Its files may have changed while it wasn't watched.
+            colorer.watched_folder_ids.add(info.folder_id)
+            colorer.request_git_status()
+        colorer.color_children_now_or_later(info.folder_id)
 
 
 # There's no way to say "when this item is selected, show a green selection".
@@ -276,16 +610,41 @@ def sorting_key(tree: DirectoryTree, item_id: str) -> Any:
     ].index(git_tag)
 
 
+# Watching these notices when e.g. "git add" or "git commit" changes .git/index
+def get_git_dirs(tree: DirectoryTree) -> list[Path]:
+    result = []
+    for project_id in tree.get_children():
+        project_path = get_path(project_id)
+        assert project_path is not None
+        result.append(project_path / ".git")
+    return result
+
+
 def setup() -> None:
     tree = get_directory_tree()
 
     main_colorer = TreeColorer(tree)
+    tree.bind("<Destroy>", main_colorer.stop_all, add=True)
     tree.bind("<<RefreshBegins>>", main_colorer.start_status_coloring_for_all_projects, add=True)
     utils.bind_with_data(tree, "<<FolderRefreshed>>", main_colorer.color_child_items, add=True)
 
+    utils.bind_with_data(
+        get_tab_manager(),
+        "<<PathsChanged>>",
+        main_colorer.rerun_git_status_for_changed_projects,
+        add=True,
+    )
+    add_watch_provider(partial(get_git_dirs, tree))
+
     tree.sorting_keys.insert(0, partial(sorting_key, tree))
+    tree.invalidate_all_sort_keys()
 
     tree.bind("<<TreeviewSelect>>", partial(update_tree_selection_color, tree), add=True)
     update_tree_selection_color(tree)
     tree.bind("<<ThemeChanged>>", main_colorer.config_color_tags, add=True)
     main_colorer.config_color_tags()
+
+    # The directory tree has already started refreshing, before this plugin was set up
+    main_colorer.start_status_coloring_for_all_projects(None)
+
+    git_pool.submit(_delete_old_cache_files)
@@ -18,7 +18,6 @@ from porcupine import get_tab_manager, tabs, textutils, utils
 
 from .base_highlighter import BaseHighlighter
 from .pygments_highlighter import PygmentsHighlighter
-from .tree_sitter_highlighter import TreeSitterHighlighter
 
 log = logging.getLogger(__name__)
 
@@ -36,6 +35,10 @@ class HighlighterManager:
         highlighter_name = self._tab.settings.get("syntax_highlighter", str)
 
         if highlighter_name == "tree_sitter":
+            # tree_sitter and its language pack are slow to import, and not
+            # needed at all if every file uses pygments
+            from .tree_sitter_highlighter import TreeSitterHighlighter
+
             language_name = self._tab.settings.get("tree_sitter_language_name", str)
             log.info(f"creating a tree_sitter highlighter with language {repr(language_name)}")
             self._highlighter = TreeSitterHighlighter(self._tab.textwidget, language_name)
@@ -1,6 +1,3 @@
-# type: ignore
-# TODO: langservers are disabled for now. Fix and enable!
-
 """Langserver support for autocompletions."""
 
 # TODO: CompletionProvider
@@ -18,19 +15,20 @@ import signal
 import subprocess
 import sys
 import threading
-from collections.abc import Iterator
+import time
+import tkinter
+from collections.abc import Callable, Iterator
 from functools import partial
 from pathlib import Path
 from typing import IO, Any, Optional
 from urllib.request import url2pathname
 
-if sys.platform != "win32":
-    import fcntl
-
-# import sansio_lsp_client as lsp
+import psutil
+import sansio_lsp_client as lsp
 
 from porcupine import get_tab_manager, tabs, textutils, utils
 from porcupine.plugins import autocomplete, hover, jump_to_definition, python_venv, underlines
+from porcupine.settings import global_settings
 
 global_log = logging.getLogger(__name__)
 
@@ -46,45 +44,61 @@ setup_after = ["python_venv", "underlines"]
 CHUNK_SIZE = 64 * 1024
 
 
-class NonBlockingIO:
-    def __init__(self, process: subprocess.Popen[bytes]) -> None:
+# Calls on_data() with received bytes, or with b"" when the process closes its
+# stdout. Nothing is polled on Unix: Tk file handlers run the callbacks as soon
+# as the langserver sends something, or as soon as its stdin can take more data.
+class LangServerIO:
+    def __init__(
+        self,
+        process: subprocess.Popen[bytes],
+        widget: tkinter.Misc,
+        on_data: Callable[[bytes], None],
+    ) -> None:
         self._process = process
+        self._widget = widget
+        self._on_data = on_data
+        self._closed = False
 
-        # Reads can obviously block, but flushing can block too, see #635
-        # Nonblock flags don't help with writing, it raises error if it would block
-        self._write_queue: queue.Queue[bytes] = queue.Queue()
-        threading.Thread(target=self._write_queue_to_stdin, daemon=True).start()
+        assert process.stdin is not None
+        assert process.stdout is not None
 
         if sys.platform == "win32":
+            # Tk file handlers don't exist on Windows
+            #
+            # Reads can obviously block, but flushing can block too, see #635
+            self._write_queue: queue.Queue[bytes | None] = queue.Queue()
             self._read_queue: queue.Queue[bytes] = queue.Queue()
+            threading.Thread(target=self._write_queue_to_stdin, daemon=True).start()
             self._reader_thread = threading.Thread(target=self._stdout_to_read_queue, daemon=True)
             self._reader_thread.start()
+            self._check_read_queue()
         else:
-            # this works because we don't use .readline()
-            # https://stackoverflow.com/a/1810703
-            assert process.stdout is not None
-            fileno = process.stdout.fileno()
-            old_flags = fcntl.fcntl(fileno, fcntl.F_GETFL)
-            new_flags = old_flags | os.O_NONBLOCK
-            fcntl.fcntl(fileno, fcntl.F_SETFL, new_flags)
-
-    def _write_queue_to_stdin(self) -> None:
-        while self._process.poll() is None:
-            # Why timeout: if process dies and no more to write, stop soon
-            try:
-                chunk = self._write_queue.get(timeout=5)
-            except queue.Empty:  # timed out
-                continue
-
-            # Process can exit while waiting, but clean shutdown involves
-            # writing messages before the process exits, so here it should
-            # be still alive
-            assert self._process.stdin is not None
-            self._process.stdin.write(chunk)
-            self._process.stdin.flush()
+            # We can't use process.stdin.write() or process.stdout.read(),
+            # because their buffering doesn't know about nonblocking file descriptors
+            self._stdin_fileno = process.stdin.fileno()
+            self._stdout_fileno = process.stdout.fileno()
+            self._write_buffer = bytearray()
+            self._waiting_for_writable = False
+            os.set_blocking(self._stdin_fileno, False)
+            os.set_blocking(self._stdout_fileno, False)
+            widget.tk.createfilehandler(self._stdout_fileno, tkinter.READABLE, self._on_readable)
 
     if sys.platform == "win32":
 
+        def _write_queue_to_stdin(self) -> None:
+            while True:
+                chunk = self._write_queue.get()
+                if chunk is None:
+                    break
+
+                assert self._process.stdin is not None
+                try:
+                    self._process.stdin.write(chunk)
+                    self._process.stdin.flush()
+                except OSError:
+                    # Process died, on_data(b"") will be called soon
+                    break
+
         def _stdout_to_read_queue(self) -> None:
             while True:
                 # for whatever reason, nothing works unless i go ONE BYTE at a
@@ -97,12 +111,7 @@ class NonBlockingIO:
                     break
                 self._read_queue.put(one_fucking_byte)
 
-    # Return values:
-    #   - nonempty bytes object: data was read
-    #   - empty bytes object: process exited
-    #   - None: no data to read
-    def read(self) -> bytes | None:
-        if sys.platform == "win32":
+        def _check_read_queue(self) -> None:
             buf = bytearray()
             while True:
                 try:
@@ -110,16 +119,69 @@ class NonBlockingIO:
                 except queue.Empty:
                     break
 
-            if self._reader_thread.is_alive() and not buf:
-                return None
-            return bytes(buf)
+            if buf:
+                self._on_data(bytes(buf))
+            if not self._reader_thread.is_alive() and self._read_queue.empty():
+                self.close()
+                self._on_data(b"")
+            elif not self._closed:
+                self._widget.after(50, self._check_read_queue)
 
-        else:
-            assert self._process.stdout is not None
-            return self._process.stdout.read(CHUNK_SIZE)
+        def write(self, bytez: bytes) -> None:
+            if bytez and not self._closed:
+                self._write_queue.put(bytez)
 
-    def write(self, bytez: bytes) -> None:
-        self._write_queue.put(bytez)
+        def close(self) -> None:
+            if not self._closed:
+                self._closed = True
+                self._write_queue.put(None)
+
+    else:
+
+        def _on_readable(self, fileno: int, mask: int) -> None:
+            try:
+                received_bytes = os.read(self._stdout_fileno, CHUNK_SIZE)
+            except BlockingIOError:
+                return
+            except OSError:
+                received_bytes = b""
+
+            if not received_bytes:
+                self.close()
+            self._on_data(received_bytes)
+
+        def _write_some(self, fileno: int | None = None, mask: int | None = None) -> None:
+            try:
+                written = os.write(self._stdin_fileno, self._write_buffer)
+            except BlockingIOError:
+                written = 0
+            except OSError:
+                # Process died. Reading stdout will notice it soon.
+                written = len(self._write_buffer)
+            del self._write_buffer[:written]
+
+            if self._write_buffer and not self._waiting_for_writable:
+                self._widget.tk.createfilehandler(
+                    self._stdin_fileno, tkinter.WRITABLE, self._write_some
+                )
+                self._waiting_for_writable = True
+            elif not self._write_buffer and self._waiting_for_writable:
+                self._widget.tk.deletefilehandler(self._stdin_fileno)
+                self._waiting_for_writable = False
+
+        def write(self, bytez: bytes) -> None:
+            if bytez and not self._closed:
+                self._write_buffer += bytez
+                if not self._waiting_for_writable:
+                    self._write_some()
+
+        def close(self) -> None:
+            if not self._closed:
+                self._closed = True
+                self._widget.tk.deletefilehandler(self._stdout_fileno)
+                if self._waiting_for_writable:
+                    self._widget.tk.deletefilehandler(self._stdin_fileno)
+                    self._waiting_for_writable = False
 
 
 def completion_item_doc_contains_label(doc: str, label: str) -> bool:
@@ -238,6 +300,15 @@ def _get_hover_string(
     return hover_contents
 
 
+# The spec allows textDocumentSync to be a number or an object, and if it's
+# missing, the langserver doesn't want to know about changes at all
+def _get_text_document_sync_kind(capabilities: dict[str, Any]) -> lsp.TextDocumentSyncKind:
+    sync = capabilities.get("textDocumentSync", lsp.TextDocumentSyncKind.NONE)
+    if isinstance(sync, dict):
+        sync = sync.get("change", lsp.TextDocumentSyncKind.NONE)
+    return lsp.TextDocumentSyncKind(sync)
+
+
 def _substitute_python_venv_recursively(obj: object, venv: Path | None) -> Any:
     if isinstance(obj, list):
         return [_substitute_python_venv_recursively(item, venv) for item in obj]
@@ -251,6 +322,17 @@ def _substitute_python_venv_recursively(obj: object, venv: Path | None) -> Any:
     return obj
 
 
+def _get_workspace_folder(project_root: Path) -> lsp.WorkspaceFolder:
+    return lsp.WorkspaceFolder(uri=project_root.as_uri(), name=project_root.name)
+
+
+# Langservers that support this can be shared between projects: when a file
+# from a new project is opened, the project is added as a workspace folder.
+def _supports_workspace_folders(capabilities: dict[str, Any]) -> bool:
+    workspace_folders = capabilities.get("workspace", {}).get("workspaceFolders", {})
+    return bool(workspace_folders.get("supported") and workspace_folders.get("changeNotifications"))
+
+
 @dataclasses.dataclass
 class LangServerConfig:
     command: str
@@ -264,44 +346,164 @@ class LangServer:
         process: subprocess.Popen[bytes],
         log: logging.LoggerAdapter[logging.Logger],
         config: LangServerConfig,
-        project_root: Path,
+        project_root: Path | None,
+        settings: Any,
     ) -> None:
         self._process = process
         self.log = log
         self._config = config
-        self._project_root = project_root
 
-        self._lsp_client = lsp.Client(trace="verbose", root_uri=project_root.as_uri())
+        # None means a warm langserver, started before any project needs it
+        if project_root is None:
+            self.project_roots = []
+            self._lsp_client = lsp.Client(trace="verbose", workspace_folders=[])
+        else:
+            self.project_roots = [project_root]
+            self._lsp_client = lsp.Client(
+                trace="verbose",
+                root_uri=project_root.as_uri(),
+                workspace_folders=[_get_workspace_folder(project_root)],
+            )
+        self._workspace_folders_sent = self.project_roots.copy()
+        # A warm langserver gets the settings of the project it is likely used for
+        self.settings = settings
 
         self._autocompletion_requests: dict[lsp.Id, tuple[tabs.FileTab, autocomplete.Request]] = {}
         self._jump2def_requests: dict[lsp.Id, tabs.FileTab] = {}
         self._hover_requests: dict[lsp.Id, tuple[tabs.FileTab, str]] = {}
 
         self._version_counter = itertools.count()
+        self._sync_kind = lsp.TextDocumentSyncKind.NONE
+        self.supports_workspace_folders = False
         self.tabs_opened: set[tabs.FileTab] = set()
+        self._tab_paths: dict[tabs.FileTab, Path] = {}
+        self._tab_project_roots: dict[tabs.FileTab, Path] = {}
         self._is_shutting_down_cleanly = False
 
-        self._io = NonBlockingIO(process)
+        self.last_used = time.monotonic()
+        self._idle_timeout_id: str | None = None
+        self._start_idle_timeout()
+
+        self._io = LangServerIO(process, get_tab_manager(), self._on_data)
+        self._send_queued_messages()
 
     def __repr__(self) -> str:
         return (
             f"<{type(self).__name__}: "
-            f'PID {self._process.pid} for project "{self._project_root}", '
+            f"PID {self._process.pid} for projects {[str(p) for p in self.project_roots]}, "
             f"configured with {self._config}, "
             f"{len(self.tabs_opened)} tabs opened>"
         )
 
+    @property
+    def command(self) -> str:
+        return self._config.command
+
     def _is_in_langservers(self) -> bool:
         # This returns False if a langserver died and another one with the same
         # id was launched.
-        return langservers.get((self._project_root, self._config.command), None) is self
+        return self in langservers.values()
 
     def _get_removed_from_langservers(self) -> None:
         # this is called more than necessary to make sure we don't end up with
         # funny issues caused by unusable langservers
         if self._is_in_langservers():
             self.log.debug("getting removed from langservers")
-            del langservers[(self._project_root, self._config.command)]
+            for key, langserver in list(langservers.items()):
+                if langserver is self:
+                    del langservers[key]
+
+    def _start_idle_timeout(self) -> None:
+        self._cancel_idle_timeout()
+        timeout_ms = round(global_settings.get("langserver_idle_timeout", float) * 1000)
+        self._idle_timeout_id = get_tab_manager().after(timeout_ms, self._on_idle_timeout)
+
+    def _cancel_idle_timeout(self) -> None:
+        if self._idle_timeout_id is not None:
+            get_tab_manager().after_cancel(self._idle_timeout_id)
+            self._idle_timeout_id = None
+
+    def _on_idle_timeout(self) -> None:
+        self._idle_timeout_id = None
+        if not self.project_roots and self._is_wanted_as_warm_langserver():
+            # It would be started again right away
+            self._start_idle_timeout()
+            return
+        if self._is_in_langservers() and not self.tabs_opened:
+            self.log.info("langserver has not been used for a while")
+            self.shutdown()
+
+    def _is_wanted_as_warm_langserver(self) -> bool:
+        config = _get_selected_tab_config()
+        return config is not None and config.command == self.command
+
+    def is_idle(self) -> bool:
+        return not self.tabs_opened
+
+    def get_memory_usage(self) -> int:
+        """Return the RSS of the langserver process and its child processes, in bytes."""
+        try:
+            process = psutil.Process(self._process.pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return 0
+
+        result = 0
+        for process in processes:
+            try:
+                result += process.memory_info().rss
+            except psutil.Error:
+                # Child process exited while we were looping
+                pass
+        return result
+
+    def can_add_project(self, settings: Any) -> bool:
+        if settings != self.settings:
+            # e.g. different Python venvs
+            return False
+        if self._lsp_client.state == lsp.ClientState.WAITING_FOR_INITIALIZED:
+            return self.command in _commands_supporting_workspace_folders
+        return self._lsp_client.state == lsp.ClientState.NORMAL and self.supports_workspace_folders
+
+    def add_project(self, project_root: Path) -> None:
+        assert project_root not in self.project_roots
+        self.log.info(f"adding workspace folder: {project_root}")
+        self.project_roots.append(project_root)
+        langservers[(project_root, self.command)] = self
+        if langservers.get((None, self.command)) is self:
+            # no longer a warm langserver
+            del langservers[(None, self.command)]
+        self._send_workspace_folder_changes()
+
+    def _send_workspace_folder_changes(self) -> None:
+        if self._lsp_client.state != lsp.ClientState.NORMAL:
+            # Will be sent when the langserver has started
+            return
+
+        added = [root for root in self.project_roots if root not in self._workspace_folders_sent]
+        removed = [root for root in self._workspace_folders_sent if root not in self.project_roots]
+        if added or removed:
+            # TODO: sansio-lsp-client has did_change_workspace_folders(), but it
+            #       doesn't put the folders inside "event" like the spec says
+            self._lsp_client._send_notification(
+                "workspace/didChangeWorkspaceFolders",
+                {
+                    "event": {
+                        "added": [_get_workspace_folder(root).dict() for root in added],
+                        "removed": [_get_workspace_folder(root).dict() for root in removed],
+                    }
+                },
+            )
+            self._workspace_folders_sent = self.project_roots.copy()
+            self._send_queued_messages()
+
+    def _remove_project_if_unused(self, project_root: Path) -> None:
+        if len(self.project_roots) >= 2 and project_root not in self._tab_project_roots.values():
+            self.log.info(f"removing workspace folder: {project_root}")
+            self.project_roots.remove(project_root)
+            if langservers.get((project_root, self.command)) is self:
+                del langservers[(project_root, self.command)]
+            self._send_workspace_folder_changes()
 
     def _ensure_langserver_process_quits_soon(self) -> None:
         exit_code = self._process.poll()
@@ -337,25 +539,20 @@ class LangServer:
 
         self._get_removed_from_langservers()
 
-    # returns whether this should be ran again
-    def _run_stuff_once(self) -> bool:
+    # sansio-lsp-client doesn't do any I/O, it only tells what to send
+    def _send_queued_messages(self) -> None:
         self._io.write(self._lsp_client.send())
-        received_bytes = self._io.read()
 
-        # yes, None and b'' have a different meaning here
-        if received_bytes is None:
-            # no data received
-            return True
-        elif received_bytes == b"":
+    def _on_data(self, received_bytes: bytes) -> None:
+        if not received_bytes:
             # stdout or langserver socket is closed. Communicating with the
             # langserver process is impossible, so this LangServer object and
             # the process are useless.
             #
             # TODO: try to restart the langserver process?
             self._ensure_langserver_process_quits_soon()
-            return False
+            return
 
-        assert received_bytes
         self.log.debug(f"got {len(received_bytes)} bytes of data")
 
         try:
@@ -369,7 +566,8 @@ class LangServer:
             else:
                 self.log.exception("error while handling langserver event")
 
-        return True
+        # e.g. responding to Initialized event
+        self._send_queued_messages()
 
     def _send_tab_opened_message(self, tab: tabs.FileTab) -> None:
         config = tab.settings.get("langserver", Optional[LangServerConfig])
@@ -415,6 +613,12 @@ class LangServer:
             self.log.info(
                 "langserver initialized, capabilities:\n" + pprint.pformat(lsp_event.capabilities)
             )
+            self._sync_kind = _get_text_document_sync_kind(lsp_event.capabilities)
+            self.log.debug(f"using text document sync kind {self._sync_kind!r}")
+            self.supports_workspace_folders = _supports_workspace_folders(lsp_event.capabilities)
+            if self.supports_workspace_folders:
+                _commands_supporting_workspace_folders.add(self.command)
+                self._send_workspace_folder_changes()
 
             for tab in self.tabs_opened:
                 self._send_tab_opened_message(tab)
@@ -424,15 +628,14 @@ class LangServer:
             #     officially support workspace/didChangeConfiguration yet.
             #   - This doesn't refresh as venv changes.
             self._lsp_client._send_request(
-                "workspace/didChangeConfiguration",
-                {
-                    "settings": _substitute_python_venv_recursively(
-                        self._config.settings, python_venv.get_venv(self._project_root)
-                    )
-                },
+                "workspace/didChangeConfiguration", {"settings": self.settings}
             )
             return
 
+        if isinstance(lsp_event, lsp.WorkspaceFolders):
+            lsp_event.reply([_get_workspace_folder(root) for root in self.project_roots])
+            return
+
         if isinstance(lsp_event, lsp.Completion):
             tab, req = self._autocompletion_requests.pop(lsp_event.message_id)
             if tab not in self.tabs_opened:
@@ -553,16 +756,18 @@ class LangServer:
         # str(lsp_event) or just lsp_event won't show the type
         raise NotImplementedError(repr(lsp_event))
 
-    def run_stuff(self) -> None:
-        if self._run_stuff_once():
-            get_tab_manager().after(50, self.run_stuff)
-
     def open_tab(self, tab: tabs.FileTab) -> None:
         assert tab not in self.tabs_opened
+        assert tab.path is not None
         self.tabs_opened.add(tab)
+        self._tab_paths[tab] = tab.path
+        self._tab_project_roots[tab] = utils.find_project_root(tab.path)
+        self._cancel_idle_timeout()
+        self.last_used = time.monotonic()
         self.log.debug("tab opened")
         if self._lsp_client.state == lsp.ClientState.NORMAL:
             self._send_tab_opened_message(tab)
+            self._send_queued_messages()
 
     def forget_tab(self, tab: tabs.FileTab, *, may_shutdown: bool = True) -> None:
         if not self._is_in_langservers():
@@ -572,20 +777,45 @@ class LangServer:
             return
 
         self.tabs_opened.remove(tab)
+        path = self._tab_paths.pop(tab)
+        project_root = self._tab_project_roots.pop(tab)
         self.log.debug("tab closed")
 
-        if may_shutdown and not self.tabs_opened:
-            self.log.info("no more open tabs, shutting down")
-            self._is_shutting_down_cleanly = True
-            self._get_removed_from_langservers()
+        if self._lsp_client.state == lsp.ClientState.NORMAL:
+            # The path of the tab may have changed already, so can't use tab.path
+            self._lsp_client.did_close(lsp.TextDocumentIdentifier(uri=path.as_uri()))
+            self._send_queued_messages()
+
+        if may_shutdown:
+            self._remove_project_if_unused(project_root)
+            if not self.tabs_opened:
+                # Keep the langserver running for a while, in case the user opens another file
+                self.log.info("no more open tabs, will shut down soon if not used")
+                self._start_idle_timeout()
+
+    def shutdown(self) -> None:
+        self.log.info("shutting down")
+        self._cancel_idle_timeout()
+        self._is_shutting_down_cleanly = True
+        self._get_removed_from_langservers()
 
-            if self._lsp_client.state == lsp.ClientState.NORMAL:
-                self._lsp_client.shutdown()
-            else:
-                # it was never fully started
-                self._process.kill()
+        for tab in self.tabs_opened:
+            tab.event_generate(
+                "<<SetUnderlines>>", data=underlines.Underlines(id="diagnostics", underline_list=[])
+            )
+        self.tabs_opened.clear()
+        self._tab_paths.clear()
+        self._tab_project_roots.clear()
+
+        if self._lsp_client.state == lsp.ClientState.NORMAL:
+            self._lsp_client.shutdown()
+            self._send_queued_messages()
+        else:
+            # it was never fully started
+            self._process.kill()
 
     def request_completions(self, tab: tabs.FileTab, event: utils.EventWithData) -> None:
+        self.last_used = time.monotonic()
         if self._lsp_client.state != lsp.ClientState.NORMAL:
             self.log.warning(
                 f"autocompletions requested but langserver state == {self._lsp_client.state!r}"
@@ -608,6 +838,7 @@ class LangServer:
 
         assert lsp_id not in self._autocompletion_requests
         self._autocompletion_requests[lsp_id] = (tab, request)
+        self._send_queued_messages()
 
     def request_jump_to_definition(self, tab: tabs.FileTab) -> None:
         self.log.info(f"Jump to definition requested: {tab.path} {self._lsp_client.state}")
@@ -619,6 +850,7 @@ class LangServer:
                 )
             )
             self._jump2def_requests[request_id] = tab
+            self._send_queued_messages()
 
     def request_hover(self, tab: tabs.FileTab, location: str) -> None:
         self.log.info(f"Hover requested: {tab.path} {self._lsp_client.state}")
@@ -630,8 +862,10 @@ class LangServer:
                 )
             )
             self._hover_requests[request_id] = (tab, location)
+            self._send_queued_messages()
 
     def send_change_events(self, tab: tabs.FileTab, changes: textutils.Changes) -> None:
+        self.last_used = time.monotonic()
         if self._lsp_client.state != lsp.ClientState.NORMAL:
             # The langserver will receive the actual content of the file once
             # it starts.
@@ -640,12 +874,13 @@ class LangServer:
             )
             return
 
-        assert tab.path is not None
-        self._lsp_client.did_change(
-            text_document=lsp.VersionedTextDocumentIdentifier(
-                uri=tab.path.as_uri(), version=next(self._version_counter)
-            ),
-            content_changes=[
+        if self._sync_kind == lsp.TextDocumentSyncKind.NONE:
+            return
+
+        if self._sync_kind == lsp.TextDocumentSyncKind.INCREMENTAL:
+            # Each change is relative to the text after applying the previous
+            # changes, and that's also how langservers apply a list of changes.
+            content_changes = [
                 lsp.TextDocumentContentChangeEvent(
                     range=lsp.Range(
                         start=_position_tk2lsp(change.start), end=_position_tk2lsp(change.old_end)
@@ -653,13 +888,48 @@ class LangServer:
                     text=change.new_text,
                 )
                 for change in changes.change_list
-            ],
+            ]
+        else:
+            content_changes = [
+                lsp.TextDocumentContentChangeEvent(text=tab.textwidget.get("1.0", "end - 1 char"))
+            ]
+
+        assert tab.path is not None
+        self._lsp_client.did_change(
+            text_document=lsp.VersionedTextDocumentIdentifier(
+                uri=tab.path.as_uri(), version=next(self._version_counter)
+            ),
+            content_changes=content_changes,
         )
+        self._send_queued_messages()
 
 
 # String in key is the command. Each project can have multiple langservers with
 # different commands, e.g. if the project has both Python files and JavaScript files.
-langservers: dict[tuple[Path, str], LangServer] = {}
+#
+# If a langserver supports workspace folders, it is shared between projects,
+# and it appears here once for each project. Project root None means a warm
+# langserver that was started before any project needed it.
+langservers: dict[tuple[Path | None, str], LangServer] = {}
+
+# Filled when langservers start, so that we know which commands are worth warming up
+_commands_supporting_workspace_folders: set[str] = set()
+
+
+def _get_unique_langservers() -> list[LangServer]:
+    return list(dict.fromkeys(langservers.values()))
+
+
+def _find_langserver(tab: tabs.FileTab) -> LangServer | None:
+    for langserver in _get_unique_langservers():
+        if tab in langserver.tabs_opened:
+            return langserver
+    return None
+
+
+def get_langserver_settings(config: LangServerConfig, project_root: Path | None) -> Any:
+    venv = None if project_root is None else python_venv.get_venv(project_root)
+    return _substitute_python_venv_recursively(config.settings, venv)
 
 
 def stream_to_log(stream: IO[bytes], log: logging.LoggerAdapter[logging.Logger]) -> None:
@@ -668,20 +938,10 @@ def stream_to_log(stream: IO[bytes], log: logging.LoggerAdapter[logging.Logger])
         log.info(f"langserver logged: {line}")
 
 
-def get_lang_server(tab: tabs.FileTab) -> LangServer | None:
-    if tab.path is None:
-        return None
-
-    config = tab.settings.get("langserver", Optional[LangServerConfig])
-    if config is None:
-        return None
-    assert isinstance(config, LangServerConfig)
-
-    project_root = utils.find_project_root(tab.path)
-    try:
-        return langservers[(project_root, config.command)]
-    except KeyError:
-        pass
+def _start_langserver(
+    config: LangServerConfig, project_root: Path | None, settings: Any
+) -> LangServer | None:
+    _check_memory_usage()  # make room for the new langserver
 
     command = utils.format_command(config.command, {"porcupine_python": utils.python_executable})
     global_log.info(f"Running command: {command}")
@@ -694,6 +954,10 @@ def get_lang_server(tab: tabs.FileTab) -> LangServer | None:
             stderr=subprocess.PIPE,  # log messages
             **utils.subprocess_kwargs,
         )
+    except FileNotFoundError:
+        # Langservers are optional, e.g. you can edit C code without clangd
+        global_log.warning(f"langserver not found, command was {config.command!r}")
+        return None
     except (OSError, subprocess.CalledProcessError):
         global_log.exception(f"failed to start langserver with command {config.command!r}")
         return None
@@ -707,19 +971,131 @@ def get_lang_server(tab: tabs.FileTab) -> LangServer | None:
     assert process.stderr is not None
     threading.Thread(target=stream_to_log, args=[process.stderr, log], daemon=True).start()
 
-    langserver = LangServer(process, log, config, project_root)
-    langserver.run_stuff()
+    langserver = LangServer(process, log, config, project_root, settings)
     langservers[(project_root, config.command)] = langserver
     return langserver
 
 
+def get_lang_server(tab: tabs.FileTab) -> LangServer | None:
+    if tab.path is None:
+        return None
+
+    config = tab.settings.get("langserver", Optional[LangServerConfig])
+    if config is None:
+        return None
+    assert isinstance(config, LangServerConfig)
+
+    project_root = utils.find_project_root(tab.path)
+    try:
+        return langservers[(project_root, config.command)]
+    except KeyError:
+        pass
+
+    # Prefer a langserver that already has projects, so that a warm one stays warm
+    settings = get_langserver_settings(config, project_root)
+    candidates = [ls for ls in _get_unique_langservers() if ls.command == config.command]
+    candidates.sort(key=(lambda ls: not ls.project_roots))
+    for langserver in candidates:
+        if langserver.can_add_project(settings):
+            langserver.add_project(project_root)
+            return langserver
+
+    return _start_langserver(config, project_root, settings)
+
+
+def _get_selected_tab_config() -> LangServerConfig | None:
+    tab = get_tab_manager().select()
+    if not isinstance(tab, tabs.FileTab):
+        return None
+    config = tab.settings.get("langserver", Optional[LangServerConfig])
+    assert config is None or isinstance(config, LangServerConfig)
+    return config
+
+
+# When a langserver can be shared between projects, keep one running for the
+# file type of the selected tab. Then it's ready when the tab is saved, or when
+# a file from another project is opened.
+def _warm_up_langserver_for_selected_tab(junk: object = None) -> None:
+    tab = get_tab_manager().select()
+    config = _get_selected_tab_config()
+    if config is None or config.command not in _commands_supporting_workspace_folders:
+        return
+
+    # Other projects likely use the same Python venv as the selected tab
+    assert isinstance(tab, tabs.FileTab)
+    project_root = None if tab.path is None else utils.find_project_root(tab.path)
+    settings = get_langserver_settings(config, project_root)
+    if not any(
+        ls.command == config.command and ls.can_add_project(settings)
+        for ls in _get_unique_langservers()
+    ):
+        global_log.info(f"Starting a warm langserver for command {config.command!r}")
+        _start_langserver(config, None, settings)
+
+
+# Runs in a thread, because psutil is slow with many processes
+def _get_memory_usages(langserver_list: list[LangServer]) -> dict[LangServer, int]:
+    return {ls: ls.get_memory_usage() for ls in langserver_list}
+
+
+# Only idle langservers are shut down. Shutting down a langserver used by a
+# tab would leave the tab without autocompletions etc until it is reopened.
+def _enforce_memory_budget(memory_usages: dict[LangServer, int]) -> None:
+    budget = global_settings.get("langserver_memory_budget", int) * 1024 * 1024
+    total = sum(memory_usages.values())
+    if total <= budget:
+        return
+
+    global_log.info(
+        f"langservers use {total // (1024*1024)}MB of RAM,"
+        f" more than the budget of {budget // (1024*1024)}MB"
+    )
+
+    # The tabs may have changed while memory usage was being measured
+    victims = [ls for ls in memory_usages if ls.is_idle() and ls in langservers.values()]
+    victims.sort(key=(lambda ls: ls.last_used))
+    for langserver in victims:
+        if total <= budget:
+            break
+        langserver.log.info("shutting down idle langserver to save memory")
+        langserver.shutdown()
+        total -= memory_usages[langserver]
+
+    if total > budget:
+        global_log.info("the remaining langservers are used by open tabs, not shutting them down")
+
+
+_memory_check_running = False
+
+
+def _check_memory_usage() -> None:
+    global _memory_check_running
+    if _memory_check_running:
+        return
+    _memory_check_running = True
+
+    def on_done(success: bool, result: str | dict[LangServer, int]) -> None:
+        global _memory_check_running
+        _memory_check_running = False
+        if success:
+            assert not isinstance(result, str)
+            _enforce_memory_budget(result)
+        else:
+            global_log.error(f"checking memory usage of langservers failed\n{result}")
+
+    utils.run_in_thread(partial(_get_memory_usages, _get_unique_langservers()), on_done)
+
+
+def _check_memory_periodically() -> None:
+    _check_memory_usage()
+    get_tab_manager().after(30_000, _check_memory_periodically)
+
+
 # Switch the tab to another langserver, starting one if needed
 def switch_langservers(
     tab: tabs.FileTab, called_because_path_changed: bool, junk: object = None
 ) -> None:
-    old = next(
-        (langserver for langserver in langservers.values() if tab in langserver.tabs_opened), None
-    )
+    old = _find_langserver(tab)
     new = get_lang_server(tab)
 
     if old is not None and new is not None and old is new and called_because_path_changed:
@@ -742,36 +1118,35 @@ def switch_langservers(
 def on_new_filetab(tab: tabs.FileTab) -> None:
     tab.settings.add_option("langserver", None, Optional[LangServerConfig])
 
-    # TODO: some better way to pass events to the correct langsever?
     def request_completions(event: utils.EventWithData) -> str | None:
-        for langserver in langservers.values():
-            if tab in langserver.tabs_opened:
-                langserver.request_completions(tab, event)
-                return "break"
-        return None
+        langserver = _find_langserver(tab)
+        if langserver is None:
+            return None
+        langserver.request_completions(tab, event)
+        return "break"
 
     def content_changed(event: utils.EventWithData) -> None:
-        for langserver in langservers.values():
-            if tab in langserver.tabs_opened:
-                langserver.send_change_events(tab, event.data_class(textutils.Changes))
+        langserver = _find_langserver(tab)
+        if langserver is not None:
+            langserver.send_change_events(tab, event.data_class(textutils.Changes))
 
     def request_jump2def(event: object) -> str:
-        for langserver in langservers.values():
-            if tab in langserver.tabs_opened:
-                langserver.request_jump_to_definition(tab)
+        langserver = _find_langserver(tab)
+        if langserver is not None:
+            langserver.request_jump_to_definition(tab)
         return "break"  # Do not insert newline
 
     def request_hover(event: utils.EventWithData) -> str | None:
-        for langserver in langservers.values():
-            if tab in langserver.tabs_opened:
-                langserver.request_hover(tab, location=event.data_string)
-                return "break"
-        return None
+        langserver = _find_langserver(tab)
+        if langserver is None:
+            return None
+        langserver.request_hover(tab, location=event.data_string)
+        return "break"
 
     def on_destroy(event: object) -> None:
-        for langserver in list(langservers.values()):
-            if tab in langserver.tabs_opened:
-                langserver.forget_tab(tab)
+        langserver = _find_langserver(tab)
+        if langserver is not None:
+            langserver.forget_tab(tab)
 
     utils.bind_with_data(tab.textwidget, "<<ContentChanged>>", content_changed, add=True)
     utils.bind_with_data(tab.textwidget, "<<JumpToDefinitionRequest>>", request_jump2def, add=True)
@@ -785,5 +1160,11 @@ def on_new_filetab(tab: tabs.FileTab) -> None:
 
 
 def setup() -> None:
-    global_log.error("langservers are disabled for now due to dependency hell, sorry :(")
-    # get_tab_manager().add_filetab_callback(on_new_filetab)
+    # Seconds to keep a langserver running when no tabs use it
+    global_settings.add_option("langserver_idle_timeout", 120.0)
+    # Langservers are shut down if they use more RAM than this, in total (megabytes)
+    global_settings.add_option("langserver_memory_budget", 2000)
+
+    get_tab_manager().add_filetab_callback(on_new_filetab)
+    get_tab_manager().bind("<<NotebookTabChanged>>", _warm_up_langserver_for_selected_tab, add=True)
+    _check_memory_periodically()
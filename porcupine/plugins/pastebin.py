@@ -36,6 +36,9 @@ from porcupine import get_main_window, tabs, utils
 from porcupine.plugins import rightclick_menu
 from porcupine.settings import global_settings
 
+# Importing ssl and http stuff is slow, don't do it before showing the window
+setup_after_startup = True
+
 log = logging.getLogger(__name__)
 
 
@@ -145,6 +145,7 @@ class PopManager:
             )
             args = [sys.executable, "-c", code]
 
+        args.append("--new-instance")
         args.append("--without-plugins")
         args.append(
             ",".join(
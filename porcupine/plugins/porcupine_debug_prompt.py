@@ -6,6 +6,9 @@ For example, this sets the color of the last tab:
 
     >>> get_tab_manager().tabs()[-1].textwidget['bg'] = 'green'
 
+If Porcupine has been laggy, print_lag_report() shows which plugins have
+been slow.
+
 This plugin is somewhat buggy and annoying to use, but it's still occasionally
 useful when developing Porcupine.
 """
@@ -31,12 +34,17 @@ class PromptTab(tabs.Tab):
         self.title_choices = ["Porcupine Debug Prompt"]
         self.namespace: dict[str, Any] = {}
         exec("from porcupine import *", self.namespace)
+        exec("from porcupine._watchdog import print_lag_report", self.namespace)
 
         self.textwidget = tkinter.Text(self, width=1, height=1)
         self.textwidget.pack(side="left", fill="both", expand=True)
         self.textwidget.mark_set("output_end", "end")
         self.textwidget.mark_gravity("output_end", "left")
-        self.show(">>> from porcupine import *\n>>> ")
+        self.show(
+            ">>> from porcupine import *\n"
+            ">>> from porcupine._watchdog import print_lag_report  # shows what has been slow\n"
+            ">>> "
+        )
         textutils.use_pygments_tags(self.textwidget)
 
         self.scrollbar = ttk.Scrollbar(self)
@@ -16,6 +16,9 @@ from tkinter import messagebox
 from porcupine import actions, menubar, tabs, textutils, utils
 from porcupine.plugins import python_venv
 
+# The menu items are not needed before the window is shown
+setup_after_startup = True
+
 log = logging.getLogger(__name__)
 
 
@@ -0,0 +1,567 @@
+"""Open a file of the project by typing a part of its path.
+
+Press Ctrl+P (Command+P on Mac), type some characters of the file name and
+press Enter. The characters don't need to be next to each other, so typing
+"dtree" finds "porcupine/plugins/directory_tree.py", for example.
+
+The files of each project in the directory tree are listed in the background
+with "git ls-files", or by walking the folder if it isn't a git repository.
+The list is saved to Porcupine's cache folder, so that big projects don't need
+to be listed again every time Porcupine starts.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+import tkinter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from tkinter import ttk
+
+from porcupine import dirs, get_main_window, get_tab_manager, menubar, tabs, utils
+from porcupine.plugins.directory_tree import get_directory_tree, get_path
+from porcupine.plugins.file_watcher import PathsChanged
+
+setup_after = ["directory_tree"]
+
+log = logging.getLogger(__name__)
+
+# Listing files and preparing them for searching takes a while in big projects
+index_pool = ThreadPoolExecutor(max_workers=2)
+
+# Cached file lists of projects that haven't been opened in a while are deleted
+_CACHE_MAX_AGE_DAYS = 30
+
+_MAX_RESULTS = 50
+
+# Searching stops after checking this many files that contain the right
+# characters but possibly in a different order. Without a limit, searching
+# something like "srcsrcsrc" would be slow, because most files contain the
+# characters s, r and c.
+_MAX_CANDIDATES = 10_000
+
+# Only this many matching paths are ranked. Matches are found in the order of
+# the paths, so files that aren't deep inside folders are preferred. File names
+# that contain the typed text as is are quick to find, so many of them are
+# ranked.
+_MAX_CONTIGUOUS_NAMES = 1000
+_MAX_SCANNED_MATCHES = 100
+
+_BITS_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+_WORD_SEPARATORS = "/\\_-. "
+
+
+def _create_masks(strings: list[str]) -> dict[str, int]:
+    # Bit i of masks[c] is set if strings[i] contains c, with strings[0] as the
+    # most significant bit. Doing this with one big int per character is much
+    # faster than looping over all strings in Python when searching.
+    chars: set[str] = set()
+    for string in strings:
+        chars.update(string)
+    return {
+        char: int(bytes([char in string for string in strings]).translate(_BITS_TO_DIGITS), 2)
+        for char in chars
+    }
+
+
+def _starts_word(string: str, original: str, index: int) -> bool:
+    if index == 0 or string[index - 1] in _WORD_SEPARATORS:
+        return True
+    # camelCase, if casefolding didn't change the length
+    return (
+        len(string) == len(original) and original[index - 1].islower() and original[index].isupper()
+    )
+
+
+def _ends_word(string: str, index: int) -> bool:
+    # "foo" ends a word in "foo.py" and "foo/bar.py", but not in "food.py"
+    return index == len(string) or string[index] in "/."
+
+
+def _get_contiguous_score(string: str, original: str, query: str) -> int:
+    # Use the occurrence that is most like a whole word
+    best = 0
+    start = string.find(query)
+    while start != -1:
+        end = start + len(query)
+        best = max(best, _starts_word(string, original, start) + _ends_word(string, end))
+        start = string.find(query, start + 1)
+    return best
+
+
+def _get_scattered_score(string: str, original: str, match: re.Match[str]) -> int:
+    # One point for each typed character at the start of a word
+    return sum(
+        _starts_word(string, original, match.start(group))
+        for group in range(1, len(match.groups()) + 1)
+    )
+
+
+class PathMatcher:
+    """Find paths that contain the typed characters in the same order.
+
+    Matching ignores case. Files whose name (without the folder) matches are
+    shown first, then files whose full path matches. Within those two groups,
+    paths that contain the typed text as is come first, especially if it is a
+    whole word, then paths where many typed characters start words. Ties are
+    broken by putting files that aren't deep inside folders and have short
+    paths first.
+    """
+
+    def __init__(self, paths: list[str]) -> None:
+        self.paths = sorted(paths, key=(lambda path: (path.count("/"), len(path), path)))
+        self.path_set = set(paths)
+        self._folded_paths = [path.casefold() for path in self.paths]
+        self._folded_names = [path[path.rfind("/") + 1 :] for path in self._folded_paths]
+        self._names = [path[path.rfind("/") + 1 :] for path in self.paths]
+        self._path_masks = _create_masks(self._folded_paths)
+        self._name_masks = _create_masks(self._folded_names)
+
+        # Finding text in one big string is much faster than looping over the
+        # names in Python. File names can't contain the zero byte.
+        self._joined_names = "".join(name + "\0" for name in self._folded_names)
+        self._name_starts = list(
+            itertools.accumulate((len(name) + 1 for name in self._folded_names), initial=0)
+        )
+
+    def search(self, query: str, limit: int = _MAX_RESULTS) -> list[str]:
+        folded_query = query.casefold().replace("\\", "/")
+        if not folded_query:
+            return self.paths[:limit]
+
+        # Negated character classes make the regex run in linear time. Groups
+        # tell where each typed character was found.
+        regex = re.compile(
+            "".join(f"[^{re.escape(char)}]*({re.escape(char)})" for char in folded_query)
+        )
+
+        # Sorting these puts the best matches first
+        ranked: list[tuple[int, bool, int, int]] = []  # (group, not contiguous, -score, index)
+        found_names: set[int] = set()
+
+        position = self._joined_names.find(folded_query)
+        while position != -1 and len(ranked) < _MAX_CONTIGUOUS_NAMES:
+            index = bisect.bisect_right(self._name_starts, position) - 1
+            name = self._folded_names[index]
+            found_names.add(index)
+            ranked.append(
+                (0, False, -_get_contiguous_score(name, self._names[index], folded_query), index)
+            )
+            position = self._joined_names.find(folded_query, self._name_starts[index + 1])
+
+        candidate_count = 0
+        for group, (masks, strings, originals) in enumerate(
+            [
+                (self._name_masks, self._folded_names, self._names),
+                (self._path_masks, self._folded_paths, self.paths),
+            ]
+        ):
+            # Nothing found after this would rank above what was already found
+            if len(ranked) >= limit:
+                break
+
+            mask = (1 << len(strings)) - 1
+            for char in set(folded_query):
+                mask &= masks.get(char, 0)
+            if mask == 0:
+                continue
+
+            bits = format(mask, f"0{len(strings)}b")
+            index = bits.find("1")
+            match_count = 0
+            while (
+                index != -1
+                and match_count < _MAX_SCANNED_MATCHES
+                and candidate_count < _MAX_CANDIDATES
+            ):
+                candidate_count += 1
+                if group == 1 or index not in found_names:
+                    string = strings[index]
+                    match = regex.match(string)
+                    if match is not None:
+                        match_count += 1
+                        if folded_query in string:
+                            score = _get_contiguous_score(string, originals[index], folded_query)
+                            ranked.append((group, False, -score, index))
+                        else:
+                            score = _get_scattered_score(string, originals[index], match)
+                            ranked.append((group, True, -score, index))
+                index = bits.find("1", index + 1)
+
+        # A file can be found twice, if both its name and its path match
+        result: list[str] = []
+        for item in sorted(ranked):
+            path = self.paths[item[-1]]
+            if path not in result:
+                result.append(path)
+                if len(result) == limit:
+                    break
+        return result
+
+
+def _get_fingerprint(project_root: Path) -> list[int]:
+    # Most changes that affect "git ls-files" output also change .git/index,
+    # and adding or removing a file directly inside the project changes the
+    # modification time of the project folder.
+    result = []
+    for path in [project_root / ".git" / "index", project_root]:
+        try:
+            result.append(path.stat().st_mtime_ns)
+        except OSError:
+            result.append(0)
+    return result
+
+
+def _get_cache_file(project_root: Path) -> Path:
+    name = hashlib.sha1(str(project_root).encode("utf-8")).hexdigest()
+    return dirs.cache_dir / "quick_open" / f"{name}.json"
+
+
+def _run_git_ls_files(project_root: Path, *options: str) -> list[str] | None:
+    try:
+        run_result = subprocess.run(
+            ["git", "ls-files", "-z", *options],
+            cwd=project_root,
+            env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+            capture_output=True,
+            timeout=60,
+            **utils.subprocess_kwargs,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        log.warning("can't run git", exc_info=True)
+        return None
+
+    if run_result.returncode != 0:
+        # likely not a git repo
+        log.debug(f"git ls-files failed in {project_root}: {run_result.stderr!r}")
+        return None
+
+    output = run_result.stdout.decode(sys.getfilesystemencoding(), errors="replace")
+    return [path for path in output.split("\0") if path]
+
+
+def _walk_project(project_root: Path) -> list[str]:
+    result = []
+    for dirpath, dirnames, filenames in os.walk(project_root):
+        # Skip .git, .venv and other hidden folders. They tend to be huge.
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        relative_dir = Path(dirpath).relative_to(project_root).as_posix()
+        if relative_dir == ".":
+            result.extend(filenames)
+        else:
+            result.extend(f"{relative_dir}/{name}" for name in filenames)
+    return result
+
+
+def _load_cache(project_root: Path) -> tuple[list[int], PathMatcher] | None:
+    try:
+        cache_file = _get_cache_file(project_root)
+        with cache_file.open("r", encoding="utf-8") as file:
+            cache = json.load(file)
+        if cache["project_root"] != str(project_root):
+            return None
+        fingerprint = cache["fingerprint"]
+        paths = cache["paths"]
+        # The cache file is saved only when files are listed, so mark it as used
+        os.utime(cache_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        log.warning(f"reading cached file list of {project_root} failed", exc_info=True)
+        return None
+
+    return (fingerprint, PathMatcher(paths))
+
+
+def _list_files(
+    project_root: Path, old_matcher: PathMatcher | None
+) -> tuple[list[int], PathMatcher]:
+    start = time.perf_counter()
+    fingerprint = _get_fingerprint(project_root)
+
+    # Deleted files are still in the git index until "git add" or "git rm"
+    listed = _run_git_ls_files(project_root, "--cached", "--others", "--exclude-standard")
+    if listed is None:
+        paths = _walk_project(project_root)
+    else:
+        deleted = set(_run_git_ls_files(project_root, "--deleted") or [])
+        paths = [path for path in listed if path not in deleted]
+
+    if old_matcher is not None and set(paths) == old_matcher.path_set:
+        matcher = old_matcher
+    else:
+        matcher = PathMatcher(paths)
+
+    # Save even if the files didn't change, so that the fingerprint is up to date
+    try:
+        cache_file = _get_cache_file(project_root)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        utils.write_atomically(
+            cache_file,
+            json.dumps(
+                {"project_root": str(project_root), "fingerprint": fingerprint, "paths": paths}
+            ),
+        )
+    except OSError:
+        log.warning(f"saving file list of {project_root} failed", exc_info=True)
+
+    log.debug(
+        f"listing {len(paths)} files of {project_root} took"
+        f" {round((time.perf_counter() - start)*1000)}ms"
+    )
+    return (fingerprint, matcher)
+
+
+def _delete_old_cache_files() -> None:
+    try:
+        utils.delete_old_files(dirs.cache_dir / "quick_open", _CACHE_MAX_AGE_DAYS)
+    except OSError:
+        log.warning("deleting old cached file lists failed", exc_info=True)
+
+
+class _ProjectIndex:
+    def __init__(self, project_root: Path) -> None:
+        self.project_root = project_root
+        self.matcher: PathMatcher | None = None
+        self._fingerprint: list[int] | None = None
+        self._cache_loaded = False
+        self._relist_when_done = False
+
+        self._future: Future[tuple[list[int], PathMatcher] | None] | None = index_pool.submit(
+            _load_cache, project_root
+        )
+        self._wait_for_future()
+
+    def is_busy(self) -> bool:
+        return self._future is not None
+
+    def refresh_if_changed(self) -> None:
+        if self._future is None and self._fingerprint != _get_fingerprint(self.project_root):
+            self.relist()
+
+    def relist(self) -> None:
+        if self._future is None:
+            self._future = index_pool.submit(_list_files, self.project_root, self.matcher)
+            self._wait_for_future()
+        else:
+            self._relist_when_done = True
+
+    def _wait_for_future(self) -> None:
+        assert self._future is not None
+        if not self._future.done():
+            get_main_window().after(25, self._wait_for_future)
+            return
+
+        result = self._future.result()
+        self._future = None
+        if result is not None:
+            self._fingerprint, self.matcher = result
+
+        relist_needed = self._relist_when_done
+        self._relist_when_done = False
+        if not self._cache_loaded:
+            # Cached file list is used until the files have been listed again
+            self._cache_loaded = True
+            relist_needed = relist_needed or self._fingerprint != _get_fingerprint(
+                self.project_root
+            )
+        if relist_needed:
+            self.relist()
+
+        if _dialog is not None:
+            _dialog.update_results()
+
+    def on_paths_changed(self, paths: list[Path]) -> None:
+        if self.matcher is None:
+            return
+
+        # Saving a file doesn't change what files exist, so don't relist for that
+        for path in paths:
+            try:
+                relative = path.relative_to(self.project_root).as_posix()
+            except ValueError:
+                continue
+            if relative == ".git" or relative.startswith(".git/"):
+                continue
+
+            if path.is_dir():
+                changed = True  # new folder, may contain files
+            elif path.is_file():
+                changed = relative not in self.matcher.path_set
+            else:
+                # Deleted file or folder
+                changed = relative in self.matcher.path_set or any(
+                    known.startswith(relative + "/") for known in self.matcher.paths
+                )
+
+            if changed:
+                self.relist()
+                return
+
+
+_indexes: dict[Path, _ProjectIndex] = {}
+
+
+def _get_project_roots() -> list[Path]:
+    tree = get_directory_tree()
+    roots = [get_path(project_id) for project_id in tree.get_children("")]
+
+    # Search the project of the current file first
+    tab = get_tab_manager().select()
+    if isinstance(tab, tabs.FileTab) and tab.path is not None:
+        current_root = utils.find_project_root(tab.path)
+        if current_root in roots:
+            roots.remove(current_root)
+            roots.insert(0, current_root)
+
+    return [root for root in roots if root is not None]
+
+
+def _get_indexes() -> list[_ProjectIndex]:
+    roots = _get_project_roots()
+    for root in _indexes.keys() - set(roots):
+        del _indexes[root]
+
+    result = []
+    for root in roots:
+        if root not in _indexes:
+            _indexes[root] = _ProjectIndex(root)
+        result.append(_indexes[root])
+    return result
+
+
+class _QuickOpenDialog:
+    def __init__(self) -> None:
+        self.window = tkinter.Toplevel()
+        self.window.transient(get_main_window())
+        self.window.title("Quick Open")
+
+        big_frame = ttk.Frame(self.window, padding=10)
+        big_frame.pack(fill="both", expand=True)
+
+        self.query_var = tkinter.StringVar()
+        self.entry = ttk.Entry(big_frame, textvariable=self.query_var, width=60)
+        self.entry.pack(fill="x")
+
+        self.status_label = ttk.Label(big_frame)
+        self.status_label.pack(fill="x", pady=5)
+
+        self.treeview = ttk.Treeview(big_frame, show="tree", selectmode="browse", height=15)
+        self.treeview.pack(fill="both", expand=True)
+        self._item_paths: dict[str, Path] = {}
+
+        self.query_var.trace_add("write", (lambda *junk: self.update_results()))
+        self.entry.bind("<Up>", (lambda event: self._move_selection(-1)), add=True)
+        self.entry.bind("<Down>", (lambda event: self._move_selection(1)), add=True)
+        self.entry.bind("<Return>", (lambda event: self._open_selected()), add=True)
+        self.treeview.bind("<Double-Button-1>", (lambda event: self._open_selected()), add=True)
+        self.window.bind("<Escape>", (lambda event: self.window.destroy()), add=True)
+        self.entry.focus()
+
+    def update_results(self) -> None:
+        indexes = _get_indexes()
+        query = self.query_var.get().strip()
+
+        start = time.perf_counter()
+        results: list[tuple[Path, str]] = []
+        for index in indexes:
+            if index.matcher is not None:
+                for relative in index.matcher.search(query, _MAX_RESULTS - len(results)):
+                    results.append((index.project_root, relative))
+        search_time = time.perf_counter() - start
+
+        self.treeview.delete(*self.treeview.get_children())
+        self._item_paths.clear()
+        for project_root, relative in results:
+            # Show project name too, if there are many projects
+            text = relative if len(indexes) == 1 else f"{project_root.name}/{relative}"
+            item_id = self.treeview.insert("", "end", text=text)
+            self._item_paths[item_id] = project_root / relative
+
+        if results:
+            self.treeview.selection_set(self.treeview.get_children()[0])
+
+        busy = [index.project_root.name for index in indexes if index.is_busy()]
+        if busy:
+            self.status_label.config(text=f"Listing files in {', '.join(busy)}...")
+        elif not indexes:
+            self.status_label.config(text="Open a file or a folder to search its project.")
+        elif not results:
+            self.status_label.config(text="No matching files.")
+        else:
+            self.status_label.config(text="")
+        log.debug(f"searching {query!r} took {round(search_time*1000, 1)}ms")
+
+    def _move_selection(self, how_much: int) -> str:
+        children = self.treeview.get_children()
+        selection = self.treeview.selection()
+        if children and selection:
+            new_index = children.index(selection[0]) + how_much
+            new_index = max(0, min(len(children) - 1, new_index))
+            self.treeview.selection_set(children[new_index])
+            self.treeview.see(children[new_index])
+        return "break"
+
+    def _open_selected(self) -> None:
+        selection = self.treeview.selection()
+        if selection:
+            path = self._item_paths[selection[0]]
+            self.window.destroy()
+            get_tab_manager().open_file(path)
+
+
+_dialog: _QuickOpenDialog | None = None
+
+
+def _on_dialog_destroyed(event: tkinter.Event[tkinter.Misc]) -> None:
+    global _dialog
+    if _dialog is not None and event.widget is _dialog.window:
+        _dialog = None
+
+
+def show_dialog() -> None:
+    global _dialog
+    if _dialog is not None:
+        _dialog.window.lift()
+        _dialog.entry.focus()
+        return
+
+    for index in _get_indexes():
+        index.refresh_if_changed()
+
+    _dialog = _QuickOpenDialog()
+    _dialog.window.bind("<Destroy>", _on_dialog_destroyed, add=True)
+    _dialog.update_results()
+
+
+def _on_paths_changed(event: utils.EventWithData) -> None:
+    paths = [Path(path) for path in event.data_class(PathsChanged).paths]
+    for index in _indexes.values():
+        index.on_paths_changed(paths)
+
+
+def _on_file_system_changed(junk: object) -> None:
+    for index in _indexes.values():
+        index.refresh_if_changed()
+
+
+def setup() -> None:
+    file_menu = menubar.get_menu("File")
+    open_index = file_menu.index("Open")
+    assert open_index is not None
+    file_menu.insert_command(open_index + 1, label="Quick Open", command=show_dialog)
+
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", _on_paths_changed, add=True)
+    get_tab_manager().bind("<<FileSystemChanged>>", _on_file_system_changed, add=True)
+
+    index_pool.submit(_delete_old_cache_files)
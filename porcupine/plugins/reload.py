@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
-from porcupine import get_tab_manager, tabs
+from pathlib import Path
+
+from porcupine import get_tab_manager, tabs, utils
+from porcupine.plugins.file_watcher import PathsChanged
 
 
 # TODO: should cursor and scrolling stuff be a part of reload() or change_batch()?
@@ -19,5 +22,14 @@ def on_new_filetab(tab: tabs.FileTab) -> None:
     tab.bind("<<FileSystemChanged>>", (lambda e: reload_if_necessary(tab)), add=True)
 
 
+# Tabs that aren't selected are checked when they get selected
+def on_paths_changed(event: utils.EventWithData) -> None:
+    tab = get_tab_manager().select()
+    if isinstance(tab, tabs.FileTab) and tab.path is not None:
+        if tab.path in map(Path, event.data_class(PathsChanged).paths):
+            reload_if_necessary(tab)
+
+
 def setup() -> None:
     get_tab_manager().add_filetab_callback(on_new_filetab)
+    utils.bind_with_data(get_tab_manager(), "<<PathsChanged>>", on_paths_changed, add=True)
@@ -16,14 +16,20 @@ display something like "Ctrl+Enter or Ctrl+click to open" when hovered.
 from __future__ import annotations
 
 import dataclasses
+import itertools
 import logging
 import tkinter
 
-from porcupine import get_tab_manager, tabs, utils
+from porcupine import get_tab_manager, tabs, textutils, utils
 from porcupine.plugins import hover
 
 log = logging.getLogger(__name__)
 
+# The urls plugin sets underlines in a <<ContentChanged>> binding, and those
+# underlines must not be shifted again by this plugin's <<ContentChanged>>
+# binding. Bindings run in the order they were added.
+setup_before = ["urls"]
+
 
 @dataclasses.dataclass
 class Underline:
@@ -40,54 +46,210 @@ class Underlines(utils.EventDataclass):
     underline_list: list[Underline]
 
 
+@dataclasses.dataclass(eq=False)
+class _IndexedUnderline:
+    id: str
+    start_column: int
+    line_count: int  # 0 for underlines that end on the line where they start
+    end_column: int
+    tooltip_text: str
+    order: int  # underlines added later win when hovering
+
+
+def _parse_index(index: str) -> tuple[int, int]:
+    line, column = map(int, index.split("."))
+    return (line, column)
+
+
+# Figures out where a position goes when the text changes. Behaves like Tk
+# tags: text inserted to the start or end of an underline is not underlined,
+# but text inserted in the middle is.
+def _shift_position(
+    position: tuple[int, int], change: textutils.Change, *, is_end: bool
+) -> tuple[int, int]:
+    start = (change.start[0], change.start[1])
+    old_end = (change.old_end[0], change.old_end[1])
+
+    if position < start or (is_end and position == start):
+        return position
+    if position < old_end or (is_end and position == old_end):
+        # Deleted or replaced, new text is not underlined
+        if is_end:
+            return start
+        return (change.new_end[0], change.new_end[1])
+
+    line, column = position
+    if line == old_end[0]:
+        return (change.new_end[0], change.new_end[1] + column - old_end[1])
+    return (line + change.new_end[0] - old_end[0], column)
+
+
+class _UnderlineIndex:
+    """Underlines of a text widget, stored by the line where they start.
+
+    Tk text widgets get slow with thousands of tags, so they are used only for
+    displaying the underlines. Hovering looks up the underline from here, and
+    instead of moving tags, text changes shift the underlines here.
+    """
+
+    def __init__(self) -> None:
+        # _lines[lineno] is a list of underlines starting on that line
+        self._lines: list[list[_IndexedUnderline]] = [[], []]
+        # How many lines to look back to find underlines spanning many lines
+        self._max_line_count = 0
+
+    def _ensure_line_exists(self, lineno: int) -> None:
+        while len(self._lines) <= lineno:
+            self._lines.append([])
+
+    def _insert(self, underline: _IndexedUnderline, start_line: int) -> None:
+        self._ensure_line_exists(start_line)
+        self._lines[start_line].append(underline)
+        self._max_line_count = max(self._max_line_count, underline.line_count)
+
+    def add(self, id: str, start: str, end: str, tooltip_text: str, order: int) -> None:
+        start_line, start_column = _parse_index(start)
+        end_line, end_column = _parse_index(end)
+        if (start_line, start_column) < (end_line, end_column):
+            self._insert(
+                _IndexedUnderline(
+                    id, start_column, end_line - start_line, end_column, tooltip_text, order
+                ),
+                start_line,
+            )
+
+    def remove_id(self, id: str) -> None:
+        for underlines in self._lines:
+            if underlines:
+                underlines[:] = [u for u in underlines if u.id != id]
+
+    def find(self, index: str) -> _IndexedUnderline | None:
+        position = _parse_index(index)
+        result: _IndexedUnderline | None = None
+
+        first_line = max(1, position[0] - self._max_line_count)
+        for start_line in range(first_line, min(position[0] + 1, len(self._lines))):
+            for underline in self._lines[start_line]:
+                start = (start_line, underline.start_column)
+                end = (start_line + underline.line_count, underline.end_column)
+                if start <= position < end and (result is None or underline.order > result.order):
+                    result = underline
+        return result
+
+    def apply_change(self, change: textutils.Change) -> None:
+        start_line = change.start[0]
+        old_end_line = change.old_end[0]
+        new_end_line = change.new_end[0]
+        self._ensure_line_exists(max(old_end_line, new_end_line))
+
+        # Underlines starting before the change stay where they are, but they
+        # may end inside or after the changed text
+        for lineno in range(max(1, start_line - self._max_line_count), start_line):
+            for underline in self._lines[lineno].copy():
+                old_end = (lineno + underline.line_count, underline.end_column)
+                new_end = _shift_position(old_end, change, is_end=True)
+                if new_end == old_end:
+                    continue
+                if new_end <= (lineno, underline.start_column):
+                    self._lines[lineno].remove(underline)
+                else:
+                    underline.line_count = new_end[0] - lineno
+                    underline.end_column = new_end[1]
+                    self._max_line_count = max(self._max_line_count, underline.line_count)
+
+        # Underlines after the changed lines move automatically with the list items
+        affected = [
+            (lineno, underline)
+            for lineno in range(start_line, old_end_line + 1)
+            for underline in self._lines[lineno]
+        ]
+        self._lines[start_line : old_end_line + 1] = [
+            [] for lineno in range(start_line, new_end_line + 1)
+        ]
+
+        for lineno, underline in affected:
+            new_start = _shift_position((lineno, underline.start_column), change, is_end=False)
+            new_end = _shift_position(
+                (lineno + underline.line_count, underline.end_column), change, is_end=True
+            )
+            if new_start < new_end:
+                underline.start_column = new_start[1]
+                underline.line_count = new_end[0] - new_start[0]
+                underline.end_column = new_end[1]
+                self._insert(underline, new_start[0])
+
+
 class _Underliner:
     def __init__(self, textwidget: tkinter.Text) -> None:
         self.textwidget = textwidget
-        self._tag2underline: dict[str, Underline] = {}
+        self._index = _UnderlineIndex()
+        self._order_counter = itertools.count()
+        # One tag for each id and color. The tags are only for displaying.
+        self._color_tags: dict[str, list[str]] = {}
 
     def set_underlines(self, event: utils.EventWithData) -> None:
         underlines = event.data_class(Underlines)
-        log.debug(f"Setting underlines: {underlines}")
-        self.textwidget.tag_remove(f"underline:{underlines.id}", "1.0", "end")
+        log.debug(f"Setting {len(underlines.underline_list)} underlines with id {underlines.id!r}")
+
+        less_specific_tag = f"underline:{underlines.id}"
+        self.textwidget.tag_remove(less_specific_tag, "1.0", "end")
+        for tag in self._color_tags.pop(underlines.id, []):
+            self.textwidget.tag_delete(tag)
+        self._index.remove_id(underlines.id)
 
-        for tag in list(self._tag2underline.keys()):
-            literally_underline, tag_id, number = tag.split(":")
-            if tag_id == underlines.id:
-                self.textwidget.tag_delete(tag)
-                del self._tag2underline[tag]
+        all_ranges = []
+        ranges_by_tag: dict[str, list[str]] = {}
+        tag_colors: dict[str, str | None] = {}
 
-        for index, underline in enumerate(underlines.underline_list):
-            tag = f"underline:{underlines.id}:{index}"
-            less_specific_tag = f"underline:{underlines.id}"
+        for underline in underlines.underline_list:
+            start = self.textwidget.index(underline.start)
+            end = self.textwidget.index(underline.end)
+            self._index.add(
+                underlines.id, start, end, underline.tooltip_text, next(self._order_counter)
+            )
 
-            self._tag2underline[tag] = underline
-            if underline.color is None:
+            tag = f"underline:{underlines.id}:{underline.color or 'default'}"
+            # Move to end of dict, so that the color used last is created last and drawn on top
+            ranges_by_tag[tag] = ranges_by_tag.pop(tag, []) + [start, end]
+            tag_colors[tag] = underline.color
+            all_ranges.extend([start, end])
+
+        for tag, ranges in ranges_by_tag.items():
+            color = tag_colors[tag]
+            if color is None:
                 self.textwidget.tag_config(tag, underline=True)
             else:
-                self.textwidget.tag_config(tag, underline=True, underlinefg=underline.color)
+                self.textwidget.tag_config(tag, underline=True, underlinefg=color)
+            self.textwidget.tag_add(tag, *ranges)
 
-            self.textwidget.tag_add(tag, underline.start, underline.end)
-            self.textwidget.tag_add(less_specific_tag, underline.start, underline.end)
+        if all_ranges:
+            self.textwidget.tag_add(less_specific_tag, *all_ranges)
+        self._color_tags[underlines.id] = list(ranges_by_tag.keys())
 
         # FIXME: update what hover plugin is showing (broke in #585)
 
+    def on_content_changed(self, event: utils.EventWithData) -> None:
+        for change in event.data_class(textutils.Changes).change_list:
+            self._index.apply_change(change)
+
     def handle_hover_request(self, event: utils.EventWithData) -> str | None:
-        # Reversing to prefer topmost tags (i.e. tags added last)
-        for tag in reversed(self.textwidget.tag_names(event.data_string)):
-            if tag in self._tag2underline:
-                self.textwidget.event_generate(
-                    "<<HoverResponse>>",
-                    data=hover.Response(
-                        location=event.data_string, text=self._tag2underline[tag].tooltip_text
-                    ),
-                )
-                return "break"  # Do not pass hover event to langserver
-        return None
+        underline = self._index.find(self.textwidget.index(event.data_string))
+        if underline is None:
+            return None
+
+        self.textwidget.event_generate(
+            "<<HoverResponse>>",
+            data=hover.Response(location=event.data_string, text=underline.tooltip_text),
+        )
+        return "break"  # Do not pass hover event to langserver
 
 
 def on_new_filetab(tab: tabs.FileTab) -> None:
     underliner = _Underliner(tab.textwidget)
     utils.bind_with_data(tab, "<<SetUnderlines>>", underliner.set_underlines, add=True)
+    utils.bind_with_data(
+        tab.textwidget, "<<ContentChanged>>", underliner.on_content_changed, add=True
+    )
     utils.bind_with_data(
         tab.textwidget, "<<HoverRequest>>", underliner.handle_hover_request, add=True
     )
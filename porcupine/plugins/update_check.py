@@ -23,6 +23,9 @@ log = logging.getLogger(__name__)
 # Place the update checkbox towards the end of the settings dialog
 setup_after = ["restart"]
 
+# Importing requests is slow, don't do it before showing the window
+setup_after_startup = True
+
 
 def x_days_ago(days: int) -> str:
     days_in_year = 365.25  # good enough
@@ -13,13 +13,11 @@ import sys
 import time
 import tkinter
 from collections.abc import Callable, Generator, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from tkinter import messagebox, ttk
 from typing import Any, TypeVar, overload
 
-import dacite
-from pygments import styles, token
-
 import porcupine
 from porcupine import dirs, images, utils
 
@@ -75,6 +73,8 @@ class LineEnding(enum.Enum):
 
 
 def _type_check(type_: object, obj: object) -> object:
+    import dacite
+
     # dacite tricks needed for validating e.g. objects of type Optional[Path]
     @dataclasses.dataclass
     class ValueContainer:
@@ -230,6 +230,7 @@ class Settings:
             else:
                 for widget in _get_children_recursively(main_window):
                     widget.event_generate(event_name)
+                _schedule_autosave(main_window)
         else:
             self._change_event_widget.event_generate(event_name)
 
@@ -399,37 +400,91 @@ def get_json_path() -> Path:
     return dirs.config_dir / "settings.json"
 
 
+# Global settings are also saved a few seconds after they change, so that
+# changes aren't lost if Porcupine crashes. To avoid writing the file
+# repeatedly e.g. while the user is dragging something, changes made soon
+# after saving are saved together a few seconds later.
+_AUTOSAVE_DELAY_MS = 5000
+
+# Only one thread, so that the file is written in the order of saving
+_save_pool = ThreadPoolExecutor(max_workers=1)
+_autosave_pending = False
+# (path, content) of the file written or loaded last
+_last_saved: tuple[Path, str] | None = None
+
+
+def _get_json_string() -> str:
+    options = {
+        name: _value_to_save(unknown_obj.value)
+        for name, unknown_obj in global_settings.get_state().items()
+    }
+    return json.dumps(options, indent=4) + "\n"
+
+
+def _write_if_changed(path: Path, content: str) -> None:
+    global _last_saved
+    if _last_saved == (path, content):
+        return
+
+    utils.write_atomically(path, content)
+    _last_saved = (path, content)
+
+
+def _autosave() -> None:
+    global _autosave_pending
+    _autosave_pending = False
+
+    _log.debug("saving settings in the background")
+    future = _save_pool.submit(_write_if_changed, get_json_path(), _get_json_string())
+
+    def log_error(future: Future[None]) -> None:
+        if future.exception() is not None:
+            _log.error("saving settings failed", exc_info=future.exception())
+
+    future.add_done_callback(log_error)
+
+
+def _schedule_autosave(main_window: tkinter.Tk) -> None:
+    global _autosave_pending
+    if not _autosave_pending:
+        _autosave_pending = True
+        main_window.after(_AUTOSAVE_DELAY_MS, _autosave)
+
+
 def save() -> None:
     """Save :data:`global_settings` to the config file.
 
-    Porcupine always calls this when it's closed,
+    Porcupine always calls this when it's closed, and it also saves the
+    settings automatically soon after they change,
     so usually you don't need to worry about calling this yourself.
     """
-    with get_json_path().open("w", encoding="utf-8") as file:
-        json.dump(
-            {
-                name: _value_to_save(unknown_obj.value)
-                for name, unknown_obj in global_settings.get_state().items()
-            },
-            file,
-            indent=4,
-        )
-        file.write("\n")
+    # Wait for the background thread, so that an older autosave can't overwrite this
+    _save_pool.submit(_write_if_changed, get_json_path(), _get_json_string()).result()
 
 
 def _load_from_file() -> None:
+    global _last_saved
+
+    path = get_json_path()
     try:
-        with get_json_path().open("r", encoding="utf-8") as file:
-            options = json.load(file)
+        with path.open("r", encoding="utf-8") as file:
+            content = file.read()
     except FileNotFoundError:
         return
 
+    options = json.loads(content)
+    # Don't write the file if nothing changes. Nothing is being saved yet
+    # when this runs, so _save_pool isn't needed.
+    _last_saved = (path, content)
+
     for name, value in options.items():
         global_settings.set(name, value, from_config=True)
 
 
 # pygments styles can be uninstalled, must not end up with invalid pygments style that way
 def _check_pygments_style(name: str) -> str:
+    from pygments import styles
+
     styles.get_style_by_name(name)  # may raise error that will get logged
     return name
 
@@ -750,6 +805,8 @@ def add_spinbox(option_name: str, text: str, **spinbox_kwargs: Any) -> tkinter.t
 
 
 def _get_colors(style_name: str) -> tuple[str, str]:
+    from pygments import styles, token
+
     style = styles.get_style_by_name(style_name)
     bg = style.background_color
 
@@ -796,6 +853,8 @@ def add_pygments_style_button(option_name: str, text: str) -> None:
 
     # Not done when creating button, because can slow down porcupine startup
     def fill_menubutton(junk_event: object) -> None:
+        from pygments import styles
+
         menu.delete(0, "end")
         for index, style_name in enumerate(sorted(styles.get_all_styles())):
             fg, bg = _get_colors(style_name)
@@ -873,6 +932,8 @@ def use_pygments_fg_and_bg(
     """
 
     def on_style_changed(junk: object = None) -> None:
+        from pygments import styles
+
         style = styles.get_style_by_name(global_settings.get(option_name, str))
         # Similar to _get_colors() but doesn't use the color of strings
         bg = style.background_color
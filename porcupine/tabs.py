@@ -5,6 +5,7 @@ from __future__ import annotations
 import codecs
 import collections
 import dataclasses
+import functools
 import hashlib
 import importlib
 import itertools
@@ -15,14 +16,14 @@ import traceback
 from collections.abc import Callable, Iterable, Sequence
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
-from typing import Any, NamedTuple, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional, TypeVar
 
-from pygments.lexer import LexerMeta
-from pygments.lexers import TextLexer
-
-from porcupine import settings, textutils, utils
+from porcupine import _watchdog, settings, textutils, utils
 from porcupine.settings import global_settings
 
+if TYPE_CHECKING:
+    from pygments.lexer import LexerMeta
+
 log = logging.getLogger(__name__)
 _flatten = itertools.chain.from_iterable
 _T = TypeVar("_T")
@@ -63,15 +64,25 @@ class TabManager(ttk.Notebook):
 
     .. virtualevent:: FileSystemChanged
 
-        Runs when a file has been saved, a command finishes running, the
-        Porcupine window is focused, or there's some other reason why files on
-        the disk have likely changed.
+        Runs when a file has been saved, a command finishes running, or
+        there's some other reason why files on the disk have likely changed.
+        Changes made by other programs are noticed by the ``file_watcher``
+        plugin, which usually generates a ``<<PathsChanged>>`` event listing
+        only the paths that changed instead. If the ``file_watcher`` plugin is
+        disabled, this event runs when the Porcupine window is focused (see
+        :attr:`refresh_on_focus`).
 
         This event is in the tab manager and not in the main window (see
         :func:`porcupine.get_main_window`), because bindings of the main window
         also get notified for the events of all child widgets, and there is
         also a tab-specific :virtevt:`~Tab.FileSystemChanged` event.
 
+    .. attribute:: refresh_on_focus
+
+        If this is True (the default), focusing the Porcupine window generates
+        :virtevt:`FileSystemChanged`. The ``file_watcher`` plugin sets this
+        to False, because it finds out what actually changed.
+
     .. method:: add(child, **kw)
     .. method:: enable_traversal()
     .. method:: forget(tab_id)
@@ -91,12 +102,13 @@ class TabManager(ttk.Notebook):
         self.bind("<<NotebookTabChanged>>", self._on_tab_selected, add=True)
         self.bind("<<FileSystemChanged>>", self._on_fs_changed, add=True)
         self.winfo_toplevel().bind("<FocusIn>", self._handle_main_window_focus, add=True)
+        self.refresh_on_focus = True
 
         # the string is call stack for adding callback
         self._tab_callbacks: list[tuple[Callable[[Tab], Any], str]] = []
 
     def _handle_main_window_focus(self, event: tkinter.Event[tkinter.Misc]) -> None:
-        if event.widget is self.winfo_toplevel():
+        if self.refresh_on_focus and event.widget is self.winfo_toplevel():
             self.event_generate("<<FileSystemChanged>>")
 
     def _on_tab_selected(self, junk_event: tkinter.Event[tkinter.Misc]) -> None:
@@ -229,7 +241,8 @@ class TabManager(ttk.Notebook):
         self.update()
         for callback, add_stack in self._tab_callbacks:
             try:
-                callback(tab)
+                with _watchdog.measure_callback(callback):
+                    callback(tab)
             except Exception:
                 log.error("tab callback failed", exc_info=True)
                 log.error(f"the callback was added here\n{add_stack}")
@@ -265,6 +278,7 @@ class TabManager(ttk.Notebook):
         tab is not a :class:`FileTab`.
         """
 
+        @functools.wraps(func)  # slow callbacks are blamed on the module of func
         def func_with_checking_for_filetab(tab: Tab) -> None:
             if isinstance(tab, FileTab):
                 func(tab)
@@ -449,6 +463,8 @@ class _FileTabState(NamedTuple):
 
 
 def _import_lexer_class(name: str) -> LexerMeta:
+    from pygments.lexer import LexerMeta
+
     modulename, classname = name.rsplit(".", 1)
     module = importlib.import_module(modulename)
     klass = getattr(module, classname)
@@ -595,6 +611,10 @@ class FileTab(Tab):
         else:
             self._path = path.resolve()
 
+        # pygments is imported here, because importing it slows down startup
+        from pygments.lexer import LexerMeta
+        from pygments.lexers import TextLexer
+
         self.settings = settings.Settings(self, "<<TabSettingChanged:{}>>")
         self.settings.add_option(
             "pygments_lexer", TextLexer, LexerMeta, converter=_import_lexer_class
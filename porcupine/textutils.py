@@ -11,8 +11,6 @@ from tkinter.font import Font
 from typing import TYPE_CHECKING, Any
 from weakref import WeakKeyDictionary
 
-from pygments import styles
-
 from porcupine import settings, utils
 from porcupine.settings import global_settings
 
@@ -648,6 +646,8 @@ def use_pygments_tags(textwidget: tkinter.Text, *, option_name: str = "pygments_
     on_font_changed()
 
     def on_theme_changed(fg: str, bg: str) -> None:
+        from pygments import styles
+
         textwidget.config(
             foreground=fg,
             background=bg,
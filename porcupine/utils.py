@@ -23,12 +23,14 @@ import dataclasses
 import functools
 import json
 import logging
+import os
 import re
 import shlex
 import shutil
 import subprocess
 import sys
 import threading
+import time
 import tkinter
 import traceback
 from collections.abc import Callable, Iterator
@@ -36,8 +38,6 @@ from pathlib import Path
 from tkinter import ttk
 from typing import TYPE_CHECKING, Any, Literal, TypeVar, cast
 
-import dacite
-
 import porcupine
 
 log = logging.getLogger(__name__)
@@ -432,6 +432,8 @@ class EventWithData(_Event):
 
         ``T`` must be a dataclass that inherits from :class:`EventDataclass`.
         """
+        import dacite
+
         assert self.data_string.startswith(T.__name__ + "{")
         result = dacite.from_dict(T, json.loads(self.data_string[len(T.__name__) :]))
         assert isinstance(result, T)
@@ -476,6 +478,7 @@ def bind_with_data(
     event_objects: collections.deque[tkinter.Event[tkinter.Misc]] = collections.deque()
     widget.bind(sequence, event_objects.append, add=add)
 
+    @functools.wraps(callback)  # slow callbacks are blamed on the module of callback
     def run_the_callback(data_string: str) -> str | None:
         event: tkinter.Event[tkinter.Misc] | EventWithData = event_objects.popleft()
         event.__class__ = EventWithData  # evil haxor muhaha
@@ -849,3 +852,47 @@ def backup_open(file: Any, *args: Any, **kwargs: Any) -> Any:
 
     else:
         yield path.open(*args, **kwargs)
+
+
+def write_atomically(path: Path, content: str) -> None:
+    """Write a UTF-8 text file so that it's never left half-written.
+
+    The content is first written to a temporary file next to *path*, and the
+    temporary file then replaces *path*. If Porcupine crashes while writing,
+    or several threads or Porcupine processes write the same file at once,
+    the file will contain what one of them wrote. A crash can leave behind a
+    temporary file whose name ends with ``.tmp``.
+    """
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with temp_path.open("w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            temp_path.unlink()
+        raise
+
+
+def delete_old_files(folder: Path, max_age_days: float) -> None:
+    """Delete files in *folder* that haven't been modified in *max_age_days* days.
+
+    This is meant for cleaning up cache folders. Nothing is done if *folder*
+    doesn't exist.
+    """
+    oldest_allowed = time.time() - max_age_days * 24 * 60 * 60
+    try:
+        paths = list(folder.iterdir())
+    except FileNotFoundError:
+        return
+
+    for path in paths:
+        try:
+            if path.stat().st_mtime < oldest_allowed:
+                log.debug(f"deleting old file: {path}")
+                path.unlink()
+        except FileNotFoundError:
+            # Another Porcupine deleted it
+            pass
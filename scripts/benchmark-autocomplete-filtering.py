@@ -0,0 +1,52 @@
+# Measure how long it takes to filter a big list of autocompletions while
+# typing. Langservers (e.g. clangd in a project with big headers) can send
+# tens of thousands of completions at once.
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine.plugins.autocomplete import Completion, FuzzyMatcher  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=20_000, help="number of completions")
+parser.add_argument("--typed", default="getcharunl", help="text to type one character at a time")
+args = parser.parse_args()
+
+random.seed(123)
+words = ["get", "set", "char", "unlocked", "buffer", "size", "init", "free", "Str", "List"]
+
+
+def random_name() -> str:
+    parts = random.choices(words, k=random.randint(1, 4))
+    separator = random.choice(["_", ""])
+    return separator.join(parts) + random.choice(["", "", str(random.randint(0, 99))])
+
+
+completions = [
+    Completion(
+        display_text=name,
+        replace_start="1.0",
+        replace_end="1.0",
+        replace_text=name,
+        filter_text=name,
+        documentation="".join(random.choices(string.ascii_letters, k=50)),
+    )
+    for name in (random_name() for i in range(args.count))
+]
+
+start = time.perf_counter()
+matcher = FuzzyMatcher(completions)
+print(f"Preparing {args.count} completions: {(time.perf_counter() - start)*1000:.1f}ms")
+
+for end in range(1, len(args.typed) + 1):
+    start = time.perf_counter()
+    result = matcher.filter(args.typed[:end])
+    print(
+        f"Typed {args.typed[:end]!r}: {len(result)} matches in"
+        f" {(time.perf_counter() - start)*1000:.1f}ms"
+    )
@@ -0,0 +1,82 @@
+# Measure how long it takes to expand a huge folder (think node_modules) in the
+# directory tree. This starts Porcupine with temporary settings, so it needs a
+# display, but it doesn't touch your Porcupine settings.
+#
+# The target is 100ms from expanding the folder to seeing its contents, and
+# only the full run (with a display) measures that. With --scan-only, this
+# measures only listing and sorting the folder in the background thread, which
+# works without a display but says nothing about the time spent in Tk.
+import argparse
+import sys
+import tempfile
+import time
+import tkinter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine import dirs, get_main_window  # noqa: E402
+from porcupine.__main__ import main  # noqa: E402
+from porcupine.plugins.directory_tree import _scan_directory, get_directory_tree  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=60_000, help="number of files in the folder")
+parser.add_argument(
+    "--scan-only",
+    action="store_true",
+    help=(
+        "don't start Porcupine, only measure listing the folder in the background thread"
+        " (the 100ms target of the full run can't be checked like this)"
+    ),
+)
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    dirs.cache_dir = Path(temp_dir) / "cache"
+    dirs.config_dir = Path(temp_dir) / "config"
+    dirs.log_dir = Path(temp_dir) / "logs"
+
+    project = Path(temp_dir) / "project"
+    project.mkdir()
+    for number in range(args.count):
+        (project / f"file{number}.js").touch()
+
+    if args.scan_only:
+        times = []
+        for attempt in range(5):
+            start = time.perf_counter()
+            _scan_directory(project, "1")
+            times.append(time.perf_counter() - start)
+        print(f"Listing a folder of {args.count} files: {min(times)*1000:.1f}ms (best of 5)")
+        print("Run without --scan-only on a display to measure the whole expanding.")
+        sys.exit()
+
+    # Start Porcupine, but don't run the event loop forever
+    sys.argv[1:] = []
+    tkinter.Tk.mainloop = lambda self, n=0: None  # type: ignore
+    main()
+
+    tree = get_directory_tree()
+    tree.add_project(project)
+    project_id = tree.get_children("")[0]
+    get_main_window().update()
+
+    start = time.perf_counter()
+    longest_freeze = 0.0
+
+    tree.selection_set(project_id)
+    tree.item(project_id, open=True)
+    tree.event_generate("<<TreeviewOpen>>")
+    while tree._scan_futures:
+        update_start = time.perf_counter()
+        get_main_window().update()
+        longest_freeze = max(longest_freeze, time.perf_counter() - update_start)
+
+    end = time.perf_counter()
+    shown = len(tree.get_children(project_id))
+    print(f"Expanding a folder of {args.count} files: {(end - start)*1000:.1f}ms")
+    print(f"Longest time without handling events: {longest_freeze*1000:.1f}ms")
+    print(f"{shown} items in the treeview")
+    print("OK" if end - start < 0.1 else "Too slow, should be less than 100ms")
+
+    get_main_window().destroy()
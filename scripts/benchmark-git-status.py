@@ -0,0 +1,51 @@
+# Measure how long it takes to run and parse "git status" in a repository with
+# lots of ignored files, such as compiled object files next to source files.
+# Needs git, but not a display.
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine.plugins.git_status import parse_git_status, run_git_status  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=100_000, help="number of ignored files")
+parser.add_argument("--folders", type=int, default=100, help="number of folders to create")
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    repo = Path(temp_dir)
+    subprocess.run(["git", "init", "--quiet"], cwd=repo, check=True)
+    (repo / ".gitignore").write_text("*.o\n")
+
+    # Each folder contains a tracked file, so git can't just say "the whole folder is ignored"
+    for folder_number in range(args.folders):
+        folder = repo / f"folder{folder_number}"
+        folder.mkdir()
+        (folder / "main.c").write_text("int main(void) { return 0; }\n")
+        for number in range(args.count // args.folders):
+            (folder / f"file{number}.o").touch()
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+
+    start = time.perf_counter()
+    output = subprocess.run(
+        ["git", "status", "--ignored", "--porcelain=v2", "-z"],
+        cwd=repo,
+        env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+        capture_output=True,
+        check=True,
+    ).stdout.decode("utf-8")
+    print(f"Running git status: {(time.perf_counter() - start)*1000:.1f}ms")
+
+    start = time.perf_counter()
+    statuses = parse_git_status(output, repo)
+    print(f"Parsing {len(statuses)} statuses: {(time.perf_counter() - start)*1000:.1f}ms")
+
+    start = time.perf_counter()
+    run_git_status(repo)
+    print(f"Total time of run_git_status(): {(time.perf_counter() - start)*1000:.1f}ms")
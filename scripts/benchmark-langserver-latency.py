@@ -0,0 +1,81 @@
+# Measure how long it takes to get autocompletions from a langserver, from
+# sending the request to handling the response. This uses the fake langserver
+# of tests, so the time is spent in Porcupine and in the I/O, not in the
+# langserver.
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import tkinter
+from pathlib import Path
+
+import sansio_lsp_client as lsp
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine.plugins.langserver import LangServerIO  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=200, help="number of completion requests")
+args = parser.parse_args()
+
+fake_langserver = Path(__file__).absolute().parent.parent / "tests" / "fake_langserver.py"
+process = subprocess.Popen(
+    [sys.executable, str(fake_langserver)], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+)
+client = lsp.Client(root_uri=Path.cwd().as_uri())
+events: list[lsp.Event] = []
+
+
+def on_data(received_bytes: bytes) -> None:
+    assert received_bytes, "langserver died"
+    events.extend(client.recv(received_bytes))
+    io.write(client.send())
+
+
+def wait_for_event(event_type: type[lsp.Event]) -> lsp.Event:
+    while True:
+        for event in events:
+            if isinstance(event, event_type):
+                events.remove(event)
+                return event
+        # Tcl interpreter without Tk, so this doesn't need a display
+        tcl.tk.dooneevent()
+
+
+tcl = tkinter.Tcl()
+io = LangServerIO(process, tcl, on_data)
+io.write(client.send())
+wait_for_event(lsp.Initialized)
+
+uri = (Path.cwd() / "benchmark.py").as_uri()
+client.did_open(
+    lsp.TextDocumentItem(
+        uri=uri, languageId="python", text="import tkinter\ntkinter.Tk().mainloop()\n", version=0
+    )
+)
+
+times = []
+for i in range(args.count):
+    start = time.perf_counter()
+    client.completion(
+        text_document_position=lsp.TextDocumentPosition(
+            textDocument=lsp.TextDocumentIdentifier(uri=uri),
+            position=lsp.Position(line=1, character=8),
+        )
+    )
+    io.write(client.send())
+    wait_for_event(lsp.Completion)
+    times.append((time.perf_counter() - start) * 1000)
+
+print(f"{args.count} completion requests")
+print(f"median {statistics.median(times):.2f}ms, mean {statistics.mean(times):.2f}ms")
+print(f"min {min(times):.2f}ms, max {max(times):.2f}ms")
+
+client.shutdown()
+io.write(client.send())
+wait_for_event(lsp.Shutdown)
+client.exit()
+io.write(client.send())
+process.wait()
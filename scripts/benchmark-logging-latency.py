@@ -0,0 +1,101 @@
+# Measure how long Porcupine takes to handle a keystroke, with and without
+# --verbose. Plugins log debug messages on every keystroke (e.g. highlight), so
+# this shows how much logging slows down typing. This starts Porcupine with
+# temporary settings, so it needs a display, but it doesn't touch your
+# Porcupine settings. With --log-calls-only, this measures only how long a
+# logging call blocks the caller, which works without a display.
+import argparse
+import logging
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine import _logs, dirs, get_main_window, get_tab_manager  # noqa: E402
+from porcupine.__main__ import main  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=500, help="number of keystrokes")
+parser.add_argument(
+    "--log-calls-only",
+    action="store_true",
+    help="don't start Porcupine, only measure logging calls (count is multiplied by 10)",
+)
+parser.add_argument("--verbose", action="store_true", help=argparse.SUPPRESS)
+parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if not args.child:
+    # Porcupine can be started only once in a process
+    for verbose_args in [[], ["--verbose"]]:
+        if args.log_calls_only:
+            verbose_args.append("--log-calls-only")
+        subprocess.run(
+            [sys.executable, __file__, "--child", f"--count={args.count}", *verbose_args],
+            check=True,
+        )
+    sys.exit()
+
+label = "with --verbose" if args.verbose else "without --verbose"
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    dirs.cache_dir = Path(temp_dir) / "cache"
+    dirs.config_dir = Path(temp_dir) / "config"
+    dirs.log_dir = Path(temp_dir) / "logs"
+
+    if args.log_calls_only:
+        dirs.log_dir.mkdir()
+        sys.stderr = open(Path(temp_dir) / "stderr.txt", "w")
+        _logs.setup(all_loggers_verbose=args.verbose)
+        logger = logging.getLogger("porcupine.plugins.autocomplete")
+
+        times = []
+        for i in range(args.count * 10):
+            start = time.perf_counter()
+            logger.debug(f"filtering through completions, this is message number {i}")
+            times.append(time.perf_counter() - start)
+
+        times.sort()
+        print(
+            f"Logging call {label}: median {statistics.median(times)*1000:.3f}ms,"
+            f" 99th percentile {times[len(times) * 99 // 100]*1000:.3f}ms,"
+            f" slowest {times[-1]*1000:.3f}ms, total {sum(times)*1000:.0f}ms"
+        )
+        sys.exit()  # the log queue is emptied at exit
+
+    path = Path(temp_dir) / "typing.py"
+    path.write_text("import tkinter\n\n\ndef foo():\n    return 123\n" * 100)
+
+    # Start Porcupine, but don't run the event loop forever. Messages printed
+    # with --verbose are hidden, so that only the logging is measured.
+    sys.argv[1:] = (["--verbose"] if args.verbose else []) + [str(path)]
+    sys.stderr = open(Path(temp_dir) / "stderr.txt", "w")
+    tkinter.Tk.mainloop = lambda self, n=0: None  # type: ignore
+    main()
+
+    [tab] = get_tab_manager().tabs()
+    textwidget = tab.textwidget  # type: ignore
+    textwidget.mark_set("insert", "end - 1 char")
+    get_main_window().update()
+
+    text = "print('hello world')\n"
+    times = []
+    for i in range(args.count):
+        start = time.perf_counter()
+        textwidget.insert("insert", text[i % len(text)])
+        get_main_window().update()
+        times.append(time.perf_counter() - start)
+
+    print(
+        f"Keystroke {label}: median {statistics.median(times)*1000:.2f}ms,"
+        f" slowest {max(times)*1000:.2f}ms"
+    )
+
+    get_main_window().destroy()
+    sys.stderr.close()
+    sys.stderr = sys.__stderr__
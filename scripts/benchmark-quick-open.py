@@ -0,0 +1,53 @@
+# Measure how fast the quick open plugin finds files in a huge project. The
+# paths are made up, so this doesn't need a big repository or a display.
+import argparse
+import gc
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent))
+
+from porcupine.plugins.quick_open import PathMatcher  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--count", type=int, default=200_000, help="number of files in the project")
+parser.add_argument(
+    "--typed", default="srcmodelview.py", help="text to type one character at a time"
+)
+args = parser.parse_args()
+
+random.seed(123)
+words = ["src", "lib", "test", "util", "core", "plugin", "node_modules", "build", "model", "view"]
+
+
+def random_path() -> str:
+    folders = [
+        random.choice(words) + random.choice(["", "s", "_v2", str(random.randint(0, 99))])
+        for i in range(random.randint(0, 6))
+    ]
+    name = "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 12)))
+    return "/".join(folders + [name + random.choice([".py", ".js", ".ts", ".md", ".json"])])
+
+
+paths = [random_path() for i in range(args.count)]
+
+start = time.perf_counter()
+matcher = PathMatcher(paths)
+print(f"Preparing {args.count} paths: {(time.perf_counter() - start)*1000:.1f}ms")
+
+# Creating the matcher leaves many new objects for the garbage collector. In
+# Porcupine that happens in a background thread, not while typing.
+gc.collect()
+
+slowest = 0.0
+for end in range(1, len(args.typed) + 1):
+    start = time.perf_counter()
+    result = matcher.search(args.typed[:end])
+    search_time = time.perf_counter() - start
+    slowest = max(slowest, search_time)
+    print(f"Typed {args.typed[:end]!r}: {len(result)} matches in {search_time*1000:.1f}ms")
+
+print("OK" if slowest < 0.02 else "Too slow, should be less than 20ms")
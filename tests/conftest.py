@@ -20,7 +20,7 @@ import pytest
 import porcupine
 from porcupine import dirs, get_main_window, get_tab_manager, plugins, tabs
 from porcupine.__main__ import main
-from porcupine.plugins import git_status
+from porcupine.plugins import directory_tree, git_status
 from porcupine.plugins.directory_tree import get_directory_tree
 
 
@@ -88,6 +88,8 @@ def porcusession(monkeypatch_dirs):
         sys.argv[1:] = ["--shuffle-plugins"]
         tkinter.Tk.mainloop = lambda self: None
         main()
+        # Run what mainloop() would run first, e.g. plugins with setup_after_startup
+        get_main_window().update()
     finally:
         sys.argv[1:] = old_args
         tkinter.Tk.mainloop = old_mainloop
@@ -116,7 +118,7 @@ def filetab(porcusession, tabmanager):
     return tab
 
 
-# makes git status tags immediately available in directory tree
+# makes git status tags and folder contents immediately available in directory tree
 @pytest.fixture(scope="session", autouse=True)
 def fake_git_pool():
     class FakeThreadPool:
@@ -127,6 +129,7 @@ def fake_git_pool():
 
     # monkeypatch fixture doesn't work with scope="session"
     git_status.git_pool = FakeThreadPool()
+    directory_tree.scandir_pool = FakeThreadPool()
     yield
 
 
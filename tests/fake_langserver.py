@@ -0,0 +1,105 @@
+# A tiny langserver for tests and benchmarks. It keeps track of the content of
+# opened files by applying incremental changes, and when asked for a hover, it
+# responds with the whole file content so that tests can compare it with the
+# text widget. Autocompletions are all words of the file. Workspace folders are
+# supported, so that one fake langserver can be shared by several projects.
+import json
+import re
+import sys
+
+
+def read_message():
+    content_length = None
+    while True:
+        line = sys.stdin.buffer.readline()
+        if not line:
+            sys.exit(1)
+        if line == b"\r\n":
+            break
+        name, value = line.decode("ascii").split(":", 1)
+        if name.lower() == "content-length":
+            content_length = int(value)
+
+    assert content_length is not None
+    return json.loads(sys.stdin.buffer.read(content_length))
+
+
+def send_message(message):
+    body = json.dumps({"jsonrpc": "2.0", **message}).encode("utf-8")
+    sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    sys.stdout.buffer.flush()
+
+
+# LSP counts columns in utf-16 code units
+def position_to_index(text, position):
+    lines = text.split("\n")
+    assert 0 <= position["line"] < len(lines)
+    line_start = sum(len(line) + 1 for line in lines[: position["line"]])
+
+    line_utf16 = lines[position["line"]].encode("utf-16-le")
+    assert 0 <= 2 * position["character"] <= len(line_utf16)
+    column = len(line_utf16[: 2 * position["character"]].decode("utf-16-le"))
+    return line_start + column
+
+
+def apply_change(text, change):
+    if "range" not in change:
+        return change["text"]
+    start = position_to_index(text, change["range"]["start"])
+    end = position_to_index(text, change["range"]["end"])
+    assert start <= end
+    return text[:start] + change["text"] + text[end:]
+
+
+def main():
+    documents = {}  # uri --> (version, text)
+    workspace_folders = []  # uris
+
+    while True:
+        message = read_message()
+        method = message.get("method")
+        params = message.get("params")
+
+        if method == "initialize":
+            capabilities = {
+                "textDocumentSync": {"openClose": True, "change": 2},
+                "hoverProvider": True,
+                "completionProvider": {},
+                "workspace": {"workspaceFolders": {"supported": True, "changeNotifications": True}},
+            }
+            workspace_folders = [folder["uri"] for folder in params["workspaceFolders"]]
+            send_message({"id": message["id"], "result": {"capabilities": capabilities}})
+        elif method == "workspace/didChangeWorkspaceFolders":
+            for folder in params["event"]["removed"]:
+                workspace_folders.remove(folder["uri"])
+            for folder in params["event"]["added"]:
+                assert folder["uri"] not in workspace_folders
+                workspace_folders.append(folder["uri"])
+        elif method == "textDocument/didOpen":
+            doc = params["textDocument"]
+            documents[doc["uri"]] = (doc["version"], doc["text"])
+        elif method == "textDocument/didClose":
+            del documents[params["textDocument"]["uri"]]
+        elif method == "textDocument/didChange":
+            uri = params["textDocument"]["uri"]
+            version = params["textDocument"]["version"]
+            old_version, text = documents[uri]
+            assert version > old_version
+            for change in params["contentChanges"]:
+                text = apply_change(text, change)
+            documents[uri] = (version, text)
+        elif method == "textDocument/hover":
+            version, text = documents[params["textDocument"]["uri"]]
+            send_message({"id": message["id"], "result": {"contents": text}})
+        elif method == "textDocument/completion":
+            version, text = documents[params["textDocument"]["uri"]]
+            items = [{"label": word} for word in sorted(set(re.findall(r"\w+", text)))]
+            send_message({"id": message["id"], "result": {"isIncomplete": False, "items": items}})
+        elif method == "shutdown":
+            send_message({"id": message["id"], "result": None})
+        elif method == "exit":
+            sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
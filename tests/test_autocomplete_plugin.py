@@ -1,4 +1,9 @@
-from porcupine import utils
+import types
+
+import pytest
+
+from porcupine import tabs, utils
+from porcupine.plugins import autocomplete
 from porcupine.plugins.autocomplete import Response
 
 
@@ -87,3 +92,125 @@ def test_not_suggesting_what_you_just_typed(filetab):
     filetab.textwidget.insert("end", "Foo")
     filetab.textwidget.mark_set("insert", "1.0 lineend")
     assert get_completions(filetab) == []
+
+
+def test_words_from_other_tabs(filetab, tabmanager):
+    other_tab = tabs.FileTab(tabmanager, content="hello helloworld helloworld")
+    tabmanager.add_tab(other_tab, select=False)
+    autocomplete._index_pool.submit(lambda: None).result()  # wait for indexing
+
+    filetab.textwidget.insert("end", "hello hel")
+    filetab.textwidget.mark_set("insert", "1.0 lineend")
+    assert get_completions(filetab) == ["hello", "helloworld"]
+
+    tabmanager.close_tab(other_tab)
+    assert get_completions(filetab) == ["hello"]
+
+
+def test_word_index_prefix_lookup():
+    index = autocomplete._WordIndex()
+    index.add_tab("a")
+    index.add_tab("b")
+    index._update_tab("a", "Hello hello helloWorld help xhello")
+    index._update_tab("b", "hello goodbye")
+
+    assert index.get_counts("", "HEL") == {"Hello": 1, "hello": 2, "helloWorld": 1, "help": 1}
+    assert index.get_counts("b", "hel") == {"Hello": 1, "hello": 1, "helloWorld": 1, "help": 1}
+    assert index.get_counts("", "") == {}
+
+    index.remove_tab("a")
+    assert index.get_counts("", "hel") == {"hello": 1}
+    index._update_tab("b", "help")
+    assert index.get_counts("", "hel") == {"help": 1}
+
+
+def test_changed_project_files_are_rescanned(tmp_path):
+    (tmp_path / "a.py").write_text("hello helloworld")
+    (tmp_path / "b.py").write_text("hello")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "c").write_text("hello")
+
+    index = autocomplete._WordIndex()
+    index._scan_project(tmp_path, set(), 1000)
+    assert index.get_counts("", "hel") == {"hello": 2, "helloworld": 1}
+
+    (tmp_path / "a.py").write_text("goodbye")
+    (tmp_path / "b.py").unlink()
+    (tmp_path / ".git" / "c").write_text("hello hello")
+    changed = [tmp_path / "a.py", tmp_path / "b.py", tmp_path / ".git" / "c"]
+    index._rescan_paths(changed, {tmp_path}, set(), 1000)
+    assert index.get_counts("", "hel") == {}
+    assert index.get_counts("", "go") == {"goodbye": 1}
+
+
+def test_fuzzy_matcher():
+    def completion(text):
+        return autocomplete.Completion(text, "1.0", "1.0", text, text, "")
+
+    matcher = autocomplete.FuzzyMatcher(
+        [completion(text) for text in ["getchar", "getchar_unlocked", "GetCharUnlocked", "xyz"]]
+    )
+
+    def filter_(text):
+        return [c.display_text for c in matcher.filter(text)]
+
+    assert filter_("") == ["getchar", "getchar_unlocked", "GetCharUnlocked", "xyz"]
+    assert filter_("getar_u") == ["getchar_unlocked"]
+    assert filter_("gcu") == ["GetCharUnlocked", "getchar_unlocked"]
+    # Backspacing away from narrowed results
+    assert filter_("g") == ["getchar", "getchar_unlocked", "GetCharUnlocked"]
+
+
+def test_popup_with_more_completions_than_visible_rows(filetab):
+    popup = autocomplete._Popup(filetab.textwidget)
+    popup.set_completions(
+        [autocomplete.Completion(f"word{n}", "1.0", "1.0", "", "", "") for n in range(1000)]
+    )
+    filetab.update()  # cursor must be visible when placing the popup
+    popup.start_completing()
+    filetab.update()
+
+    def shown_indexes():
+        return [int(item_id) for item_id in popup.treeview.get_children()]
+
+    # Only visible rows are in the treeview, and the row height is measured
+    row_count = popup._get_row_count()
+    [first_id, *rest] = popup.treeview.get_children()
+    assert popup._row_height == popup.treeview.bbox(first_id)[3]
+    assert row_count == popup.treeview.winfo_height() // popup._row_height
+    assert 1 < row_count < 1000
+    assert shown_indexes() == list(range(row_count + 1))
+    assert popup.treeview.selection() == ("0",)
+
+    # Going below the last visible row scrolls by one
+    for n in range(row_count):
+        popup.select_next()
+    assert popup._get_selected_completion().display_text == f"word{row_count}"
+    assert popup.treeview.selection() == (str(row_count),)
+    assert shown_indexes()[0] == 1
+
+    # Page down scrolls a page and moves the selection with it
+    popup.on_page_up_down(types.SimpleNamespace(keysym="Next"))
+    assert shown_indexes()[0] == 1 + row_count
+    assert popup.treeview.selection() == (str(2 * row_count),)
+    popup.on_page_up_down(types.SimpleNamespace(keysym="Prior"))
+    assert shown_indexes()[0] == 1
+    assert popup.treeview.selection() == (str(row_count),)
+
+    # Going up from the first completion wraps around to the end
+    popup._select_index(0)
+    popup.select_previous()
+    assert popup.treeview.selection() == ("999",)
+    assert shown_indexes()[-1] == 999
+
+    # Scrollbar is in sync with the shown rows
+    first, last = popup._left_scrollbar.get()
+    assert first == pytest.approx((1000 - row_count) / 1000)
+    assert last == pytest.approx(1)
+    popup._on_scrollbar("moveto", "0.5")
+    assert shown_indexes()[0] == 500
+    assert popup._left_scrollbar.get()[0] == pytest.approx(0.5)
+    popup._on_scrollbar("scroll", "1", "units")
+    assert shown_indexes()[0] == 501
+
+    assert popup.stop_completing().display_text == "word999"
@@ -1,3 +1,4 @@
+import random
 import shutil
 import sys
 from pathlib import Path
@@ -6,7 +7,14 @@ import pytest
 
 from porcupine import get_tab_manager
 from porcupine.plugins import directory_tree as plugin_module
-from porcupine.plugins.directory_tree import _focus_treeview, _stringify_path, get_path
+from porcupine.plugins.directory_tree import (
+    _focus_treeview,
+    _longest_increasing_subsequence,
+    _scan_directory,
+    _stringify_path,
+    get_path,
+)
+from porcupine.settings import global_settings
 
 
 def test_adding_nested_projects(tree, tmp_path):
@@ -228,3 +236,107 @@ def test_empty_directory_refreshing(tree, tmp_path):
     assert len(new_dir_children) == 1 and new_dir_children[0] == tree.get_id_from_path(
         new_file_path, project_id
     )
+
+
+def test_inserting_in_batches(tree, tmp_path, monkeypatch):
+    monkeypatch.setattr(plugin_module, "_INSERT_BATCH_SIZE", 2)
+    for name in ["a", "b", "c", "d", "e"]:
+        (tmp_path / name).touch()
+    (tmp_path / "subdir").mkdir()
+
+    refreshed = []
+    tree.bind("<<FolderRefreshed>>", refreshed.append, add=True)
+    tree.add_project(tmp_path)
+    [project_id] = [id for id in tree.get_children("") if get_path(id) == tmp_path]
+    open_as_if_user_clicked(tree, project_id)
+
+    assert [tree.item(id, "text") for id in tree.get_children(project_id)] == [
+        "subdir",
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+    assert tree.get_id_from_path(tmp_path / "subdir", project_id).startswith("dir:")
+    assert len(refreshed) == 1
+
+
+def test_show_more(tree, tmp_path):
+    for number in range(25):
+        (tmp_path / f"file{number:02d}").touch()
+
+    global_settings.set("directory_tree_page_size", 10)
+    try:
+        tree.add_project(tmp_path)
+        [project_id] = [id for id in tree.get_children("") if get_path(id) == tmp_path]
+        open_as_if_user_clicked(tree, project_id)
+
+        def get_texts():
+            return [tree.item(id, "text") for id in tree.get_children(project_id)]
+
+        assert get_texts() == [f"file{n:02d}" for n in range(10)] + ["(show 10 more...)"]
+
+        open_as_if_user_clicked(tree, tree.get_children(project_id)[-1])
+        assert get_texts() == [f"file{n:02d}" for n in range(20)] + ["(show 5 more...)"]
+
+        # Refreshing doesn't hide what the user wanted to see
+        (tmp_path / "file00").unlink()
+        tree.refresh()
+        assert get_texts() == [f"file{n:02d}" for n in range(1, 21)] + ["(show 4 more...)"]
+
+        open_as_if_user_clicked(tree, tree.get_children(project_id)[-1])
+        assert get_texts() == [f"file{n:02d}" for n in range(1, 25)]
+    finally:
+        global_settings.reset("directory_tree_page_size")
+
+
+def test_scan_directory_order(tmp_path):
+    for name in ["b", "a", ".hidden", "B"]:
+        (tmp_path / name).touch()
+    for name in ["subdir", ".git"]:
+        (tmp_path / name).mkdir()
+
+    assert _scan_directory(tmp_path, "1") == {
+        f"dir:1:{tmp_path / 'subdir'}": "subdir",
+        f"file:1:{tmp_path / 'B'}": "B",
+        f"file:1:{tmp_path / 'a'}": "a",
+        f"file:1:{tmp_path / 'b'}": "b",
+        f"dir:1:{tmp_path / '.git'}": ".git",
+        f"file:1:{tmp_path / '.hidden'}": ".hidden",
+    }
+    # dict order matters
+    assert list(_scan_directory(tmp_path, "1").values()) == [
+        "subdir",
+        "B",
+        "a",
+        "b",
+        ".git",
+        ".hidden",
+    ]
+
+
+def test_longest_increasing_subsequence():
+    assert _longest_increasing_subsequence([]) == []
+    assert _longest_increasing_subsequence([0, 1, 2]) == [0, 1, 2]
+    assert _longest_increasing_subsequence([0, 3, 1, 2, 4]) == [0, 1, 2, 4]
+    assert len(_longest_increasing_subsequence([4, 3, 2, 1, 0])) == 1
+
+
+def test_sorting_after_shuffling(tree, tmp_path):
+    names = ["a", "b", "c", "d", "e", "f", "g"]
+    for name in names:
+        (tmp_path / name).touch()
+    tree.add_project(tmp_path)
+    [project_id] = [id for id in tree.get_children("") if get_path(id) == tmp_path]
+    open_as_if_user_clicked(tree, project_id)
+
+    random.seed(123)
+    for attempt in range(20):
+        children = list(tree.get_children(project_id))
+        random.shuffle(children)
+        for index, child_id in enumerate(children):
+            tree.move(child_id, project_id, index)
+
+        tree.sort_folder_contents(project_id)
+        assert [tree.item(id, "text") for id in tree.get_children(project_id)] == names
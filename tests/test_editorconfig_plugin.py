@@ -2,7 +2,9 @@ import logging
 from pathlib import Path
 
 from porcupine import settings
+from porcupine.plugins import editorconfig
 from porcupine.plugins.editorconfig import apply_config, get_config, glob_match
+from porcupine.plugins.file_watcher import PathsChanged
 
 
 def test_glob():
@@ -111,6 +113,24 @@ def test_example_file_from_editorconfig_org():
     }
 
 
+def test_config_files_are_parsed_once(tabmanager, tmp_path, mocker):
+    (tmp_path / ".editorconfig").write_text("[*.py]\nindent_size = 3\n")
+    (tmp_path / "subdir").mkdir()
+    parse_file = mocker.spy(editorconfig, "parse_file")
+
+    for n in range(20):
+        assert get_config(tmp_path / "subdir" / f"file{n}.py") == {"indent_size": "3"}
+    assert parse_file.call_count == 1
+
+    # Different length, so that it's noticed even if mtime doesn't change
+    (tmp_path / ".editorconfig").write_text("[*.py]\nindent_size = 10\n")
+    tabmanager.event_generate(
+        "<<PathsChanged>>", data=PathsChanged([str(tmp_path / ".editorconfig")])
+    )
+    assert get_config(tmp_path / "subdir" / "file1.py") == {"indent_size": "10"}
+    assert parse_file.call_count == 2
+
+
 def test_good_values(filetab):
     apply_config(
         {
@@ -0,0 +1,66 @@
+import sys
+
+import pytest
+
+from porcupine import get_main_window, get_tab_manager
+from porcupine.plugins import file_watcher
+from porcupine.plugins.directory_tree import get_path
+
+
+def notice_changes():
+    # Polling is needed only if inotify isn't available
+    get_main_window().event_generate("<FocusIn>")
+
+
+def open_project(tree, path):
+    tree.add_project(path)
+    [project_id] = [id for id in tree.get_children("") if get_path(id) == path]
+    tree.selection_set(project_id)
+    tree.item(project_id, open=True)
+    tree.event_generate("<<TreeviewOpen>>")
+    tree.update()
+    return project_id
+
+
+def test_new_file_appears_in_directory_tree(tree, tmp_path, wait_until):
+    (tmp_path / "a").touch()
+    project_id = open_project(tree, tmp_path)
+    assert len(tree.get_children(project_id)) == 1
+
+    (tmp_path / "b").touch()
+    notice_changes()
+    wait_until(lambda: len(tree.get_children(project_id)) == 2)
+
+
+def test_only_changed_paths_are_reported(tabmanager, tmp_path, mocker, wait_until):
+    event_generate = mocker.spy(get_tab_manager(), "event_generate")
+    (tmp_path / "a.txt").write_text("hello")
+    (tmp_path / "b.txt").write_text("hello")
+    tab = tabmanager.open_file(tmp_path / "a.txt")
+    tabmanager.open_file(tmp_path / "b.txt")
+    tabmanager.select(tab)
+    tabmanager.update()
+
+    (tmp_path / "a.txt").write_text("new text")
+    notice_changes()
+    wait_until(lambda: tab.textwidget.get("1.0", "end - 1 char") == "new text")
+    [paths_changed_call] = [
+        call for call in event_generate.call_args_list if call.args == ("<<PathsChanged>>",)
+    ]
+    assert paths_changed_call.kwargs["data"].paths == [str(tmp_path / "a.txt")]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is linux-only")
+def test_inotify_is_used():
+    assert file_watcher._watcher._inotify is not None
+
+
+def test_refresh_on_focus_without_file_watcher(tabmanager, mocker, monkeypatch):
+    event_generate = mocker.spy(tabmanager, "event_generate")
+    get_main_window().event_generate("<FocusIn>")
+    assert mocker.call("<<FileSystemChanged>>") not in event_generate.call_args_list
+
+    # This is what happens when the file_watcher plugin is disabled
+    monkeypatch.setattr(tabmanager, "refresh_on_focus", True)
+    get_main_window().event_generate("<FocusIn>")
+    assert mocker.call("<<FileSystemChanged>>") in event_generate.call_args_list
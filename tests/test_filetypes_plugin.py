@@ -1,5 +1,7 @@
+import fnmatch
 import logging
 import pickle
+import re
 import shutil
 import sys
 from pathlib import Path
@@ -77,6 +79,40 @@ def test_slash_in_filename_patterns(custom_filetypes, caplog, tmp_path):
     assert "HTML, Mako template" in caplog.records[0].message
 
 
+def test_matcher_gives_same_results_as_checking_every_pattern(custom_filetypes, tmp_path):
+    paths = [
+        tmp_path / "foo.py",
+        tmp_path / "foo.PY",
+        tmp_path / ".py",
+        tmp_path / "foo.c++",
+        tmp_path / "foo.tar.gz",
+        tmp_path / "noextension",
+        tmp_path / "Makefile",
+        tmp_path / "Makefile.am",
+        tmp_path / "mako-templates" / "foo.html",
+        tmp_path / "lol-mako-templates" / "foo.html",
+        tmp_path / "dir.with.dots" / "file",
+    ]
+    for path in paths:
+        expected = {
+            name
+            for name, filetype in filetypes.filetypes.items()
+            if any(
+                fnmatch.fnmatch(path.as_posix(), "*/" + pattern)
+                for pattern in filetype["filename_patterns"]
+            )
+        }
+        assert filetypes._matcher.get_names_matching_path(path.as_posix()) == expected
+
+    for shebang in ["#!/usr/bin/env python3", "#!/bin/bash", "#!/usr/bin/wish", "#!/bin/foo"]:
+        expected = {
+            name
+            for name, filetype in filetypes.filetypes.items()
+            if re.search(filetype["shebang_regex"], shebang)
+        }
+        assert filetypes._matcher.get_names_matching_shebang(shebang) == expected
+
+
 @pytest.mark.skipif(shutil.which("clangd") is None, reason="example config uses clangd")
 def test_cplusplus_toml_bug(tmp_path, tabmanager, custom_filetypes):
     (tmp_path / "foo.cpp").touch()
@@ -84,7 +120,7 @@ def test_cplusplus_toml_bug(tmp_path, tabmanager, custom_filetypes):
     pickle.dumps(tab.get_state())  # should not raise an error
 
 
-@pytest.mark.xfail(strict=True, reason="langservers are disabled")
+@pytest.mark.xfail(strict=True, reason="no Python langserver is configured by default")
 def test_settings_reset_when_filetype_changes(filetab, tmp_path):
     assert filetab.settings.get("filetype_name", object) == "Python"
     assert filetab.settings.get("comment_prefix", object) == "#"
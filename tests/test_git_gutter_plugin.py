@@ -0,0 +1,107 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from porcupine.plugins import git_gutter
+from porcupine.plugins.git_gutter import LineDiff
+from porcupine.textutils import Change
+
+
+def replace(diff, start, end, new_text):
+    diff.apply_change(
+        Change(start=start, old_end=end, new_end=[0, 0], old_text="", new_text=new_text)
+    )
+
+
+def test_markers():
+    lines = ["a", "b", "c", "d", "e", "f", "g", "h", ""]
+    diff = LineDiff(lines, lines.copy())
+    assert diff.get_markers() == {}
+
+    replace(diff, [2, 0], [2, 1], "bb")
+    assert diff.get_markers() == {2: "modified"}
+
+    replace(diff, [4, 1], [4, 1], "\nnew line")
+    assert diff.get_markers() == {2: "modified", 5: "added"}
+
+    replace(diff, [7, 0], [8, 0], "")
+    assert diff.lines == ["a", "bb", "c", "d", "new line", "e", "g", "h", ""]
+    assert diff.get_markers() == {2: "modified", 5: "added", 7: "deleted"}
+
+    # Undoing everything removes all markers
+    replace(diff, [2, 0], [8, 0], "b\nc\nd\ne\nf\ng\n")
+    assert diff.lines == lines
+    assert diff.get_markers() == {}
+
+
+def test_random_edits_keep_diff_valid():
+    rng = random.Random(1234)
+    base_lines = [f"line {n}" for n in range(200)]
+    diff = LineDiff(base_lines, base_lines.copy())
+
+    for iteration in range(300):
+        first = rng.randrange(len(diff.lines))
+        last = min(first + rng.randrange(3), len(diff.lines) - 1)
+        end_column = rng.randrange(len(diff.lines[last]) + 1)
+        new_text = rng.choice(["", "x", "\n", "line 5\nline 6\n", f"line {first}"])
+        replace(diff, [first + 1, 0], [last + 1, end_column], new_text)
+
+        # The opcodes must cover both lists without gaps, and equal parts must be equal
+        i = j = 0
+        for tag, i1, i2, j1, j2 in diff.opcodes:
+            assert (i1, j1) == (i, j)
+            if tag == "equal":
+                assert diff.base_lines[i1:i2] == diff.lines[j1:j2]
+            i, j = i2, j2
+        assert (i, j) == (len(diff.base_lines), len(diff.lines))
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_editing_committed_file(tabmanager, tmp_path, wait_until):
+    (tmp_path / "foo.py").write_text("a\nb\nc\n")
+    subprocess.check_call(["git", "init", "--quiet"], cwd=tmp_path, stdout=subprocess.DEVNULL)
+    subprocess.check_call(["git", "add", "foo.py"], cwd=tmp_path)
+    subprocess.check_call(
+        ["git", "-c", "user.name=x", "-c", "user.email=x@y", "commit", "--quiet", "-m", "x"],
+        cwd=tmp_path,
+    )
+
+    tab = tabmanager.open_file(tmp_path / "foo.py")
+    gutter = git_gutter._gutters[tab]
+    tab.textwidget.insert("2.0", "new\n")
+    tab.textwidget.replace("4.0", "4.1", "C")
+    wait_until(lambda: gutter._markers == {2: "added", 4: "modified"})
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_committed_content_is_cached(tabmanager, tmp_path, wait_until, mocker):
+    def commit(filename):
+        subprocess.check_call(["git", "add", filename], cwd=tmp_path)
+        subprocess.check_call(
+            ["git", "-c", "user.name=x", "-c", "user.email=x@y", "commit", "--quiet", "-m", "x"],
+            cwd=tmp_path,
+        )
+
+    subprocess.check_call(["git", "init", "--quiet"], cwd=tmp_path, stdout=subprocess.DEVNULL)
+    (tmp_path / "other.py").write_text("x\n")
+    commit("other.py")
+    (tmp_path / "foo.py").write_text("a\n")
+    tab = tabmanager.open_file(tmp_path / "foo.py")
+    gutter = git_gutter._gutters[tab]
+    tab.textwidget.insert("end - 1 char", "b\n")
+    tab.save()
+    wait_until(lambda: gutter._latest_future is None)
+    assert gutter._markers == {}  # not committed yet
+
+    git_show_spy = mocker.spy(git_gutter, "_get_committed_content")
+    gutter.refresh_committed_content()
+    wait_until(lambda: gutter._latest_future is None)
+    assert git_show_spy.call_count == 0
+
+    commit("foo.py")
+    tab.textwidget.insert("end - 1 char", "c\n")
+    gutter.refresh_committed_content()
+    wait_until(lambda: gutter._markers == {3: "added"})
+    assert git_show_spy.call_count == 1
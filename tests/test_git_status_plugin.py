@@ -1,13 +1,15 @@
 import shutil
 import subprocess
 import sys
+from concurrent.futures import Future
 from functools import partial
 from pathlib import Path
 
 import pytest
 
-from porcupine import get_tab_manager
-from porcupine.plugins.git_status import run_git_status
+from porcupine import dirs, get_tab_manager
+from porcupine.plugins import git_status
+from porcupine.plugins.git_status import parse_git_status, run_git_status
 
 
 @pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
@@ -31,6 +33,101 @@ def test_added_and_modified_content(tree, tmp_path, monkeypatch):
     assert set(tree.item(project_id, "tags")) == {"git_added"}
 
 
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_git_status_not_rerun_if_nothing_changed(tree, tmp_path, mocker):
+    Path(tmp_path / "a").write_text("a")
+    subprocess.check_call(["git", "init", "--quiet"], cwd=tmp_path, stdout=subprocess.DEVNULL)
+    subprocess.check_call(["git", "add", "a"], cwd=tmp_path)
+    tree.add_project(tmp_path)
+    [project_id] = tree.get_children()
+    assert set(tree.item(project_id, "tags")) == {"git_added"}
+
+    run_git_status_spy = mocker.spy(git_status, "run_git_status")
+    get_tab_manager().event_generate("<<FileSystemChanged>>")
+    assert run_git_status_spy.call_count == 0
+
+    subprocess.check_call(["git", "rm", "--cached", "--quiet", "a"], cwd=tmp_path)
+    get_tab_manager().event_generate("<<FileSystemChanged>>")
+    assert run_git_status_spy.call_count == 1
+    assert "git_added" not in tree.item(project_id, "tags")
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_statuses_are_cached(tmp_path):
+    subprocess.check_call(["git", "init", "--quiet"], cwd=tmp_path, stdout=subprocess.DEVNULL)
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+    subprocess.check_call(["git", "add", "a"], cwd=tmp_path)
+
+    statuses, outdated = git_status._GitStatusJob(tmp_path, use_cache=True).future.result()
+    assert statuses[str(tmp_path / "b")] == "git_untracked"
+    assert not outdated
+    assert git_status._GitStatusJob(tmp_path, use_cache=True).future.result() == (statuses, False)
+    assert not list((dirs.cache_dir / "git_status").glob("*.tmp"))
+
+    # Cached statuses are still shown, but git status must run again
+    subprocess.check_call(["git", "add", "b"], cwd=tmp_path)
+    assert git_status._GitStatusJob(tmp_path, use_cache=True).future.result() == (statuses, True)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_untracked_cache_respects_user_config(tmp_path):
+    (tmp_path / "default").mkdir()
+    (tmp_path / "disabled").mkdir()
+    for path in [tmp_path / "default", tmp_path / "disabled"]:
+        subprocess.check_call(["git", "init", "--quiet"], cwd=path, stdout=subprocess.DEVNULL)
+    subprocess.check_call(
+        ["git", "config", "core.untrackedCache", "false"], cwd=(tmp_path / "disabled")
+    )
+
+    assert git_status._get_speedup_options(tmp_path / "default") == [
+        "-c",
+        "core.untrackedCache=true",
+    ]
+    assert git_status._get_speedup_options(tmp_path / "disabled") == []
+
+
+class ManualThreadPool:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func):
+        future = Future()
+        self.jobs.append((func, future))
+        return future
+
+    def run_next_job(self):
+        func, future = self.jobs.pop(0)
+        future.set_result(func())
+
+
+def test_git_status_requests_are_coalesced(tree, tmp_path, mocker, wait_until):
+    tree.add_project(tmp_path)
+    [project_id] = tree.get_children()
+    pool = ManualThreadPool()
+    mocker.patch.object(git_status, "git_pool", pool)
+    run_git_status_spy = mocker.spy(git_status, "run_git_status")
+
+    colorer = git_status.ProjectColorer(tree, project_id)
+    for i in range(5):
+        colorer.request_git_status()
+    assert len(pool.jobs) == 1
+
+    # The requests made while git status was running cause only one more run
+    pool.run_next_job()
+    wait_until(lambda: len(pool.jobs) == 1)
+    pool.run_next_job()
+    wait_until(lambda: colorer._running_job is None)
+    assert pool.jobs == []
+    assert run_git_status_spy.call_count == 2
+
+    # A stopped job doesn't run git at all
+    colorer.request_git_status()
+    colorer.stop()
+    pool.run_next_job()
+    assert run_git_status_spy.call_count == 2
+
+
 weird_filenames = ["foo bar.txt", "foo'bar.txt", "örkkimörkkiäinen.ö", "bigyó.txt", "2π.txt"]
 if sys.platform != "win32":
     # Test each "Windows-forbidden" character: https://stackoverflow.com/a/31976060
@@ -59,7 +156,7 @@ def test_funny_paths(tmp_path, filename):
     subprocess.check_call(["git", "add", "."], cwd=tmp_path)
 
     statuses = run_git_status(tmp_path)
-    assert statuses[tmp_path / filename] == "git_added"
+    assert statuses[str(tmp_path / filename)] == "git_added"
 
 
 @pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
@@ -91,3 +188,28 @@ def test_merge_conflict(tree, tmp_path, monkeypatch):
     tree.add_project(tmp_path)
     [project_id] = tree.get_children()
     assert set(tree.item(project_id, "tags")) == {"git_mergeconflict"}
+
+
+def test_parsing_porcelain_v2(tmp_path):
+    output = "\0".join(
+        [
+            "1 .M N... 100644 100644 100644 aaaa aaaa modified file.txt",
+            "1 A. N... 000000 100644 100644 0000 bbbb added.txt",
+            "2 R. N... 100644 100644 100644 cccc cccc R100 new name.txt",
+            "old name.txt",
+            "u UU N... 100644 100644 100644 100644 dddd eeee ffff conflict.txt",
+            "? untracked.txt",
+            "! build/",
+            "",
+        ]
+    )
+    statuses = parse_git_status(output, tmp_path)
+    assert statuses == {
+        str(tmp_path / ".git"): "git_ignored",
+        str(tmp_path / "modified file.txt"): "git_modified",
+        str(tmp_path / "added.txt"): "git_added",
+        str(tmp_path / "new name.txt"): "git_added",
+        str(tmp_path / "conflict.txt"): "git_mergeconflict",
+        str(tmp_path / "untracked.txt"): "git_untracked",
+        str(tmp_path / "build"): "git_ignored",
+    }
@@ -0,0 +1,46 @@
+import importlib.util
+import re
+import subprocess
+import sys
+
+# Importing porcupine.__main__ must not import any third-party packages.
+# They should be imported when they are actually needed, e.g. pygments when
+# a file is opened. Add to this list only if you really need to.
+ALLOWED_THIRD_PARTY_PACKAGES = set()
+
+# Typically this is well below 100ms, but CI machines can be slow
+TIME_BUDGET_MS = 500
+
+
+# Returns {module_name: cumulative_microseconds}
+def run_importtime(code):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stderr
+    return {
+        match.group(2).strip(): int(match.group(1))
+        for match in re.finditer(r"^import time:\s*\d+ \|\s*(\d+) \|(.*)$", output, flags=re.M)
+    }
+
+
+def test_import_time():
+    # site imports things on startup, depending on what is installed
+    imported_anyway = run_importtime("pass").keys()
+
+    # Measure a few times to reduce noise
+    results = [run_importtime("import porcupine.__main__") for i in range(3)]
+    time_ms = min(result["porcupine.__main__"] for result in results) / 1000
+    assert time_ms < TIME_BUDGET_MS
+
+    third_party = {
+        module_name.split(".")[0]
+        for module_name in results[0].keys() - imported_anyway
+        if module_name.split(".")[0] not in sys.stdlib_module_names
+    }
+    third_party.discard("porcupine")
+    # e.g. the copy module tries to import org.python.core, which only exists on Jython
+    third_party = {name for name in third_party if importlib.util.find_spec(name) is not None}
+    assert third_party <= ALLOWED_THIRD_PARTY_PACKAGES
@@ -3,9 +3,7 @@ import sys
 import time
 
 import pytest
-
-if False:  # TODO: langservers are disabled :(
-    from sansio_lsp_client import ClientState
+from sansio_lsp_client import ClientState
 
 from porcupine import get_main_window
 from porcupine.plugins.langserver import langservers
@@ -31,7 +29,7 @@ def intense_super_update():
         get_main_window().update()
 
 
-@pytest.mark.xfail(strict=True, reason="langservers are disabled")
+@pytest.mark.xfail(strict=True, reason="no Python langserver is configured by default")
 def test_basic(filetab, tmp_path, wait_until):
     filetab.textwidget.insert(
         "1.0",
@@ -56,7 +54,7 @@ foo()
     assert filetab.textwidget.get("sel.first linestart", "sel.last lineend") == "def foo():"
 
 
-@pytest.mark.xfail(strict=True, reason="langservers are disabled")
+@pytest.mark.xfail(strict=True, reason="no Python langserver is configured by default")
 def test_two_definitions(filetab, tmp_path, mocker, wait_until):
     filetab.textwidget.insert(
         "1.0",
@@ -1,8 +1,19 @@
 # There's more langserver related tests in other files, e.g. test_jump_to_definition.py
+import random
 import sys
 from pathlib import Path
 
-from porcupine.plugins.langserver import _file_url_to_path
+from sansio_lsp_client import ClientState
+
+from porcupine import textutils, utils
+from porcupine.plugins import hover
+from porcupine.plugins.langserver import (
+    LangServerConfig,
+    _enforce_memory_budget,
+    _file_url_to_path,
+    _find_langserver,
+    langservers,
+)
 
 
 def test_file_url_to_path():
@@ -13,3 +24,117 @@ def test_file_url_to_path():
 
     for path in paths:
         assert _file_url_to_path(path.as_uri()) == path
+
+
+def use_fake_langserver(tab, wait_until):
+    fake_langserver = Path(__file__).with_name("fake_langserver.py")
+    tab.settings.set(
+        "langserver",
+        LangServerConfig(
+            command=f"{{porcupine_python}} {fake_langserver}", language_id="plaintext"
+        ),
+    )
+    wait_until(
+        lambda: any(
+            tab in ls.tabs_opened and ls._lsp_client.state == ClientState.NORMAL
+            for ls in langservers.values()
+        )
+    )
+
+
+def random_edit(rng, textwidget):
+    def random_index():
+        length = textutils.count(textwidget, "1.0", "end - 1 char")
+        return textwidget.index(f"1.0 + {rng.randint(0, length)} chars")
+
+    def random_text():
+        return "".join(rng.choice("ab \t\nö€") for i in range(rng.randint(0, 5)))
+
+    def random_range():
+        return sorted([random_index(), random_index()], key=textwidget.index)
+
+    action = rng.choice(["insert", "delete", "replace", "delete many", "batch"])
+    if action == "insert":
+        textwidget.insert(random_index(), random_text())
+    elif action == "delete":
+        textwidget.delete(*random_range())
+    elif action == "replace":
+        textwidget.replace(*random_range(), random_text())
+    elif action == "delete many":
+        indexes = sorted([random_index() for i in range(4)], key=textwidget.index)
+        textwidget.delete(*indexes)
+    else:
+        with textutils.change_batch(textwidget):
+            random_edit(rng, textwidget)
+            random_edit(rng, textwidget)
+
+
+def test_incremental_sync(filetab, tmp_path, wait_until):
+    filetab.save_as(tmp_path / "foo.txt")
+    use_fake_langserver(filetab, wait_until)
+
+    # The fake langserver responds to hover requests with the whole file
+    responses = []
+    utils.bind_with_data(filetab.textwidget, "<<HoverResponse>>", responses.append, add=True)
+
+    rng = random.Random(1234)
+    for i in range(20):
+        for j in range(20):
+            random_edit(rng, filetab.textwidget)
+
+        responses.clear()
+        filetab.textwidget.event_generate("<<HoverRequest>>", data="1.0")
+        wait_until(lambda: bool(responses))
+        [response] = responses
+
+        langserver_text = response.data_class(hover.Response).text
+        textwidget_text = filetab.textwidget.get("1.0", "end - 1 char")
+        assert langserver_text.encode("utf-8") == textwidget_text.encode("utf-8")
+
+
+def test_shared_between_projects(tabmanager, tmp_path, wait_until):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "foo.txt").touch()
+    (tmp_path / "b" / "bar.txt").touch()
+
+    tab1 = tabmanager.open_file(tmp_path / "a" / "foo.txt")
+    use_fake_langserver(tab1, wait_until)
+    tab2 = tabmanager.open_file(tmp_path / "b" / "bar.txt")
+    use_fake_langserver(tab2, wait_until)
+
+    langserver = _find_langserver(tab1)
+    assert _find_langserver(tab2) is langserver
+    assert tmp_path / "a" in langserver.project_roots
+    assert tmp_path / "b" in langserver.project_roots
+
+    tabmanager.close_tab(tab2)
+    assert tmp_path / "a" in langserver.project_roots
+    assert tmp_path / "b" not in langserver.project_roots
+
+    # Not shut down immediately, so that it can be used again soon
+    tabmanager.close_tab(tab1)
+    assert langserver in langservers.values()
+
+
+def test_memory_budget_spares_langservers_used_by_tabs(mocker, monkeypatch):
+    megabyte = 1024 * 1024
+    used = mocker.Mock(last_used=1)
+    used.is_idle.return_value = False
+    idle_old = mocker.Mock(last_used=2)
+    idle_old.is_idle.return_value = True
+    idle_new = mocker.Mock(last_used=3)
+    idle_new.is_idle.return_value = True
+    for index, langserver in enumerate([used, idle_old, idle_new]):
+        monkeypatch.setitem(langservers, (Path(f"project{index}"), "fake"), langserver)
+
+    # The least recently used idle langserver goes first
+    _enforce_memory_budget(
+        {used: 1500 * megabyte, idle_old: 400 * megabyte, idle_new: 400 * megabyte}
+    )
+    assert idle_old.shutdown.call_count == 1
+    assert idle_new.shutdown.call_count == 0
+
+    _enforce_memory_budget({used: 3000 * megabyte, idle_new: 400 * megabyte})
+    assert idle_new.shutdown.call_count == 1
+    assert used.shutdown.call_count == 0
@@ -66,3 +66,24 @@ def test_log_path_printed(mocker):
     [printed] = mock.call_args[0]
     assert printed.startswith("log file: ")
     assert os.path.isfile(printed[len("log file: ") :])
+
+
+def test_log_file_rotation(monkeypatch):
+    monkeypatch.setattr(_logs, "LOG_FILE_MAX_BYTES", 1000)
+    monkeypatch.setattr(_logs, "LOG_FILES_PER_RUN_MAX", 3)
+
+    handler = _logs._RotatingLogFileHandler(_logs._open_log_file())
+    first_path = handler._paths[0]
+    for i in range(100):
+        handler.handle(logging.LogRecord("foo", logging.INFO, __file__, 1, "x" * 100, None, None))
+    handler.stream.close()
+
+    assert not first_path.exists()
+    assert len(handler._paths) == 3
+    for path in handler._paths:
+        assert path.stat().st_size < 1200
+    assert (
+        handler._paths[-1]
+        .read_text()
+        .startswith(f"Continuing from previous log file: {handler._paths[-2]}\n")
+    )
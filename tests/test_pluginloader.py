@@ -1,19 +1,62 @@
+import os
+
 import pytest
 
-from porcupine import pluginloader
+from porcupine import get_main_window, pluginloader
+from porcupine.menubar import get_menu
 
 
 def test_all_plugins_loaded_successfully():
     # If loading failed, errors were logged and printed to stderr
     assert pluginloader.plugin_infos, "if this fails, it means no plugins got loaded"
     for info in pluginloader.plugin_infos:
-        if info.name == "langserver":
-            continue  # TODO: langservers are disabled
         # it's ok if you don't have tkdnd installed, doesn't get installed with pip
-        if info.name != "drop_to_open":
+        if info.name == "drop_to_open":
+            continue
+        if info.status == pluginloader.Status.WAITING:
+            # not set up until a menu item is used
+            assert pluginloader._manifest_entries[info].lazy_menu_items
+        else:
             assert info.status == pluginloader.Status.ACTIVE
 
 
+def test_lazy_menu_item(monkeypatch):
+    [info] = [info for info in pluginloader.plugin_infos if info.name == "aboutdialog"]
+    monkeypatch.setattr("tkinter.Toplevel.wait_window", lambda self: self.destroy())
+    get_main_window().event_generate("<<Menubar:Help/About Porcupine>>")
+    assert info.status == pluginloader.Status.ACTIVE
+
+    # The placeholder was replaced, not duplicated
+    menu = get_menu("Help")
+    labels = [
+        menu.entrycget(index, "label")
+        for index in range(menu.index("end") + 1)
+        if menu.type(index) == "command"
+    ]
+    assert labels.count("About Porcupine") == 1
+
+
+def test_manifest_entries(tmp_path, mocker):
+    path = tmp_path / "foo.py"
+    path.write_text('setup_after = ["bar"]\nlazy_menu_items = ["Help/Foo"]\n')
+
+    manifest = {}
+    entry = pluginloader._get_manifest_entry(path, {}, manifest)
+    assert entry.setup_after == ["bar"]
+    assert entry.lazy_menu_items == ["Help/Foo"]
+    assert not entry.has_setup_argument_parser
+
+    # If the file didn't change, the source code isn't read again
+    read_spy = mocker.spy(pluginloader, "_read_manifest_entry")
+    assert pluginloader._get_manifest_entry(path, manifest, {}) == entry
+    assert read_spy.call_count == 0
+
+    path.write_text("setup_after = SOME_PLUGINS\ndef setup_argument_parser(parser): pass\n")
+    os.utime(path, ns=(0, 0))
+    assert pluginloader._get_manifest_entry(path, manifest, {}) is None  # must import
+    assert read_spy.call_count == 1
+
+
 # filetypes plugin adds custom command line arguments
 def test_filetypes_plugin_cant_be_loaded_while_running():
     [info] = [info for info in pluginloader.plugin_infos if info.name == "filetypes"]
@@ -0,0 +1,30 @@
+import json
+
+from porcupine import _profiling, dirs
+
+
+def test_startup_profile_files(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(dirs, "log_dir", tmp_path)
+
+    with _profiling.measure("not profiling yet"):
+        pass
+    _profiling.enable()
+    with _profiling.measure("foo"):
+        with _profiling.measure("bar", "plugin setup"):
+            pass
+    json_path, trace_path = _profiling.finish()
+    assert not _profiling.is_enabled()
+
+    phases = json.loads(json_path.read_text())["phases"]
+    assert [(phase["name"], phase["category"]) for phase in phases] == [
+        ("bar", "plugin setup"),
+        ("foo", "startup"),
+    ]
+    assert phases[0]["duration_ms"] <= phases[1]["duration_ms"]
+
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["bar", "foo"]
+    assert all(event["ph"] == "X" for event in events)
+
+    output = capsys.readouterr().out
+    assert output.index("foo (startup)") < output.index("bar (plugin setup)")
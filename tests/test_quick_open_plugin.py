@@ -0,0 +1,91 @@
+import shutil
+import subprocess
+
+import pytest
+
+from porcupine import dirs
+from porcupine.plugins import quick_open
+from porcupine.plugins.quick_open import PathMatcher
+
+
+def test_matching_file_names_come_first():
+    matcher = PathMatcher(
+        ["docs/foo/bar/baz.txt", "foo.py", "src/lib/foo.py", "src/food.py", "src/f_o_o.py"]
+    )
+    assert matcher.search("foo") == [
+        "foo.py",
+        "src/lib/foo.py",
+        "src/food.py",
+        "src/f_o_o.py",
+        "docs/foo/bar/baz.txt",
+    ]
+    assert matcher.search("FOO", limit=2) == ["foo.py", "src/lib/foo.py"]
+    assert matcher.search("libfoo") == ["src/lib/foo.py"]
+    assert matcher.search("src/f") == ["src/food.py", "src/f_o_o.py", "src/lib/foo.py"]
+    assert matcher.search("oof") == []
+    assert matcher.search("xyz") == []
+
+
+def test_typed_characters_at_start_of_words_come_first():
+    matcher = PathMatcher(["src/quickopener.py", "src/qxoxo.py", "src/QuickOpen.java"])
+    assert matcher.search("qo") == ["src/QuickOpen.java", "src/qxoxo.py", "src/quickopener.py"]
+
+    matcher = PathMatcher(["src/tqxo.py", "src/test_quick_open.py"])
+    assert matcher.search("tqo") == ["src/test_quick_open.py", "src/tqxo.py"]
+
+
+def test_empty_query_shows_shallow_files_first():
+    matcher = PathMatcher(["a/b/c.txt", "a/b.txt", "c.txt"])
+    assert matcher.search("") == ["c.txt", "a/b.txt", "a/b/c.txt"]
+
+
+def test_listing_files_without_git(tmp_path):
+    (tmp_path / "subdir").mkdir()
+    (tmp_path / "subdir" / "foo.py").touch()
+    (tmp_path / "bar.py").touch()
+    (tmp_path / ".venv").mkdir()
+    (tmp_path / ".venv" / "huge.py").touch()
+
+    fingerprint, matcher = quick_open._list_files(tmp_path, None)
+    assert matcher.paths == ["bar.py", "subdir/foo.py"]
+
+    # The file list is saved to the cache
+    assert quick_open._load_cache(tmp_path)[0] == fingerprint
+    assert quick_open._load_cache(tmp_path)[1].paths == ["bar.py", "subdir/foo.py"]
+    assert not list((dirs.cache_dir / "quick_open").glob("*.tmp"))
+
+    # Nothing changed, so the matcher is reused
+    assert quick_open._list_files(tmp_path, matcher)[1] is matcher
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not found")
+def test_listing_files_with_git(tmp_path):
+    subprocess.run(["git", "init", "--quiet"], cwd=tmp_path, check=True)
+    (tmp_path / ".gitignore").write_text("ignored.txt\n")
+    (tmp_path / "ignored.txt").touch()
+    (tmp_path / "tracked.txt").touch()
+    (tmp_path / "deleted.txt").touch()
+    subprocess.run(["git", "add", "tracked.txt", "deleted.txt"], cwd=tmp_path, check=True)
+    (tmp_path / "deleted.txt").unlink()
+    (tmp_path / "untracked.txt").touch()
+
+    fingerprint, matcher = quick_open._list_files(tmp_path, None)
+    assert matcher.path_set == {".gitignore", "tracked.txt", "untracked.txt"}
+
+
+def test_opening_a_file(tree, tabmanager, tmp_path, wait_until):
+    (tmp_path / "subdir").mkdir()
+    (tmp_path / "subdir" / "hello.py").write_text("print('hello')\n")
+    tree.add_project(tmp_path)
+
+    quick_open.show_dialog()
+    dialog = quick_open._dialog
+    wait_until(lambda: dialog.treeview.get_children() != ())
+
+    dialog.entry.insert("end", "hel")
+    [item_id] = dialog.treeview.get_children()
+    assert dialog.treeview.item(item_id, "text") == "subdir/hello.py"
+
+    dialog.entry.event_generate("<Return>")
+    assert quick_open._dialog is None
+    assert tabmanager.select().path == tmp_path / "subdir" / "hello.py"
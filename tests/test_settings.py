@@ -151,6 +151,32 @@ def test_save(cleared_global_settings):
         assert json.load(file) == {"foo": "custom foo", "bar": "custom bar"}
 
 
+def test_save_writes_only_when_something_changed(cleared_global_settings, mocker):
+    global_settings.add_option("foo", "default")
+    global_settings.set("foo", "custom")
+    replace = mocker.spy(settings.os, "replace")
+
+    settings.save()
+    settings.save()
+    assert replace.call_count == 1
+    global_settings.set("foo", "custom 2")
+    settings.save()
+    assert replace.call_count == 2
+
+    assert [path.name for path in settings.get_json_path().parent.iterdir()] == ["settings.json"]
+
+
+def test_autosave(cleared_global_settings, monkeypatch, wait_until):
+    monkeypatch.setattr(settings, "_AUTOSAVE_DELAY_MS", 0)
+    monkeypatch.setattr(settings, "_autosave_pending", False)
+
+    global_settings.add_option("foo", "default")
+    global_settings.set("foo", "custom")
+    wait_until(lambda: settings.get_json_path().exists())
+    with settings.get_json_path().open("r") as file:
+        assert json.load(file) == {"foo": "custom"}
+
+
 def test_font_gets_updated():
     fixedfont = Font(name="TkFixedFont", exists=True)
 
@@ -0,0 +1,66 @@
+import socket
+import stat
+import sys
+import threading
+
+import pytest
+
+from porcupine import _single_instance
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a Unix socket")
+
+
+@pytest.fixture
+def listening():
+    _single_instance.start_listening()
+    yield
+    _single_instance.stop_listening()
+
+
+def test_not_running():
+    assert not _single_instance._get_socket_path().exists()
+    assert not _single_instance.send_files_to_running_porcupine(["foo.py"], [])
+
+
+def test_stale_socket_file():
+    # Porcupine crashed while listening
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(str(_single_instance._get_socket_path()))
+    sock.close()
+    assert not _single_instance.send_files_to_running_porcupine(["foo.py"], [])
+
+    _single_instance.start_listening()
+    try:
+        assert _single_instance._listening_socket is not None
+    finally:
+        _single_instance.stop_listening()
+    assert not _single_instance._get_socket_path().exists()
+
+
+def test_socket_is_private(listening):
+    mode = _single_instance._get_socket_path().stat().st_mode
+    assert stat.S_IMODE(mode) & 0o077 == 0
+
+
+def test_opening_files(listening, tabmanager, tmp_path, monkeypatch, wait_until):
+    (tmp_path / "a.py").write_text("hello\n")
+    monkeypatch.chdir(tmp_path)
+
+    # The running Porcupine needs the event loop, so send from another thread
+    results = []
+    thread = threading.Thread(
+        target=(
+            lambda: results.append(
+                _single_instance.send_files_to_running_porcupine(["a.py", "-"], ["from stdin\n"])
+            )
+        )
+    )
+    thread.start()
+    wait_until(lambda: len(tabmanager.tabs()) == 2)
+    thread.join()
+
+    assert results == [True]
+    file_tab, stdin_tab = tabmanager.tabs()
+    assert file_tab.path == (tmp_path / "a.py").resolve()
+    assert stdin_tab.path is None
+    assert stdin_tab.textwidget.get("1.0", "end - 1 char") == "from stdin\n"
@@ -0,0 +1,76 @@
+from porcupine import utils
+from porcupine.plugins import hover
+from porcupine.plugins.underlines import Underline, Underlines
+
+
+def create_hover_getter(filetab):
+    responses = []
+    utils.bind_with_data(filetab.textwidget, "<<HoverResponse>>", responses.append, add=True)
+
+    def get_hover_text(location):
+        responses.clear()
+        filetab.textwidget.event_generate("<<HoverRequest>>", data=location)
+        if not responses:
+            return None
+        [response] = responses
+        return response.data_class(hover.Response).text
+
+    return get_hover_text
+
+
+def test_hovering_and_shifting(filetab):
+    get_hover_text = create_hover_getter(filetab)
+    filetab.textwidget.insert("1.0", "foo bar baz\nlol wat\n")
+    filetab.event_generate(
+        "<<SetUnderlines>>",
+        data=Underlines(
+            id="test",
+            underline_list=[
+                Underline("1.4", "1.7", "this is bar", color="red"),
+                Underline("1.10", "2.2", "baz to lol", color="orange"),
+                Underline("1.0", "1.3", "this is foo", color="red"),
+            ],
+        ),
+    )
+    assert filetab.textwidget.tag_ranges("underline:test")
+    assert get_hover_text("1.0") == "this is foo"
+    assert get_hover_text("1.3") is None
+    assert get_hover_text("1.5") == "this is bar"
+    assert get_hover_text("2.1") == "baz to lol"
+    assert get_hover_text("2.2") is None
+
+    # Underlines move with the text
+    filetab.textwidget.insert("1.0", "hello\n")
+    filetab.textwidget.insert("2.5", "ooo")  # middle of bar
+    assert get_hover_text("2.0") == "this is foo"
+    assert get_hover_text("2.9") == "this is bar"
+    assert get_hover_text("2.10") is None
+    assert get_hover_text("3.1") == "baz to lol"
+
+    # Deleting the whole underlined text deletes the underline
+    filetab.textwidget.delete("2.0", "2.3")
+    assert get_hover_text("2.0") is None
+
+    filetab.event_generate("<<SetUnderlines>>", data=Underlines(id="test", underline_list=[]))
+    assert not filetab.textwidget.tag_ranges("underline:test")
+    assert get_hover_text("2.5") is None
+
+
+def test_last_underline_wins(filetab):
+    get_hover_text = create_hover_getter(filetab)
+    filetab.textwidget.insert("1.0", "hello world")
+    filetab.event_generate(
+        "<<SetUnderlines>>",
+        data=Underlines(
+            id="a",
+            underline_list=[Underline("1.0", "1.11", "first"), Underline("1.6", "1.11", "second")],
+        ),
+    )
+    assert get_hover_text("1.0") == "first"
+    assert get_hover_text("1.7") == "second"
+
+    filetab.event_generate(
+        "<<SetUnderlines>>",
+        data=Underlines(id="b", underline_list=[Underline("1.0", "1.5", "from b")]),
+    )
+    assert get_hover_text("1.0") == "from b"
@@ -1,7 +1,9 @@
 import dataclasses
+import os
 import shutil
 import subprocess
 import sys
+import time
 
 import pytest
 
@@ -115,3 +117,22 @@ def test_format_command():
         assert utils.format_command(path + " {file}", {"file": "tetris.py"}) == [path, "tetris.py"]
     else:
         assert utils.format_command(r"foo\ bar", {}) == ["foo bar"]
+
+
+def test_write_atomically(tmp_path):
+    utils.write_atomically(tmp_path / "foo.json", "old")
+    utils.write_atomically(tmp_path / "foo.json", "new")
+    assert (tmp_path / "foo.json").read_text() == "new"
+    assert [path.name for path in tmp_path.iterdir()] == ["foo.json"]
+
+
+def test_delete_old_files(tmp_path):
+    (tmp_path / "old.json").write_text("{}")
+    (tmp_path / "new.json").write_text("{}")
+    forty_days_ago = time.time() - 40 * 24 * 60 * 60
+    os.utime(tmp_path / "old.json", (forty_days_ago, forty_days_ago))
+
+    utils.delete_old_files(tmp_path, max_age_days=30)
+    assert [path.name for path in tmp_path.iterdir()] == ["new.json"]
+
+    utils.delete_old_files(tmp_path / "doesnt_exist", max_age_days=30)
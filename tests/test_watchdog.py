@@ -0,0 +1,94 @@
+import io
+import time
+import tkinter
+
+import pytest
+
+from porcupine import _watchdog, get_main_window
+
+
+@pytest.fixture
+def watchdog():
+    _watchdog.start(get_main_window())
+    yield
+    _watchdog.stop()
+
+
+def test_slow_callbacks(watchdog, caplog):
+    def slow_callback(event):
+        time.sleep(0.15)
+
+    def fast_callback():
+        # The time spent in slow_callback must not be blamed on this function
+        get_main_window().event_generate("<<WatchdogTest>>")
+
+    get_main_window().bind("<<WatchdogTest>>", slow_callback, add=True)
+    try:
+        get_main_window().after(0, fast_callback)
+        get_main_window().update()
+    finally:
+        get_main_window().unbind("<<WatchdogTest>>")
+
+    [slow] = [
+        callback
+        for callback in _watchdog._slow_callbacks
+        if callback.name.startswith("test_slow_callbacks.")
+    ]
+    assert slow.module == __name__
+    assert slow.name == "test_slow_callbacks.<locals>.slow_callback"
+    assert slow.duration >= 0.15
+    assert f"{__name__}.test_slow_callbacks.<locals>.slow_callback blocked" in caplog.text
+
+
+def test_callback_bound_before_starting(caplog):
+    # Like a key binding that a plugin creates in setup()
+    def slow_callback(event):
+        time.sleep(0.15)
+
+    get_main_window().bind("<<WatchdogTest>>", slow_callback, add=True)
+    _watchdog.start(get_main_window())
+    try:
+        get_main_window().event_generate("<<WatchdogTest>>")
+    finally:
+        _watchdog.stop()
+        get_main_window().unbind("<<WatchdogTest>>")
+
+    assert _watchdog._slow_callbacks[-1].name == (
+        "test_callback_bound_before_starting.<locals>.slow_callback"
+    )
+    assert "slow_callback blocked the event loop" in caplog.text
+
+
+def test_blocked_event_loop(watchdog, caplog):
+    def block_event_loop():
+        time.sleep(0.5)
+
+    get_main_window().update()
+    block_event_loop()
+    get_main_window().update()  # runs the heartbeat
+
+    lag = _watchdog._lags[-1]
+    assert lag.duration >= 0.3
+    assert "block_event_loop" in lag.main_thread_stack
+    assert "event loop was blocked for" in caplog.text
+
+    output = io.StringIO()
+    _watchdog.print_lag_report(output)
+    assert "block_event_loop" in output.getvalue()
+
+
+def test_nested_event_loop_is_not_blamed(watchdog, caplog):
+    # Like a callback that shows a dialog and waits for the user to close it
+    def modal_dialog_like():
+        done = tkinter.BooleanVar()
+        get_main_window().after(500, done.set, True)
+        get_main_window().wait_variable(done)
+
+    _watchdog._slow_callbacks.clear()
+    get_main_window().after(0, modal_dialog_like)
+    get_main_window().update()
+    get_main_window().update()  # runs the heartbeat
+
+    assert not _watchdog._slow_callbacks
+    assert not _watchdog._lags
+    assert "modal_dialog_like" not in caplog.text